@@ -0,0 +1,208 @@
+"""
+AsyncOpenAIExtractor.py
+-----------------------
+asyncio variant of OpenAIReportExtractor: many reports in flight at once
+instead of one blocking responses.create round trip after another.
+
+  * one pooled AsyncOpenAI client per run (SDK retries disabled, handled here);
+  * an in-flight semaphore (max_in_flight);
+  * a client-side token bucket (requests_per_s); every 429 halves its rate and
+    pauses it for the server's retry-after / retry-after-ms, successes bring
+    the rate back up;
+  * jittered exponential backoff for connection errors, timeouts and 5xx.
+
+Per report the field groups still run in order, so the MASS/NME gating is
+the same as in the serial drivers; concurrency comes from running reports
+side by side.
+
+    ex = AsyncOpenAIExtractor("gpt-4.1", max_in_flight=32, requests_per_s=20)
+    ex.run(patients, groups)          # or: await ex.extract_corpus(patients, groups)
+    print(ex.stats)
+
+Point base_url at MockOpenAIServer to run offline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+from FewShotIndex import FewShotIndex
+from ReportExtractor import OpenAIReportExtractor, _assign_fields, _gated_out
+from ResponseCache import ResponseCache
+
+
+class TokenBucket:
+    """Request pacing with multiplicative decrease on 429 and additive recovery."""
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.5):
+        self.max_rate = self.rate = float(rate)
+        self.min_rate = min_rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def throttled(self, retry_after: float):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def _retry_after(headers) -> float | None:
+    """Seconds to wait from retry-after-ms / retry-after (numeric form), if present."""
+    if headers is None:
+        return None
+    for name, scale in (("retry-after-ms", 1e-3), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return None
+
+
+class AsyncOpenAIExtractor(OpenAIReportExtractor):
+    def __init__(self, model_id: str = "gpt-4.1", max_in_flight: int = 16, requests_per_s: float = 10.0,
+                 max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0,
+                 base_url: str | None = None, api_key: str | None = None, timeout: float = 60.0,
+                 section_pruning: bool = False, response_cache: ResponseCache | None = None,
+                 fewshot_index: FewShotIndex | None = None, fewshot_k: int = 2):
+        """
+        Args:
+            model_id: OpenAI model name.
+            max_in_flight: Maximum concurrent requests.
+            requests_per_s: Starting (and maximum) client-side request rate.
+            max_retries: Retries per request on 429 / 5xx / connection errors.
+            base_delay / max_delay: Exponential backoff bounds (full jitter), seconds.
+            base_url / api_key: e.g. a MockOpenAIServer base_url for offline runs.
+            timeout: Per-request timeout, seconds.
+            section_pruning / response_cache / fewshot_index / fewshot_k: As in OpenAIReportExtractor.
+        """
+        # no super().__init__: it builds a synchronous OpenAI client, this class uses AsyncOpenAI
+        self.model_id = model_id
+        self.section_pruning = section_pruning
+        self.response_cache = response_cache
+        self.fewshot_index = fewshot_index
+        self.fewshot_k = fewshot_k
+        self.request = None
+        self.max_in_flight = max_in_flight
+        self.requests_per_s = requests_per_s
+        self.max_retries = max_retries
+        self.base_delay, self.max_delay = base_delay, max_delay
+        self._client_kwargs = dict(base_url=base_url, api_key=api_key, timeout=timeout, max_retries=0)
+        self.client = None
+        self._sem = None
+        self.bucket = None
+        self.stats = {"requests": 0, "ok": 0, "throttled": 0, "retries": 0, "failed": 0}
+
+    # ------------------------------------------------------------------
+    # Client / pacing
+    # ------------------------------------------------------------------
+
+    def _ensure_client(self):
+        """Create the pooled client and limiters inside the running event loop."""
+        if self.client is None:
+            self.client = AsyncOpenAI(**{k: v for k, v in self._client_kwargs.items() if v is not None})
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+            self.bucket = TokenBucket(self.requests_per_s, burst=max(1, self.max_in_flight // 4))
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _acomplete(self, prompt: str, DynModel, max_output_tokens: int = 256) -> dict:
+        self._ensure_client()
+        request = self.response_request(prompt, DynModel, max_output_tokens)
+        key = self.response_cache.key(**request) if self.response_cache is not None else None
+        cached = self.response_cache.get(key) if key is not None else None
+        if cached is not None:
+            return DynModel.model_validate(json.loads(cached)).model_dump()
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            async with self._sem:
+                self.stats["requests"] += 1
+                try:
+                    resp = await self.client.responses.create(**request)
+                except openai.RateLimitError as e:
+                    self.stats["throttled"] += 1
+                    wait = _retry_after(getattr(e.response, "headers", None))
+                    wait = self._backoff(attempt) if wait is None else wait * (1 + 0.2 * random.random())
+                    self.bucket.throttled(wait)
+                    error = e
+                except (openai.APIConnectionError, openai.InternalServerError) as e:
+                    wait = self._backoff(attempt)
+                    error = e
+                else:
+                    self.bucket.succeeded()
+                    self.stats["ok"] += 1
+                    obj = DynModel.model_validate(json.loads(resp.output_text)).model_dump()
+                    if key is not None:
+                        self.response_cache.put(key, resp.output_text, model=self.model_id)
+                    return obj
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(wait)
+        self.stats["failed"] += 1
+        raise error
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+
+    async def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False):
+        if _gated_out(Patient, keys):
+            return _assign_fields(Patient, keys, {})
+        request = self.request_for(keys, include_fewshots)
+        prompt = self.build_prompt(Patient.report_text, request)
+        DynModel = self.make_model(request)
+        obj = await self._acomplete(prompt, DynModel)
+        return _assign_fields(Patient, keys, obj)
+
+    async def extract_report(self, Patient, groups: list[list[str]], include_fewshots: bool = False):
+        for group in groups:
+            await self.extract_structured_data(Patient, group, include_fewshots=include_fewshots)
+        return Patient
+
+    async def extract_corpus(self, patients: list, groups: list[list[str]], include_fewshots: bool = False):
+        """All reports concurrently (bounded by the semaphore and the token bucket)."""
+        self._ensure_client()
+        return await asyncio.gather(*(self.extract_report(p, groups, include_fewshots) for p in patients))
+
+    def run(self, patients: list, groups: list[list[str]], include_fewshots: bool = False):
+        """Blocking wrapper: extract_corpus in a fresh event loop, closing the client after."""
+        async def main():
+            try:
+                return await self.extract_corpus(patients, groups, include_fewshots)
+            finally:
+                await self.aclose()
+        return asyncio.run(main())
@@ -0,0 +1,249 @@
+"""
+CascadeExtractor.py
+-------------------
+Cost-ordered router over the extractor backends (RegexExtractor,
+GLiNERExtractor, QAExtractor, ReportExtractor / OpenAIReportExtractor, ...).
+
+Per field group, the cheapest tier answers first; a field moves on to the
+next tier only when the cheaper one returned null or a confidence below that
+tier's threshold for the field. The last tier always answers.
+
+A null answer is judged before Patient defaults replace it (FamilyHistory and
+the MASS / NME gates become "No"): each tier runs on a _TierProbe that
+records the fields it left null, so a cheap tier's "not found" escalates
+instead of passing as a confident "No".
+
+Confidence is read from Patient.field_confidence (GLiNER span score, QA
+answer score, LLM enum-scoring probability); tiers that record none (regex)
+count as 1.0 for non-null answers, so their threshold decides whether the
+tier is trusted for the field at all.
+
+Thresholds per (tier, field) are learned from a ground-truth file with
+fit_thresholds(): the lowest confidence at which the tier's non-null answers
+still reach `target_precision` on the GT reports (inf when never).
+With escalate_null=False, null answers count as answers throughout.
+
+    cascade = CascadeExtractor([("regex", RegexExtractor()), ("gliner", GLiNERExtractor()),
+                                ("qa", QAExtractor()), ("llm", ReportExtractor(MODEL_ID))])
+    cascade.fit_thresholds(gt_patients, "GT_gpt5_2_1.xlsx", groups)
+    cascade.extract_structured_data(Patient=patient, keys=["BIRADS"])
+    cascade.log_stats()     # fraction of fields / time per tier, escalation rate per field
+
+With two LLM tiers (small model with logprob_confidence=True, then a large
+one) this is small-to-large escalation: the large model is only asked for
+the fields the small one answered with low token probability.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import math
+import time
+from typing import Any
+
+import pandas as pd
+
+import lib
+from Patient import Patient as _Patient
+from ReportExtractor import _assign_fields, _gated_out
+
+
+def canonical_value(value: Any) -> str | None:
+    """Comparable form of a field value, as in lib.evaluate_categorical_metrics (3 == 3.0 == "3")."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    s = str(value).strip().casefold()
+    return None if s in lib.DEFAULT_MISSING_STRINGS else s
+
+
+class _TierProbe(_Patient):
+    """Copy of a Patient for one tier call; `nulls` holds the fields the tier answered null."""
+
+    @classmethod
+    def of(cls, patient) -> "_TierProbe":
+        probe = object.__new__(cls)
+        probe.__dict__.update(patient.__dict__)
+        probe.__dict__["nulls"] = set()
+        probe.field_confidence = {}
+        return probe
+
+    def __setattr__(self, name, value):
+        if value is None:
+            self.nulls.add(name)
+        super().__setattr__(name, value)
+
+    def note_null(self, key: str):
+        self.nulls.add(key)
+
+    def answer(self, key: str):
+        """The tier's value for `key`, None when it answered null (even if since defaulted)."""
+        return None if key in self.nulls else getattr(self, key, None)
+
+
+class CascadeExtractor:
+    """Try tiers in order per field; escalate on null / low confidence."""
+
+    def __init__(self, tiers: list[tuple[str, Any]], thresholds: dict[str, dict[str, float]] | None = None,
+                 default_threshold: float = 0.5, escalate_null: bool = True):
+        """
+        Args:
+            tiers: [(name, extractor), ...] from cheapest to most expensive.
+            thresholds: {tier: {field: min confidence}} (see fit_thresholds / load_thresholds).
+            default_threshold: For (tier, field) pairs without a threshold.
+            escalate_null: Always escalate null answers (cheap tiers returning None
+                usually means "not found"). False treats a confident null as an
+                answer, as for LLM tiers.
+        """
+        if not tiers:
+            raise ValueError("CascadeExtractor needs at least one tier")
+        self.tiers = tiers
+        self.thresholds = thresholds or {}
+        self.default_threshold = default_threshold
+        self.escalate_null = escalate_null
+        self.resolved: dict[str, dict[str, int]] = {name: {} for name, _ in tiers}
+        self.seconds: dict[str, float] = {name: 0.0 for name, _ in tiers}
+        self.gated = 0
+
+    # ------------------------------------------------------------------
+    # Per-tier answers
+    # ------------------------------------------------------------------
+
+    def threshold(self, tier: str, key: str) -> float:
+        return self.thresholds.get(tier, {}).get(key, self.default_threshold)
+
+    @staticmethod
+    def _ask(extractor, Patient, keys: list[str], include_fewshots: bool = False) -> dict:
+        """
+        Run one tier on a copy of Patient (same gates and report) and return
+        {key: (value, confidence or None)} without touching Patient itself.
+        """
+        probe = _TierProbe.of(Patient)
+        extractor.extract_structured_data(probe, keys, include_fewshots=include_fewshots)
+        if hasattr(probe, "_gliner_cache") and not hasattr(Patient, "_gliner_cache"):
+            Patient._gliner_cache = probe._gliner_cache  # GLiNER runs once per report
+        return {k: (probe.answer(k), probe.field_confidence.get(k)) for k in keys}
+
+    def _accept(self, tier: str, key: str, value, confidence) -> bool:
+        if self.escalate_null and canonical_value(value) is None:
+            return False
+        conf = 1.0 if confidence is None else confidence
+        return conf >= self.threshold(tier, key)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False):
+        if _gated_out(Patient, keys):
+            self.gated += len(keys)
+            return _assign_fields(Patient, keys, {})
+
+        obj, pending = {}, list(keys)
+        for i, (name, extractor) in enumerate(self.tiers):
+            last = i == len(self.tiers) - 1
+            t0 = time.perf_counter()
+            answers = self._ask(extractor, Patient, pending, include_fewshots)
+            self.seconds[name] += time.perf_counter() - t0
+            for key in list(pending):
+                value, confidence = answers[key]
+                if last or self._accept(name, key, value, confidence):
+                    obj[key] = value
+                    if confidence is not None:
+                        Patient.field_confidence[key] = confidence
+                    self.resolved[name][key] = self.resolved[name].get(key, 0) + 1
+                    pending.remove(key)
+            if not pending:
+                break
+        return _assign_fields(Patient, keys, obj)
+
+    # ------------------------------------------------------------------
+    # Threshold learning
+    # ------------------------------------------------------------------
+
+    def fit_thresholds(self, patients: list, gt_path: str, groups: list[list[str]],
+                       target_precision: float = 0.95, min_support: int = 10) -> dict:
+        """
+        Learn {tier: {field: threshold}} for every tier but the last from the
+        GT-labelled `patients` (Patient objects with .ID). Dependent fields are
+        scored on the reports whose GT gate is "Yes". Returns (and sets) the thresholds.
+        """
+        gt = pd.read_excel(gt_path) if gt_path.endswith((".xlsx", ".xls")) else pd.read_csv(gt_path)
+        gt = gt.set_index(gt.columns[0])
+        patients = [p for p in patients if p.ID in gt.index]
+
+        thresholds = {}
+        for name, extractor in self.tiers[:-1]:
+            samples: dict[str, list[tuple[float, bool]]] = {}
+            for patient in patients:
+                row = gt.loc[patient.ID]
+                probe = copy.copy(patient)
+                probe.mass_gate = canonical_value(row.get("MASS")) == "yes"
+                probe.nme_gate = canonical_value(row.get("NME")) == "yes"
+                for keys in groups:
+                    if _gated_out(probe, keys) or keys[0] not in gt.columns:
+                        continue
+                    for key, (value, confidence) in self._ask(extractor, probe, keys).items():
+                        pred = canonical_value(value)
+                        if (pred is None and self.escalate_null) or key not in gt.columns:
+                            continue
+                        conf = 1.0 if confidence is None else confidence
+                        samples.setdefault(key, []).append((conf, pred == canonical_value(row[key])))
+
+            thresholds[name] = {}
+            for key, pts in samples.items():
+                pts.sort(key=lambda t: -t[0])
+                best, correct = math.inf, 0
+                for n, (conf, ok) in enumerate(pts, start=1):
+                    correct += ok
+                    # only cut between distinct confidences
+                    if n < len(pts) and pts[n][0] == conf:
+                        continue
+                    if n >= min_support and correct / n >= target_precision:
+                        best = conf
+                thresholds[name][key] = best
+        self.thresholds = thresholds
+        return thresholds
+
+    def save_thresholds(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.thresholds, f, indent=2)
+
+    def load_thresholds(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            self.thresholds = json.load(f)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def tier_fractions(self) -> dict[str, float]:
+        """Fraction of extracted (non-gated) fields resolved by each tier."""
+        total = sum(sum(counts.values()) for counts in self.resolved.values())
+        return {name: (sum(counts.values()) / total if total else 0.0) for name, counts in self.resolved.items()}
+
+    def escalation_rates(self) -> dict[str, float]:
+        """Per field: fraction of extractions the first tier did not resolve."""
+        first = self.tiers[0][0]
+        keys = sorted({k for counts in self.resolved.values() for k in counts})
+        rates = {}
+        for key in keys:
+            total = sum(counts.get(key, 0) for counts in self.resolved.values())
+            rates[key] = 1.0 - self.resolved[first].get(key, 0) / total
+        return rates
+
+    def log_stats(self):
+        fractions = self.tier_fractions()
+        total = sum(sum(counts.values()) for counts in self.resolved.values())
+        seconds = sum(self.seconds.values())
+        print(f"Cascade: {total} fields extracted, {self.gated} gated out")
+        for name, _ in self.tiers:
+            share = self.seconds[name] / seconds if seconds else 0.0
+            print(f"  {name:<8} {fractions[name]:6.1%} of fields   {self.seconds[name]:8.1f} s ({share:.1%} of time)")
+        rates = self.escalation_rates()
+        print("  per field: " + "  ".join(name for name, _ in self.tiers) + "  escalated")
+        for key, rate in rates.items():
+            row = [self.resolved[name].get(key, 0) for name, _ in self.tiers]
+            print(f"    {key:<24} " + "  ".join(f"{n:>5}" for n in row) + f"  {rate:8.1%}")
@@ -0,0 +1,101 @@
+"""
+CorpusScheduler.py
+------------------
+Gate-aware scheduling of field groups over a whole corpus.
+
+The per-report loop runs every group for one report before moving to the
+next, so the MASS/NME detail fields are decided report by report. Here the
+work is split in two waves across all reports:
+
+  1. gate and independent groups (BIRADS, ACR, MASS, NME, ...) for every report;
+  2. MASS / NME dependent groups only for the reports whose gate came out
+     "Yes"; the others get None without calling the backend.
+
+Works with any backend exposing extract_structured_data(Patient, keys, ...);
+backends with extract_batch (ReportExtractor) get one batched call per group.
+
+Stats (scheduler.stats): calls per wave, skipped calls, wall time per wave.
+"""
+
+from __future__ import annotations
+
+import time
+
+import lib
+
+
+def _gate_open(Patient, keys: list[str]) -> bool:
+    if keys[0] in lib.MASS_DEPENDENT_KEYS:
+        return Patient.mass_gate
+    if keys[0] in lib.NME_DEPENDENT_KEYS:
+        return Patient.nme_gate
+    return True
+
+
+def is_dependent(keys: list[str]) -> bool:
+    """True for a MASS/NME detail group (gated on its first key, like the extractors)."""
+    return keys[0] in lib.MASS_DEPENDENT_KEYS or keys[0] in lib.NME_DEPENDENT_KEYS
+
+
+class CorpusScheduler:
+    """Two-wave (gates first, then gate-positive dependents) corpus runner."""
+
+    def __init__(self, extractor, batch_size: int = 8, include_fewshots: bool = False):
+        """
+        Args:
+            extractor: Any extractor backend (ReportExtractor, GLiNERExtractor, ...).
+            batch_size: Batch size for backends with extract_batch.
+            include_fewshots: Passed through to the backend.
+        """
+        self.extractor = extractor
+        self.batch_size = batch_size
+        self.include_fewshots = include_fewshots
+        self.stats: dict = {}
+
+    def _run_group(self, patients: list, keys: list[str]) -> int:
+        """Run one group over `patients`; returns the number of backend calls."""
+        if not patients:
+            return 0
+        if hasattr(self.extractor, "extract_batch"):
+            self.extractor.extract_batch(patients, keys, include_fewshots=self.include_fewshots,
+                                         batch_size=self.batch_size)
+        else:
+            for patient in patients:
+                self.extractor.extract_structured_data(Patient=patient, keys=keys,
+                                                       include_fewshots=self.include_fewshots)
+        return len(patients)
+
+    def run(self, patients: list, groups: list[list[str]]) -> list:
+        """Extract every group for every patient, in two waves. Returns `patients`."""
+        wave1 = [g for g in groups if not is_dependent(g)]
+        wave2 = [g for g in groups if is_dependent(g)]
+
+        t0 = time.perf_counter()
+        calls1 = sum(self._run_group(patients, keys) for keys in wave1)
+        t_wave1 = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        calls2 = skipped = 0
+        for keys in wave2:
+            positive = [p for p in patients if _gate_open(p, keys)]
+            for patient in patients:
+                if not _gate_open(patient, keys):
+                    for key in keys:
+                        setattr(patient, key, None)
+                    skipped += 1
+            calls2 += self._run_group(positive, keys)
+        t_wave2 = time.perf_counter() - t0
+
+        self.stats = {
+            "reports": len(patients),
+            "wave1_calls": calls1,
+            "wave2_calls": calls2,
+            "skipped_calls": skipped,
+            "naive_calls": len(patients) * len(groups),
+            "mass_positive": sum(bool(p.mass_gate) for p in patients),
+            "nme_positive": sum(bool(p.nme_gate) for p in patients),
+            "wave1_s": t_wave1,
+            "wave2_s": t_wave2,
+            "total_s": t_wave1 + t_wave2,
+        }
+        return patients
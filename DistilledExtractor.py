@@ -0,0 +1,357 @@
+"""
+DistilledExtractor.py
+---------------------
+Lightweight per-field classifiers distilled from labelled reports (the GT
+spreadsheet, optionally topped up with an LLM's prediction CSV as
+pseudo-labels). Every closed-set field gets a TF-IDF + logistic-loss linear
+model over the report sections it is read from; the numeric fields
+(diameters, ADC) keep the RegexExtractor parsers. The n-gram vocabulary is
+an explicit token -> column dict fitted on the training reports (no
+hashing): n-grams never seen in training only count towards the TF-IDF norm.
+
+Drop-in replacement for RegexExtractor / ReportExtractor.
+Same interface: extract_structured_data(Patient, keys, ...). The class
+probability of the chosen value is recorded in Patient.field_confidence,
+so the models can also sit as a tier in CascadeExtractor.
+
+    models = train_distilled({pat_id: report_text, ...}, ["GT_gpt5_2_1.xlsx"])
+    save_distilled(models, "models/distilled.joblib")
+    extractor = DistilledExtractor(load_distilled("models/distilled.joblib"))
+
+After fitting, the scikit-learn models are compiled to one token table
+(shared by all section sets) and plain numpy arrays per section set: idf and
+the stacked weights of all its fields. At inference each report section is
+tokenised and looked up once, even when several sets read it, and every
+field of a set is scored with one small matmul: no scikit-learn transform
+in the loop.
+
+Word 1-2-grams (punctuation kept as tokens, so "C-D" and "4" survive) are
+the default; analyzer="char_wb" gives character n-grams, a little more
+robust to inflection but several times slower to vectorise.
+
+Install:
+    pip install scikit-learn
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from itertools import repeat
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import joblib
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    from sklearn.linear_model import SGDClassifier
+except ImportError as e:
+    raise ImportError("scikit-learn not installed. Run: pip install scikit-learn") from e
+
+import lib
+from RegexExtractor import _EXTRACTORS
+
+# fields answered by the regex parsers instead of a classifier
+NUMERIC_KEYS = ("massDiameter", "nmeDiameter", "ADC")
+
+NULL_LABEL = "<null>"
+
+VECTORIZERS = {
+    "word":    dict(analyzer="word", ngram_range=(1, 2), token_pattern=r"(?u)\w+|[^\w\s]"),
+    "char_wb": dict(analyzer="char_wb", ngram_range=(2, 4)),
+}
+
+
+def _vectorizer(params: dict) -> CountVectorizer:
+    return CountVectorizer(lowercase=True, **params)
+
+
+def _analyzer(params: dict):
+    """
+    Text -> n-grams, as _vectorizer(params).build_analyzer(). Word 1-2-grams
+    get an equivalent analyzer that builds the bigrams in one pass instead of
+    scikit-learn's per-token loop (most of the inference time otherwise).
+    """
+    if params.get("analyzer") != "word" or tuple(params.get("ngram_range", (1, 1))) != (1, 2):
+        return _vectorizer(params).build_analyzer()
+    findall = re.compile(params["token_pattern"]).findall
+
+    def analyze(text: str) -> list[str]:
+        tokens = findall(text.lower())
+        return tokens + list(map(" ".join, zip(tokens, tokens[1:])))
+    return analyze
+
+
+def _label(value) -> str:
+    """Class label of a spreadsheet cell ("3" for 3.0, NULL_LABEL for empty)."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return NULL_LABEL
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    s = str(value).strip()
+    return NULL_LABEL if s.casefold() in lib.DEFAULT_MISSING_STRINGS else s
+
+
+def _value(label: str):
+    """Inverse of _label: field value as the other extractors return it."""
+    if label == NULL_LABEL:
+        return None
+    return int(label) if label.isdigit() else label
+
+
+def _section_key(key: str) -> tuple:
+    return tuple(getattr(lib.get_class_by_key(key), "_sections", None) or ())
+
+
+def _section_parts(report: str, section_sets: list[tuple]) -> tuple[dict, list[list[str]]]:
+    """
+    Texts of the report sections and, per section set, the names of the parts
+    it reads. As in lib.select_sections, a set falls back to the whole report
+    ("") when one of its sections is missing or empty.
+    """
+    parsed = lib.parse_sections(report)
+    texts, parts = {"": report}, []
+    for sec in section_sets:
+        if sec and all(parsed.get(name) for name in sec):
+            names = [name for name in lib.SECTION_NAMES if name in sec]
+            texts.update((name, f"{name}\n{parsed[name]}") for name in names)
+            parts.append(names)
+        else:
+            parts.append([""])
+    return texts, parts
+
+
+def _tokens(tokens):  # CountVectorizer analyzer for already tokenised input
+    return tokens
+
+
+def _read_labels(path: str) -> pd.DataFrame:
+    df = pd.read_excel(path) if path.endswith((".xlsx", ".xls")) else pd.read_csv(path)
+    return df.set_index(df.columns[0])
+
+
+# ---------------------------------------------------------------------------
+# Training
+# ---------------------------------------------------------------------------
+
+def train_distilled(reports: dict[str, str], label_paths: list[str], keys: Optional[list[str]] = None,
+                    analyzer: str = "word", alpha: float = 1e-5) -> dict:
+    """
+    Fit one classifier per closed-set field and compile them for DistilledExtractor.
+
+    Args:
+        reports: {report ID: report text} to train on.
+        label_paths: Spreadsheets / CSVs with an ID column and one column per
+            field. The first file that labels a report wins, so list the GT
+            first and LLM prediction CSVs after it as pseudo-labels.
+        keys: Fields to train (default: every field column of the first file).
+        analyzer: "word" or "char_wb" (see VECTORIZERS).
+        alpha: L2 regularisation of the linear models.
+
+    Returns the model bundle understood by DistilledExtractor / save_distilled,
+    including the IDs of the labelled reports it was fitted on ("train_ids").
+    MASS/NME dependent fields are trained on the reports whose gate is "Yes".
+    """
+    labels = None
+    for path in label_paths:
+        df = _read_labels(path)
+        labels = df if labels is None else pd.concat([labels, df.loc[~df.index.isin(labels.index)]])
+    ids = [i for i in reports if i in labels.index]
+    labels = labels.loc[ids]
+    keys = [k for k in (keys or list(labels.columns)) if k in labels.columns and k not in NUMERIC_KEYS]
+
+    params = VECTORIZERS[analyzer]
+    analyze = _analyzer(params)
+    section_sets = list(dict.fromkeys(_section_key(k) for k in keys))
+
+    # per section set, per report: the tokens of the parts it reads
+    set_tokens = [[] for _ in section_sets]
+    vocab: dict[str, int] = {}
+    for i in ids:
+        texts, parts = _section_parts(reports[i], section_sets)
+        part_tokens = {name: analyze(text) for name, text in texts.items()
+                       if any(name in names for names in parts)}
+        for s, names in enumerate(parts):
+            tokens = [t for name in names for t in part_tokens[name]]
+            set_tokens[s].append(tokens)
+            for t in tokens:
+                vocab.setdefault(t, len(vocab))
+
+    gates = {"MASS": labels["MASS"].map(_label) == "Yes", "NME": labels["NME"].map(_label) == "Yes"}
+    sets, fields = {}, {}
+    for s, sec in enumerate(section_sets):
+        counts = CountVectorizer(analyzer=_tokens, vocabulary=vocab).transform(set_tokens[s])
+        tfidf = TfidfTransformer(sublinear_tf=True).fit(counts)
+        X = tfidf.transform(counts)
+
+        coefs, intercepts, offset = [], [], 0
+        for key in (k for k in keys if _section_key(k) == sec):
+            rows = np.ones(len(ids), dtype=bool)
+            if key in lib.MASS_DEPENDENT_KEYS:
+                rows = gates["MASS"].to_numpy()
+            elif key in lib.NME_DEPENDENT_KEYS:
+                rows = gates["NME"].to_numpy()
+            y = labels[key].map(_label).to_numpy()[rows]
+            if len(set(y)) < 2:
+                # nothing to learn (e.g. nmeInternalEnhancement): always the one label seen
+                fields[key] = {"constant": y[0] if len(y) else NULL_LABEL}
+                continue
+            clf = SGDClassifier(loss="log_loss", alpha=alpha, class_weight="balanced", max_iter=1000,
+                                tol=1e-4, random_state=0)
+            clf.fit(X[rows], y)
+            coefs.append(clf.coef_)
+            intercepts.append(clf.intercept_)
+            fields[key] = {"sections": sec, "classes": [str(c) for c in clf.classes_],
+                           "offset": offset, "width": clf.coef_.shape[0]}
+            offset += clf.coef_.shape[0]
+
+        # weight rows only for the tokens some field of this set uses
+        coef = np.vstack(coefs) if coefs else np.zeros((0, counts.shape[1]))
+        cols = np.flatnonzero(np.any(coef != 0, axis=0))
+        row = np.full(counts.shape[1], -1, dtype=np.int32)
+        row[cols] = np.arange(len(cols), dtype=np.int32)
+        sets[sec] = {
+            "idf": tfidf.idf_.astype(np.float32),
+            "row": row,
+            "W": coef[:, cols].T.astype(np.float32),
+            "intercept": np.concatenate(intercepts).astype(np.float32) if intercepts else np.zeros(0, np.float32),
+        }
+    return {"vectorizer": params, "vocab": vocab, "sets": sets, "fields": fields,
+            "idf_unseen": float(np.log(len(ids) + 1) + 1),   # smoothed idf of a token absent from training
+            "trained_on": len(ids), "train_ids": list(ids)}
+
+
+def save_distilled(models: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump(models, path, compress=3)
+
+
+def load_distilled(path: str) -> dict:
+    return joblib.load(path)
+
+
+# ---------------------------------------------------------------------------
+# DistilledExtractor  –  drop-in replacement for ReportExtractor
+# ---------------------------------------------------------------------------
+
+class DistilledExtractor:
+    """
+    Per-field TF-IDF + linear classifiers over the n-gram vocabulary fitted
+    at training time; regex parsers for the numeric fields.
+    """
+
+    def __init__(self, models: dict | str = "models/distilled.joblib"):
+        """
+        Args:
+            models: Bundle returned by train_distilled, or the path it was saved to.
+        """
+        if isinstance(models, str):
+            models = load_distilled(models)
+        self.fields = models["fields"]
+        self.analyze = _analyzer(models["vectorizer"])
+        self.vocab = models["vocab"]
+        self.idf_unseen = models["idf_unseen"]
+        self.sets = models["sets"]
+        self.section_sets = list(self.sets)
+        # per set, indexed by min(token id, len(vocab)), the last slot standing for
+        # every unseen token: idf and weight row; W gets a zero row for the
+        # tokens no field of the set uses
+        self._idf, self._row, self._W = {}, {}, {}
+        for sec, st in self.sets.items():
+            zero = len(st["W"])
+            self._idf[sec] = np.append(st["idf"], np.float32(self.idf_unseen))
+            self._row[sec] = np.append(np.where(st["row"] >= 0, st["row"], zero), zero).astype(np.int32)
+            self._W[sec] = np.vstack([st["W"], np.zeros((1, st["W"].shape[1]), np.float32)])
+
+    @staticmethod
+    def _skip_mass_field(key: str, Patient) -> bool:
+        return key in lib.MASS_DEPENDENT_KEYS and not Patient.mass_gate
+
+    @staticmethod
+    def _skip_nme_field(key: str, Patient) -> bool:
+        return key in lib.NME_DEPENDENT_KEYS and not Patient.nme_gate
+
+    def _scores(self, report: str) -> dict[tuple, np.ndarray]:
+        """Decision values of every field, per section set, for one report."""
+        texts, parts = _section_parts(report, self.section_sets)
+        V = len(self.vocab)
+        unseen = {}                          # token -> id past the vocabulary, for this report
+        looked_up = {}                       # part -> token ids
+        scores = {}
+        for sec, names in zip(self.section_sets, parts):
+            for name in names:
+                if name not in looked_up:
+                    tokens = self.analyze(texts[name])
+                    j = np.fromiter(map(self.vocab.get, tokens, repeat(-1)), np.int64, len(tokens))
+                    miss = np.flatnonzero(j < 0)
+                    j[miss] = [unseen.setdefault(tokens[k], V + len(unseen)) for k in miss]
+                    looked_up[name] = j
+            ids = looked_up[names[0]] if len(names) == 1 else np.concatenate([looked_up[n] for n in names])
+
+            j, tf = np.unique(ids, return_counts=True)
+            j = np.minimum(j, V)
+            x = (1.0 + np.log(tf.astype(np.float32))) * self._idf[sec][j]            # sublinear tf * idf
+            x /= np.sqrt(x @ x) or 1.0
+            scores[sec] = x @ self._W[sec][self._row[sec][j]] + self.sets[sec]["intercept"]
+        return scores
+
+    def predict(self, report: str) -> dict[str, tuple]:
+        """{key: (value, probability)} for every classifier field of one report."""
+        probs = {sec: (1.0 / (1.0 + np.exp(-s.astype(np.float64)))).tolist()
+                 for sec, s in self._scores(report).items()}
+        out = {}
+        for key, f in self.fields.items():
+            if "constant" in f:
+                out[key] = (_value(f["constant"]), 1.0)
+                continue
+            p = probs[f["sections"]][f["offset"]:f["offset"] + f["width"]]
+            if f["width"] == 1:                                  # binary: one decision value
+                p = [1.0 - p[0], p[0]]
+            else:                                                # one-vs-rest, normalised
+                total = sum(p)
+                p = [q / total for q in p]
+            best = max(range(len(p)), key=p.__getitem__)
+            out[key] = (_value(f["classes"][best]), p[best])
+        return out
+
+    def extract_value_with_score(self, key: str, Patient) -> tuple[Optional[object], Optional[float]]:
+        """(value, probability of that value); score is None for the regex fields."""
+        if key not in self.fields:
+            extractor = _EXTRACTORS.get(key)
+            return (extractor(Patient.report_text) if extractor else None), None
+        if not hasattr(Patient, "_distilled_cache"):
+            Patient._distilled_cache = self.predict(Patient.report_text)  # all fields at once
+        return Patient._distilled_cache[key]
+
+    def extract_structured_data(
+        self,
+        Patient,
+        keys: list[str],
+        include_fewshots: bool = False,  # API parity
+        use_regex: bool = False,         # API parity
+    ):
+        for key in keys:
+            if self._skip_mass_field(key, Patient) or self._skip_nme_field(key, Patient):
+                setattr(Patient, key, None)
+                continue
+            val, score = self.extract_value_with_score(key, Patient)
+            setattr(Patient, key, val)
+            if score is not None:
+                Patient.field_confidence[key] = score
+
+        if "MASS" in keys:
+            val = getattr(Patient, "MASS", None) or "No"
+            setattr(Patient, "MASS", val)
+            Patient.mass_gate = (val == "Yes")
+        if "NME" in keys:
+            val = getattr(Patient, "NME", None) or "No"
+            setattr(Patient, "NME", val)
+            Patient.nme_gate = (val == "Yes")
+
+        for key in keys:
+            if self._skip_mass_field(key, Patient) or self._skip_nme_field(key, Patient):
+                setattr(Patient, key, None)
+
+        return Patient
@@ -0,0 +1,318 @@
+"""
+ExtractionServer.py
+-------------------
+Warm extraction server: loads one backend (ReportExtractor, GLiNERExtractor,
+QAExtractor, PretrainedExtractor or RegexExtractor) once and serves report
+texts over local HTTP (TCP port or Unix socket), so repeated runs don't pay
+model load and tokenizer init again.
+
+Endpoints (JSON in / JSON out):
+    POST /extract        {"report_text": "...", "id": "pat0001", "groups": [[...], ...]}
+                         -> {"id": ..., "fields": {key: value, ...}}
+    POST /extract_batch  {"reports": [{"id": ..., "report_text": ...}, ...], "groups": ...}
+                         -> {"results": [{"id": ..., "fields": {...}}, ...]}
+    GET  /health         -> backend, queue depth/size, requests served
+
+"groups" is optional (default: the 15 groups of report_extract_vFinal.py).
+Fields go through the same per-report MASS/NME gating and field normalizers
+as the drivers. Extractors are stateful, so a single worker runs the jobs;
+requests wait in a bounded queue and get 503 + Retry-After when it is full.
+
+Client: ExtractionClient("http://127.0.0.1:8765") or ExtractionClient("unix:/tmp/extract.sock").
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import lib
+from CorpusScheduler import CorpusScheduler
+from Patient import Patient
+
+
+DEFAULT_GROUPS = lib.FIELD_GROUPS
+
+
+def make_backend(name: str, **kwargs):
+    """Instantiate an extractor backend by name ("hf", "gliner", "qa", "combined", "regex", "distilled")."""
+    if name == "hf":
+        from ReportExtractor import ReportExtractor
+        return ReportExtractor(kwargs.pop("model_id"), **kwargs)
+    if name == "gliner":
+        from GLiNERExtractor import GLiNERExtractor
+        return GLiNERExtractor(**kwargs)
+    if name == "qa":
+        from QAExtractor import QAExtractor
+        return QAExtractor(**kwargs)
+    if name == "combined":
+        from PretrainedExtractor import PretrainedExtractor
+        return PretrainedExtractor(**kwargs)
+    if name == "regex":
+        from RegexExtractor import RegexExtractor
+        return RegexExtractor(**kwargs)
+    if name == "distilled":
+        from DistilledExtractor import DistilledExtractor
+        return DistilledExtractor(**kwargs)
+    raise ValueError(f"Unknown backend: {name!r}")
+
+
+class ExtractionService:
+    """Bounded job queue in front of one extractor, drained by a single worker thread."""
+
+    def __init__(self, extractor, max_queue: int = 32, batch_size: int = 8, request_timeout: float = 600.0):
+        self.extractor = extractor
+        self.batch_size = batch_size
+        self.request_timeout = request_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.served = 0
+        self.rejected = 0
+        self._worker = threading.Thread(target=self._run, name="ExtractionService", daemon=True)
+        self._worker.start()
+
+    def submit(self, reports: list[dict], groups: list[list[str]]) -> Future:
+        """Queue a job; raises queue.Full when the queue is at capacity."""
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((reports, groups, future))
+        except queue.Full:
+            self.rejected += 1
+            raise
+        return future
+
+    def extract(self, reports: list[dict], groups: list[list[str]]) -> list[dict]:
+        patients = []
+        for r in reports:
+            patient = Patient(r["report_text"])
+            patient.ID = r.get("id")
+            patients.append(patient)
+
+        if len(patients) > 1 and hasattr(self.extractor, "extract_batch"):
+            CorpusScheduler(self.extractor, batch_size=self.batch_size).run(patients, groups)
+        else:
+            for patient in patients:
+                for group in groups:
+                    self.extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+
+        keys = [k for grp in groups for k in grp]
+        results = []
+        for patient in patients:
+            patient.finalize()
+            out = {"id": patient.ID, "fields": {k: getattr(patient, k, None) for k in keys}}
+            confidence = getattr(patient, "field_confidence", None)
+            if confidence:
+                out["confidence"] = confidence
+            results.append(out)
+        return results
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            reports, groups, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.extract(reports, groups))
+            except Exception as e:
+                future.set_exception(e)
+            self.served += 1
+
+    def health(self) -> dict:
+        return {
+            "backend": type(self.extractor).__name__,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+
+def _groups_error(groups) -> str | None:
+    """Why `groups` is not a list of non-empty lists of known field keys (None when it is)."""
+    if not isinstance(groups, list):
+        return "groups must be a list of field-key lists"
+    for i, grp in enumerate(groups):
+        if not isinstance(grp, list) or not grp:
+            return f"groups[{i}] must be a non-empty list of field keys, got {grp!r}"
+        if not all(isinstance(k, str) for k in grp):
+            return f"groups[{i}] must contain field keys (strings), got {grp!r}"
+    unknown = [k for grp in groups for k in grp if lib.get_class_by_key(k) is None]
+    if unknown:
+        return f"unknown field keys: {unknown}"
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: ExtractionService  # set by make_server
+
+    def address_string(self):
+        # Unix-socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send(200, self.service.health())
+        self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._send(400, {"error": f"invalid JSON: {e}"})
+        if not isinstance(req, dict):
+            return self._send(400, {"error": "request body must be a JSON object"})
+
+        if self.path == "/extract":
+            reports = [{"id": req.get("id"), "report_text": req.get("report_text")}]
+        elif self.path == "/extract_batch":
+            reports = req.get("reports") or []
+        else:
+            return self._send(404, {"error": f"unknown path {self.path}"})
+
+        if (not isinstance(reports, list) or not reports
+                or any(not isinstance(r, dict) or not isinstance(r.get("report_text"), str) for r in reports)):
+            return self._send(400, {"error": "report_text (string) is required"})
+        groups = req.get("groups") or DEFAULT_GROUPS
+        error = _groups_error(groups)
+        if error:
+            return self._send(400, {"error": error})
+
+        try:
+            future = self.service.submit(reports, groups)
+        except queue.Full:
+            return self._send(503, {"error": "queue full"}, headers={"Retry-After": "1"})
+        try:
+            results = future.result(timeout=self.service.request_timeout)
+        except FutureTimeout:
+            future.cancel()
+            return self._send(504, {"error": "timed out waiting for the extractor"})
+        except Exception as e:
+            return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        if self.path == "/extract":
+            return self._send(200, results[0])
+        self._send(200, {"results": results})
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: ExtractionService, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: str | None = None):
+    handler = type("Handler", (_Handler,), {"service": service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class ExtractionClient:
+    """Minimal client; retries on 503 (queue full) after Retry-After."""
+
+    def __init__(self, address: str = "http://127.0.0.1:8765", timeout: float = 900.0, max_retries: int = 20):
+        self.address = address
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _connection(self):
+        if self.address.startswith("unix:"):
+            return _UnixHTTPConnection(self.address[len("unix:"):], self.timeout)
+        hostport = self.address.split("://", 1)[-1].rstrip("/")
+        return http.client.HTTPConnection(hostport, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: dict | None = None) -> dict:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        for _ in range(self.max_retries + 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                data = json.loads(resp.read() or b"{}")
+                if resp.status == 503:
+                    time.sleep(float(resp.getheader("Retry-After", "1")))
+                    continue
+                if resp.status != 200:
+                    raise RuntimeError(f"{resp.status}: {data.get('error')}")
+                return data
+            finally:
+                conn.close()
+        raise RuntimeError("server queue stayed full")
+
+    def extract(self, report_text: str, id: str | None = None, groups: list[list[str]] | None = None) -> dict:
+        return self._request("POST", "/extract", {"report_text": report_text, "id": id, "groups": groups})
+
+    def extract_batch(self, reports: list[dict], groups: list[list[str]] | None = None) -> list[dict]:
+        return self._request("POST", "/extract_batch", {"reports": reports, "groups": groups})["results"]
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    BACKEND     = "hf"                    # "hf" | "gliner" | "qa" | "combined" | "regex"
+    BACKEND_KWARGS = {"model_id": "Qwen/Qwen2.5-14B-Instruct"}   # {} for the non-LLM backends
+    HOST        = "127.0.0.1"
+    PORT        = 8765
+    UNIX_SOCKET = None                    # e.g. "/tmp/extract.sock" (overrides HOST/PORT)
+    MAX_QUEUE   = 32                      # waiting jobs before 503
+    BATCH_SIZE  = 8                       # for /extract_batch on batched backends
+    # ================================================================
+
+    t0 = time.perf_counter()
+    extractor = make_backend(BACKEND, **BACKEND_KWARGS)
+    print(f"Loaded {type(extractor).__name__} in {time.perf_counter() - t0:.1f} s")
+
+    service = ExtractionService(extractor, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE)
+    server = make_server(service, host=HOST, port=PORT, unix_socket=UNIX_SOCKET)
+    print(f"Serving on {'unix:' + UNIX_SOCKET if UNIX_SOCKET else f'http://{HOST}:{PORT}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
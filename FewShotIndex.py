@@ -0,0 +1,138 @@
+"""
+FewShotIndex.py
+---------------
+Retrieval index over the few-shot examples of MedicalInformation.py.
+
+Every field's `_fewshots` block is split into its "Example N" entries and
+indexed with BM25 (accent-folded word tokens, pure Python, CPU only). At
+prompt time only the top-k examples most similar to the report are inserted
+per field: each example is scored against every sentence of the sections
+the field reads (its `_sections`) and keeps its best sentence score.
+
+    index = FewShotIndex.from_classes()
+    extractor = ReportExtractor(MODEL_ID, fewshot_index=index, fewshot_k=2)
+    extractor.extract_structured_data(patient, ["BIRADS"], include_fewshots=True)
+
+With include_fewshots=True and no index the full `_fewshots` blocks are
+used as before. More examples (e.g. sentences of GT-labelled reports) can
+be added with add().
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+import lib
+
+# "Example 3 (Subcategory 4a -> 4)" opens one example of a `_fewshots` block
+_EXAMPLE_RE = re.compile(r"^[ \t]*Example \d+\b", re.MULTILINE)
+_HEADER = "\n        FEW-SHOT EXAMPLES\n\n"
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.;!?])\s+|\n+")
+
+FIELDS = ("BIRADS", "FamilyHistory", "ACR", "BPE", "MASS", "massDiameter", "massMargins",
+          "massInternalEnhancement", "NME", "nmeDiameter", "nmeMargins", "nmeInternalEnhancement",
+          "NonEnhancingFindings", "CurveMorphology", "ADC", "LATERALITY")
+
+
+def _tokens(text: str) -> list[str]:
+    return _WORD_RE.findall(lib._fold(text))
+
+
+def split_fewshots(block: str) -> list[str]:
+    """The "Example N ..." entries of one `_fewshots` block, without the header."""
+    starts = [m.start() for m in _EXAMPLE_RE.finditer(block)]
+    return [block[a:b].rstrip() for a, b in zip(starts, starts[1:] + [len(block)])]
+
+
+def _example_text(example: str) -> str:
+    """The report excerpt of one example (between "Text:" and "Output:")."""
+    m = re.search(r"Text:(.*?)Output:", example, flags=re.DOTALL)
+    return m.group(1) if m else example
+
+
+class FewShotIndex:
+    """Per-field BM25 index over few-shot examples."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.examples: dict[str, list[str]] = {}          # field -> rendered examples
+        self._docs: dict[str, list[Counter]] = {}         # field -> term counts per example
+        self._idf: dict[str, dict[str, float]] = {}
+
+    @classmethod
+    def from_classes(cls, keys=FIELDS, **kwargs) -> "FewShotIndex":
+        """Index the `_fewshots` blocks of the MedicalInformation classes."""
+        index = cls(**kwargs)
+        for key in keys:
+            for example in split_fewshots(getattr(lib.get_class_by_key(key), "_fewshots", "")):
+                index.add(key, example)
+        return index
+
+    def add(self, key: str, example: str, text: str | None = None):
+        """
+        Add one rendered example (the text inserted in the prompt) for `key`.
+        `text` is what it is matched on; default: its "Text:" excerpt.
+        """
+        self.examples.setdefault(key, []).append(example)
+        self._docs.setdefault(key, []).append(Counter(_tokens(text if text is not None else _example_text(example))))
+        self._idf.pop(key, None)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.examples.values())
+
+    # ------------------------------------------------------------------
+    # BM25
+    # ------------------------------------------------------------------
+
+    def _field_idf(self, key: str) -> dict[str, float]:
+        if key not in self._idf:
+            docs = self._docs[key]
+            df = Counter(t for doc in docs for t in doc)
+            n = len(docs)
+            self._idf[key] = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+        return self._idf[key]
+
+    def _bm25(self, key: str, query: list[str]) -> list[float]:
+        """BM25 score of every example of `key` for one tokenised query."""
+        docs = self._docs[key]
+        idf = self._field_idf(key)
+        avg = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+        terms = [t for t in set(query) if t in idf]
+        scores = []
+        for doc in docs:
+            norm = self.k1 * (1 - self.b + self.b * sum(doc.values()) / avg)
+            scores.append(sum(idf[t] * doc[t] * (self.k1 + 1) / (doc[t] + norm) for t in terms if t in doc))
+        return scores
+
+    def scores(self, key: str, report: str) -> list[float]:
+        """Per example: best BM25 score over the sentences of the sections `key` reads."""
+        best = [0.0] * len(self.examples.get(key, ()))
+        if not best:
+            return best
+        for sentence in _SENTENCE_RE.split(lib.select_sections(report, [key])):
+            query = _tokens(sentence)
+            if query:
+                best = [max(a, s) for a, s in zip(best, self._bm25(key, query))]
+        return best
+
+    # ------------------------------------------------------------------
+    # Prompt block
+    # ------------------------------------------------------------------
+
+    def top_k(self, key: str, report: str, k: int = 2) -> list[str]:
+        """The k best-matching examples of `key`, best first (ties keep the original order)."""
+        scores = self.scores(key, report)
+        order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+        return [self.examples[key][i] for i in order[:k]]
+
+    def block(self, key: str, report: str, k: int = 2) -> str:
+        """Few-shot block like `_fewshots`, holding only the top-k examples (renumbered)."""
+        examples = self.top_k(key, report, k)
+        if not examples:
+            return ""
+        renumbered = [_EXAMPLE_RE.sub(f"        Example {n}", ex, count=1) for n, ex in enumerate(examples, 1)]
+        return _HEADER + "\n\n".join(renumbered) + "\n    "
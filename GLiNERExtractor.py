@@ -108,7 +108,7 @@ def _parse_bpe(span: str) -> Optional[str]:
 
 
 def _parse_diameter(span: str) -> Optional[str]:
-    """Return '<num> mm' or '<num> cm'; Patient.post_process converts to float mm."""
+    """Return '<num> mm' or '<num> cm'; the Patient normalizer converts to float mm."""
     m = re.search(
         r"(\d+(?:[.,]\d+)?)\s*(mm|cm|χιλ|εκ)",
         span, re.IGNORECASE,
@@ -295,21 +295,27 @@ class GLiNERExtractor:
 
     def extract_value(self, field: str, cache: dict[str, list[dict]]):
         """Extract and parse value for one field from the GLiNER cache."""
+        return self.extract_value_with_score(field, cache)[0]
+
+    def extract_value_with_score(self, field: str, cache: dict[str, list[dict]]):
+        """(value, score of the span it was parsed from); score 0.0 when no span was used."""
         spans = cache.get(field, [])
 
         if field in _PRESENCE_FIELDS:
-            return "Yes" if spans else "No"
+            if spans:
+                return "Yes", max(float(e["score"]) for e in spans)
+            return "No", 0.0
 
         parser = _PARSERS.get(field)
         if parser is None:
-            return None
+            return None, 0.0
 
         # Try highest-score span first; fall through if parse fails
         for ent in sorted(spans, key=lambda e: -e["score"]):
             val = parser(ent["text"])
             if val is not None:
-                return val
-        return None
+                return val, float(ent["score"])
+        return None, 0.0
 
     # ------------------------------------------------------------------
     # Gating helpers (mirror RegexExtractor)
@@ -348,7 +354,9 @@ class GLiNERExtractor:
             if self._skip_nme_field(key, Patient):
                 setattr(Patient, key, None)
                 continue
-            setattr(Patient, key, self.extract_value(key, cache))
+            val, score = self.extract_value_with_score(key, cache)
+            setattr(Patient, key, val)
+            Patient.field_confidence[key] = score
 
         # Update gates
         if "MASS" in keys:
@@ -367,5 +375,4 @@ class GLiNERExtractor:
             if self._skip_nme_field(key, Patient):
                 setattr(Patient, key, None)
 
-        Patient.post_process()
         return Patient
@@ -0,0 +1,145 @@
+"""
+GeneratorCache.py
+-----------------
+Cache of compiled outlines generators for ReportExtractor.
+
+Building `create_model("ExtractSelected", ...)` and compiling its JSON schema
+into an outlines-core Index is identical for every report that asks for the
+same field group, so both are done once per process:
+
+  * in memory, keyed by (tokenizer, kind, field tuple, fewshot flag);
+  * on disk, the compiled Index is pickled under a hash of
+    (tokenizer, schema), so a fresh process skips compilation as well.
+
+The compiled Index is shared by all threads; the generator wrapping it is
+not (an outlines logits processor keeps per-generation state), so every
+thread gets its own generator over the same Index.
+
+Counters: `hits` (memory), `disk_hits` (loaded from disk), `misses` (compiled).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import pickle
+import threading
+from importlib.metadata import version
+from pathlib import Path
+from typing import Callable, Optional
+
+import outlines
+from outlines.backends.outlines_core import OutlinesCoreBackend, OutlinesCoreLogitsProcessor
+from outlines.types.dsl import python_types_to_terms
+from outlines_core import Index
+from outlines_core.json_schema import build_regex_from_schema
+
+
+def tokenizer_fingerprint(hf_tok) -> str:
+    """Stable id of a tokenizer: name plus a hash of its vocabulary."""
+    vocab = sorted(hf_tok.get_vocab().items())
+    digest = hashlib.sha256(json.dumps(vocab, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+    return f"{hf_tok.name_or_path}:{len(vocab)}:{digest}"
+
+
+class GeneratorCache:
+    """Compiled-generator cache for one outlines Transformers model."""
+
+    def __init__(self, model, cache_dir: Optional[str | Path] = None):
+        self.model = model
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.tokenizer_key = tokenizer_fingerprint(model.hf_tokenizer)
+        self._backend = None  # outlines-core Vocabulary is built lazily, once
+        self._entries: dict[tuple, tuple] = {}  # key -> (DynModel, Index)
+        self._local = threading.local()         # .generators: key -> (DynModel, generator) of this thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def _disk_path(self, schema: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        h = hashlib.sha256(
+            f"{version('outlines_core')}\n{self.tokenizer_key}\n{schema}".encode("utf-8")
+        ).hexdigest()
+        return self.cache_dir / f"{h}.idx"
+
+    def _index(self, DynModel) -> Index:
+        term = python_types_to_terms(DynModel)
+        path = self._disk_path(term.schema)
+        if path is not None and path.exists():
+            try:
+                with open(path, "rb") as f:
+                    index = pickle.load(f)
+                self.disk_hits += 1
+                return index
+            except Exception as e:
+                print(f"[GeneratorCache] WARNING: ignoring unreadable index {path.name}: {e}")
+
+        if self._backend is None:
+            self._backend = OutlinesCoreBackend(self.model)
+        regex = build_regex_from_schema(term.schema, term.whitespace_pattern)
+        index = Index(regex, self._backend.vocabulary)
+        self.misses += 1
+
+        if path is not None:
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(index, f)
+            tmp.replace(path)
+        return index
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(
+        self,
+        keys: list[str],
+        include_fewshots: bool,
+        make_model: Callable[[], type],
+        kind: str = "fields",
+    ):
+        """
+        Return (DynModel, generator) for this field set, compiling at most once.
+
+        `kind` separates schemas built from the same keys in different ways
+        (e.g. "fields" for one group, "single_pass" for the nested schema).
+        """
+        key = (self.tokenizer_key, kind, tuple(keys), bool(include_fewshots))
+        generators = getattr(self._local, "generators", None)
+        if generators is None:
+            generators = self._local.generators = {}
+        with self._lock:
+            entry = generators.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            compiled = self._entries.get(key)
+            if compiled is None:
+                DynModel = make_model()
+                compiled = self._entries[key] = (DynModel, self._index(DynModel))
+            else:
+                self.hits += 1
+            DynModel, index = compiled
+            processor = OutlinesCoreLogitsProcessor(index, self.model.tensor_library_name)
+            entry = generators[key] = (DynModel, outlines.Generator(self.model, processor=processor))
+            return entry
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else None,
+        }
@@ -0,0 +1,365 @@
+"""
+InferenceEngine.py
+------------------
+Long-lived continuous-batching engine in front of a loaded ReportExtractor.
+
+Field-extraction requests from many reports (typically one driver thread per
+report) go into a shared queue. A single worker thread decodes every active
+sequence one token per step in one batched forward pass, and admits queued
+requests as soon as running ones finish (in-flight batching), instead of
+waiting for a whole static batch to drain. A sequence finishes at EOS, at its
+token budget, or as soon as its JSON object closes.
+
+The active sequences share one persistent KV cache (_SlotCache): one slot per
+sequence with its own length, so a decode step writes only the new token's
+K/V instead of re-padding and concatenating every sequence's cache.
+
+Same interface as the other backends:
+    engine.extract_structured_data(Patient, keys, include_fewshots=False)
+blocks until that group is done, so the per-report MASS/NME gating keeps working.
+
+Metrics (engine.metrics()): steady-state tokens/s, queue depth, active
+sequences, finished requests.
+"""
+
+from __future__ import annotations
+
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import torch
+from outlines.backends.outlines_core import OutlinesCoreLogitsProcessor
+from transformers.cache_utils import Cache, CacheLayerMixin
+
+from ReportExtractor import JsonCloseCriteria, _assign_fields, _gated_out
+
+
+def _layer_kv(cache) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    """Per-layer (key, value) tensors of a DynamicCache (transformers 4.x and 5.x)."""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+class _SlotCache:
+    """
+    Persistent KV cache of the active sequences: per layer one key and one
+    value buffer [max_slots, H, capacity, D]. Slot i holds the i-th active
+    sequence, valid up to lens[i]; the active slots are kept contiguous
+    (0..n-1). Buffers are allocated at the first prefill and grown when a
+    sequence outruns the capacity.
+    """
+
+    def __init__(self, max_slots: int):
+        self.max_slots = max_slots
+        self.keys: list[torch.Tensor] = []
+        self.values: list[torch.Tensor] = []
+        self.lens: torch.Tensor | None = None  # [max_slots] cached tokens per slot
+        self.capacity = 0
+
+    def load(self, slot: int, kv: list[tuple[torch.Tensor, torch.Tensor]]):
+        """Copy one prefilled sequence's per-layer (k, v), each [1, H, len, D], into `slot`."""
+        n = kv[0][0].shape[2]
+        if not self.keys:
+            k0 = kv[0][0]
+            self.lens = torch.zeros(self.max_slots, dtype=torch.long, device=k0.device)
+            for k, v in kv:
+                self.keys.append(k.new_zeros(self.max_slots, k.shape[1], 0, k.shape[3]))
+                self.values.append(v.new_zeros(self.max_slots, v.shape[1], 0, v.shape[3]))
+        self.reserve(n + 1)
+        for buf_k, buf_v, (k, v) in zip(self.keys, self.values, kv):
+            buf_k[slot, :, :n] = k[0]
+            buf_v[slot, :, :n] = v[0]
+        self.lens[slot] = n
+
+    def move(self, src: int, dst: int):
+        """Move the sequence in slot `src` into slot `dst` (compaction after a finish)."""
+        n = int(self.lens[src])
+        for buf_k, buf_v in zip(self.keys, self.values):
+            buf_k[dst, :, :n] = buf_k[src, :, :n]
+            buf_v[dst, :, :n] = buf_v[src, :, :n]
+        self.lens[dst] = n
+
+    def reserve(self, length: int):
+        """Grow every buffer (by at least half, in multiples of 256) to hold `length` tokens."""
+        if length <= self.capacity:
+            return
+        capacity = -(-max(length, self.capacity + self.capacity // 2) // 256) * 256
+        for bufs in (self.keys, self.values):
+            for i, buf in enumerate(bufs):
+                grown = buf.new_zeros(buf.shape[0], buf.shape[1], capacity, buf.shape[3])
+                grown[:, :, :self.capacity] = buf
+                bufs[i] = grown
+        self.capacity = capacity
+
+    def view(self, n: int) -> Cache:
+        """transformers Cache over slots 0..n-1 for one decode step."""
+        length = int(self.lens[:n].max()) + 1
+        self.reserve(length)
+        return Cache(layers=[_SlotLayer(self, layer, n, length) for layer in range(len(self.keys))])
+
+
+class _SlotLayer(CacheLayerMixin):
+    """
+    One layer of a _SlotCache for one decode step: update() writes the new
+    token's K/V at each slot's own length and returns the first `length`
+    positions; positions past a slot's length are masked by the caller.
+    """
+
+    is_sliding = False
+
+    def __init__(self, slots: _SlotCache, layer: int, n: int, length: int):
+        super().__init__()
+        self.slots, self.layer, self.n, self.length = slots, layer, n, length
+        self.is_initialized = True
+
+    def lazy_initialization(self, key_states, value_states):
+        pass
+
+    def update(self, key_states, value_states, *args, **kwargs):
+        slots, n = self.slots, self.n
+        rows = torch.arange(n, device=slots.lens.device)
+        cols = slots.lens[:n]
+        keys, values = slots.keys[self.layer], slots.values[self.layer]
+        keys[rows, :, cols] = key_states[:, :, -1]
+        values[rows, :, cols] = value_states[:, :, -1]
+        return keys[:n, :, :self.length], values[:n, :, :self.length]
+
+    def get_mask_sizes(self, query_length: int) -> tuple[int, int]:
+        return self.length, 0
+
+    def get_seq_length(self) -> int:
+        return self.length - 1
+
+    def get_max_length(self) -> int:
+        return -1
+
+
+@dataclass
+class _Sequence:
+    ids: torch.Tensor                   # [1, prompt + generated]
+    processor: OutlinesCoreLogitsProcessor
+    max_new_tokens: int
+    future: Future
+    json_close: JsonCloseCriteria
+    kv: list = field(default_factory=list)  # per-layer (k, v) after prefill, each [1, H, len, D]
+    n_generated: int = 0
+    finished: bool = False
+
+
+class ContinuousBatchingEngine:
+    """In-flight batching scheduler sharing one ReportExtractor model."""
+
+    def __init__(self, extractor, max_batch_size: int = 16, max_queue: int = 0,
+                 metrics_window: float = 10.0):
+        """
+        Args:
+            extractor: A loaded ReportExtractor (model, tokenizer, generator cache).
+            max_batch_size: Maximum number of sequences decoded together.
+            max_queue: Bound on waiting requests (0 = unbounded); submit blocks when full.
+            metrics_window: Seconds of history used for the steady-state tokens/s.
+        """
+        self.extractor = extractor
+        self.hf_model = extractor.hf_model
+        self.hf_tok = extractor.hf_tok
+        self.max_batch_size = max_batch_size
+        self.metrics_window = metrics_window
+
+        eos = self.hf_model.generation_config.eos_token_id
+        eos = eos if isinstance(eos, (list, tuple)) else [eos]
+        self.eos_ids = {e for e in eos if e is not None} | {self.hf_tok.eos_token_id}
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._active: list[_Sequence] = []  # _active[i] decodes in slot i of _slots
+        self._slots = _SlotCache(max_batch_size)
+        self._stop = threading.Event()
+
+        self._token_log: collections.deque = collections.deque()  # (t, n_tokens) per step
+        self.tokens_generated = 0
+        self.requests_finished = 0
+        self.steps = 0
+
+        self._worker = threading.Thread(target=self._run, name="ContinuousBatchingEngine", daemon=True)
+        self._worker.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, prompt: str, index, max_new_tokens: int = 320) -> Future:
+        """Queue one chat-templated prompt constrained by a compiled outlines Index."""
+        future: Future = Future()
+        ids = self.hf_tok(prompt, return_tensors="pt")["input_ids"].to(self.hf_model.device)
+        processor = OutlinesCoreLogitsProcessor(index, "torch")
+        self._queue.put(_Sequence(ids=ids, processor=processor, max_new_tokens=max_new_tokens,
+                                  future=future, json_close=JsonCloseCriteria(self.hf_tok)))
+        return future
+
+    def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False,
+                                max_new_tokens: int | None = None):
+        """
+        Same as ReportExtractor.extract_structured_data, decoded by the engine:
+        under the group's token budget, retried at 320 tokens if the budget
+        truncated the JSON.
+        """
+        if _gated_out(Patient, keys):
+            return _assign_fields(Patient, keys, {})
+
+        ex = self.extractor
+        request = ex.request_for(keys, include_fewshots)
+        DynModel, generator = ex.generators.get(keys, include_fewshots, lambda: ex.make_model(request))
+        prompt = ex.apply_chat_template(ex.build_prompt(Patient.report_text, request))
+        budget = ex.token_budget(keys) if max_new_tokens is None else max_new_tokens
+        index = generator.logits_processor.index
+
+        out = self.submit(prompt, index, budget).result()
+        try:
+            obj = DynModel.model_validate_json(out).model_dump()
+        except ValueError:
+            if budget >= 320:
+                raise
+            print(f"[ContinuousBatchingEngine] WARNING: budget {budget} truncated {tuple(keys)}; "
+                  f"retrying with 320 tokens")
+            out = self.submit(prompt, index, 320).result()
+            obj = DynModel.model_validate_json(out).model_dump()
+        return _assign_fields(Patient, keys, obj)
+
+    def metrics(self) -> dict:
+        now = time.perf_counter()
+        window = [(t, n) for t, n in list(self._token_log) if now - t <= self.metrics_window]
+        if len(window) > 1:
+            span = window[-1][0] - window[0][0]
+            tps = sum(n for _, n in window[1:]) / span if span > 0 else None
+        else:
+            tps = None
+        return {
+            "tokens_per_s": tps,
+            "queue_depth": self._queue.qsize(),
+            "active": len(self._active),
+            "requests_finished": self.requests_finished,
+            "tokens_generated": self.tokens_generated,
+            "steps": self.steps,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._worker.join()
+        for seq in self._active:
+            if not seq.future.done():
+                seq.future.set_exception(RuntimeError("engine closed"))
+        self._active = []
+        while True:
+            try:
+                seq = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            seq.future.set_exception(RuntimeError("engine closed"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Scheduler
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._admit()
+                if not self._active:
+                    continue
+                self._step()
+            except Exception as e:  # fail the in-flight requests, keep serving
+                for seq in self._active:
+                    if not seq.future.done():
+                        seq.future.set_exception(e)
+                self._active = []
+
+    def _admit(self):
+        """Move queued requests into free batch slots and prefill them."""
+        block = not self._active
+        while len(self._active) < self.max_batch_size:
+            try:
+                seq = self._queue.get(timeout=0.05) if block else self._queue.get_nowait()
+            except queue.Empty:
+                return
+            block = False
+            try:
+                self._prefill(seq)
+            except Exception as e:
+                seq.future.set_exception(e)
+                continue
+            if seq.finished:
+                self._finish(seq)
+            else:
+                self._slots.load(len(self._active), seq.kv)
+                seq.kv = []  # now held by the slot
+                self._active.append(seq)
+
+    @torch.no_grad()
+    def _prefill(self, seq: _Sequence):
+        out = self.hf_model(input_ids=seq.ids, use_cache=True)
+        seq.kv = _layer_kv(out.past_key_values)
+        self._accept(seq, out.logits[:, -1, :])
+
+    def _accept(self, seq: _Sequence, logits: torch.Tensor):
+        """Constrain one sequence's next-token logits, pick greedily, append."""
+        logits = seq.processor(seq.ids, logits.float())
+        token = int(torch.argmax(logits, dim=-1))
+        seq.ids = torch.cat([seq.ids, seq.ids.new_tensor([[token]])], dim=1)
+        seq.n_generated += 1
+        self.tokens_generated += 1
+        if (token in self.eos_ids or seq.n_generated >= seq.max_new_tokens
+                or bool(seq.json_close(seq.ids, logits)[0])):
+            seq.finished = True
+
+    @torch.no_grad()
+    def _step(self):
+        """Decode one token for every active sequence in a single batched forward."""
+        active, slots = self._active, self._slots
+        n = len(active)
+        cache = slots.view(n)
+        lens = slots.lens[:n]
+        positions = torch.arange(cache.get_seq_length() + 1, device=lens.device)
+
+        out = self.hf_model(
+            input_ids=torch.cat([seq.ids[:, -1:] for seq in active]).to(lens.device),
+            attention_mask=(positions[None, :] <= lens[:, None]).long(),
+            position_ids=lens[:, None].clone(),
+            past_key_values=cache,
+            use_cache=True,
+        )
+        lens += 1
+
+        finished = []
+        for i, seq in enumerate(active):
+            self._accept(seq, out.logits[i:i + 1, -1, :])
+            if seq.finished:
+                finished.append(i)
+        for i in reversed(finished):  # fill each freed slot with the last active one
+            self._finish(active[i])
+            last = len(active) - 1
+            if i != last:
+                slots.move(last, i)
+                active[i] = active[last]
+            active.pop()
+
+        self.steps += 1
+        now = time.perf_counter()
+        self._token_log.append((now, n))
+        while self._token_log and now - self._token_log[0][0] > self.metrics_window:
+            self._token_log.popleft()
+
+    def _finish(self, seq: _Sequence):
+        prompt_len = seq.ids.shape[1] - seq.n_generated
+        text = self.hf_tok.decode(seq.ids[0, prompt_len:], skip_special_tokens=True)
+        seq.kv = []
+        self.requests_finished += 1
+        seq.future.set_result(text)
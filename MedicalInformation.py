@@ -38,6 +38,7 @@ class Birads:
     """)
     _field_spec = (Optional[int], Field(None, ge=0, le=6))
     _field_stub = '"BIRADS": <0..6 or null>'
+    _sections = ("ΣΥΜΠΕΡΑΣΜΑ",)  # report sections this field is read from
 
 
 class FamilyHistory:
@@ -87,6 +88,7 @@ class FamilyHistory:
     """)
     _field_spec = (Optional[Literal["Yes", "No"]], None)
     _field_stub = '"FamilyHistory": <Yes|No or null>'
+    _sections = ("ΕΝΔΕΙΞΗ",)
 
 class ACR:
     # Breast Density
@@ -133,6 +135,7 @@ class ACR:
     """)
     _field_spec = (Optional[str], None)
     _field_stub = '"ACR": <A|B|C|D or combos like C-D or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ",)
 
 class BPE:
     _prompt = ("- Background Parenchymal Enhancement (BPE). Allowed: Minimal, Mild, Moderate, Marked. "
@@ -178,6 +181,7 @@ class BPE:
     """)
     _field_spec = (Optional[Literal["Minimal", "Mild", "Moderate", "Marked"]], None)
     _field_stub = '"BPE": <Minimal|Mild|Moderate|Marked or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ",)
 
 
 class MASS:
@@ -253,6 +257,7 @@ class MASS:
     """)
     _field_spec = (Optional[Literal["Yes", "No"]], None)
     _field_stub = '"MASS": <Yes|No>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
     
 class massDiameter:
@@ -352,6 +357,7 @@ class massDiameter:
     """)
     _field_spec = (Optional[str], None)
     _field_stub = '"massDiameter": <string (mm or cm) or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 class massMargins:
     _prompt = ("""- Όρια μάζας (massMargins): Allowed values: σαφή | ασαφή | null.
@@ -410,6 +416,7 @@ class massMargins:
     """)
     _field_spec = (Optional[Literal["σαφή", "ασαφή"]], None)
     _field_stub = '"massMargins": <σαφή|ασαφή or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 class massInternalEnhancement:
     _prompt = (
@@ -467,6 +474,7 @@ class massInternalEnhancement:
     """)
     _field_spec = (Optional[Literal["ομοιογενής", "ανομοιογενής"]], None)
     _field_stub = '"massInternalEnhancement": <ομοιογενής|ανομοιογενής or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 
 
@@ -535,6 +543,7 @@ class NME:
     """)
     _field_spec = (Optional[Literal["Yes", "No"]], None)
     _field_stub = '"NME": <Yes|No>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 class nmeDiameter:
     _prompt = ("""
@@ -639,6 +648,7 @@ class nmeDiameter:
     """)
     _field_spec = (Optional[str], None)
     _field_stub = '"nmeDiameter": <string (mm or cm) or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 class nmeMargins:
     _prompt = (
@@ -699,6 +709,7 @@ class nmeMargins:
     """)    
     _field_spec = (Optional[Literal["σαφή", "ασαφή"]], None)
     _field_stub = '"nmeMargins": <σαφή|ασαφή or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ",)
 
 class nmeInternalEnhancement:
     _prompt = (
@@ -757,6 +768,7 @@ class nmeInternalEnhancement:
     """)    
     _field_spec = (Optional[Literal["ομοιογενής", "ανομοιογενής"]], None)
     _field_stub = '"nmeInternalEnhancement": <ομοιογενής|ανομοιογενής or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ",)
 
 
 
@@ -819,6 +831,7 @@ class NonEnhancingFindings:
     """)
     _field_spec = (Optional[Literal["Yes", "No"]], None)
     _field_stub = '"NonEnhancingFindings": <Yes|No>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 
 class CurveMorphology:
@@ -895,6 +908,7 @@ class CurveMorphology:
     """)
     _field_spec = (Optional[Literal["1", "2", "3", "1,2", "1,3", "2,3"]], None)
     _field_stub = '"CurveMorphology": <"1"|"2"|"3"|"1,2"|"1,3"|"2,3" or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 # ADC → numeric value in ×10⁻³ mm²/s (float) or null
 class ADC:
@@ -917,6 +931,7 @@ class ADC:
     )
     _field_spec = (Optional[float], None)
     _field_stub = '"ADC": <number (×10⁻³ mm²/s) or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 
 class LATERALITY:
@@ -1004,6 +1019,7 @@ class LATERALITY:
     """)
     _field_spec = (Optional[Literal["UNILATERAL", "BILATERAL"]], None)
     _field_stub = '"LATERALITY": <UNILATERAL|BILATERAL or null>'
+    _sections = ("ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
 
 
 
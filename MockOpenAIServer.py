@@ -0,0 +1,270 @@
+"""
+MockOpenAIServer.py
+-------------------
+Local stand-in for the OpenAI Responses API, for running the OpenAI
+backends offline. POST /v1/responses answers with a JSON object that fits the
+request's strict json_schema (first enum value / placeholder per field), after:
+
+  * injected latency (uniform in [latency_min, latency_max] seconds);
+  * throttling: a server-side token bucket; when empty -> 429 with
+    Retry-After / retry-after-ms headers;
+  * random 500s with probability `error_rate`.
+
+Batch API subset (for OpenAIBatch.py): POST /v1/files (purpose=batch),
+POST /v1/batches, GET /v1/batches/{id}, GET /v1/files/{id}/content. A batch
+reports "in_progress" until `batch_delay` seconds have passed, then
+"completed" with one /v1/responses answer per input line.
+
+    server = MockOpenAIServer(port=8766, rate=20, burst=5).start()
+    client = AsyncOpenAI(base_url=server.base_url, api_key="mock")
+    ...
+    server.stop()
+
+Counters: requests, throttled, errors.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sample_from_schema(node: dict, defs: dict | None = None):
+    """Deterministic value that validates against a (strict) JSON schema node."""
+    defs = defs if defs is not None else node.get("$defs", {})
+    if "$ref" in node:
+        return sample_from_schema(defs[node["$ref"].split("/")[-1]], defs)
+    if "anyOf" in node:
+        branches = [b for b in node["anyOf"] if b.get("type") != "null"]
+        return sample_from_schema(branches[0], defs) if branches else None
+    if "enum" in node:
+        return node["enum"][0]
+    t = node.get("type")
+    if t == "object":
+        return {k: sample_from_schema(v, defs) for k, v in node.get("properties", {}).items()}
+    if t == "integer":
+        return node.get("minimum", 0)
+    if t == "number":
+        return node.get("minimum", 1.0)
+    if t == "boolean":
+        return False
+    if t == "array":
+        return []
+    if t == "string":
+        return "x"
+    return None
+
+
+class MockOpenAIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_min: float = 0.05,
+                 latency_max: float = 0.2, rate: float = 50.0, burst: int = 10,
+                 error_rate: float = 0.0, seed: int = 0, batch_delay: float = 0.5):
+        """
+        Args:
+            port: 0 picks a free port (see .base_url).
+            latency_min / latency_max: injected per-request latency, seconds.
+            rate / burst: server-side token bucket (requests/s, capacity).
+            error_rate: probability of an injected 500.
+            batch_delay: seconds before a submitted batch completes.
+        """
+        self.latency = (latency_min, latency_max)
+        self.rate, self.burst = rate, burst
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = self.throttled = self.errors = 0
+        self.batch_delay = batch_delay
+        self.files: dict[str, dict] = {}    # id -> {"meta": {...}, "data": bytes}
+        self.batches: dict[str, dict] = {}
+
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _admit(self) -> float:
+        """Take a token; returns 0 when admitted, else seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="MockOpenAIServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def response_body(req: dict) -> dict:
+    """A completed Responses API object answering `req` with schema-shaped JSON."""
+    schema = ((req.get("text") or {}).get("format") or {}).get("schema") or {"type": "object"}
+    text = json.dumps(sample_from_schema(schema), ensure_ascii=False)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": req.get("model", "mock"),
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockOpenAIServer  # set by MockOpenAIServer
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ---------------- Batch API ----------------
+
+    def _upload_file(self, raw: bytes):
+        msg = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw)
+        parts = {part.get_param("name", header="content-disposition"): part for part in msg.iter_parts()}
+        file_part = parts["file"]
+        data = file_part.get_payload(decode=True)
+        meta = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": file_part.get_filename() or "upload.jsonl",
+            "purpose": parts["purpose"].get_content().strip() if "purpose" in parts else "batch",
+            "status": "processed",
+        }
+        self.mock.files[meta["id"]] = {"meta": meta, "data": data}
+        self._send(200, meta)
+
+    def _create_batch(self, req: dict):
+        if req.get("input_file_id") not in self.mock.files:
+            return self._send(404, {"error": {"message": "input file not found"}})
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": req.get("endpoint"),
+            "input_file_id": req["input_file_id"],
+            "completion_window": req.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "_ready_at": time.monotonic() + self.mock.batch_delay,
+        }
+        self.mock.batches[batch["id"]] = batch
+        self._send(200, {k: v for k, v in batch.items() if not k.startswith("_")})
+
+    def _finish_batch(self, batch: dict):
+        lines = [json.loads(l) for l in self.mock.files[batch["input_file_id"]]["data"].splitlines() if l.strip()]
+        out = []
+        for line in lines:
+            out.append({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": response_body(line["body"])},
+                "error": None,
+            })
+        data = "\n".join(json.dumps(o, ensure_ascii=False) for o in out).encode("utf-8")
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.mock.files[file_id] = {"meta": {"id": file_id, "object": "file", "bytes": len(data),
+                                             "purpose": "batch_output"}, "data": data}
+        batch.update(status="completed", output_file_id=file_id,
+                     request_counts={"total": len(lines), "completed": len(lines), "failed": 0})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")  # v1/batches/<id> | v1/files/<id>/content
+        if len(parts) == 3 and parts[1] == "batches" and parts[2] in self.mock.batches:
+            batch = self.mock.batches[parts[2]]
+            if batch["status"] == "in_progress" and time.monotonic() >= batch["_ready_at"]:
+                self._finish_batch(batch)
+            return self._send(200, {k: v for k, v in batch.items() if not k.startswith("_")})
+        if len(parts) == 4 and parts[1] == "files" and parts[3] == "content" and parts[2] in self.mock.files:
+            data = self.mock.files[parts[2]]["data"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    # ---------------- Responses API ----------------
+
+    def do_POST(self):
+        mock = self.mock
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            return self._upload_file(raw)
+        req = json.loads(raw or b"{}")
+        if path.endswith("/batches"):
+            return self._create_batch(req)
+        if not path.endswith("/responses"):
+            return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        with mock._lock:
+            mock.requests += 1
+            fail = mock._rng.random() < mock.error_rate
+            delay = mock._rng.uniform(*mock.latency)
+
+        wait = mock._admit()
+        if wait > 0:
+            with mock._lock:
+                mock.throttled += 1
+            return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                              headers={"retry-after": f"{wait:.3f}", "retry-after-ms": str(int(wait * 1000))})
+
+        time.sleep(delay)
+        if fail:
+            with mock._lock:
+                mock.errors += 1
+            return self._send(500, {"error": {"message": "injected server error"}})
+
+        self._send(200, response_body(req))
@@ -0,0 +1,197 @@
+"""
+OpenAIBatch.py
+--------------
+OpenAI Batch API mode for OpenAIReportExtractor: instead of one blocking
+responses.create per (report, field group), every prompt of a wave is
+rendered (strict json_schema, same body as the online path) into a JSONL
+file, uploaded, run as one batch, and the results are ingested back into the
+Patient objects.
+
+Gating works like CorpusScheduler, in two batches:
+
+  1. gate and independent groups for every report;
+  2. MASS / NME dependent groups only for the reports whose gate came out
+     "Yes"; the others get None without a request.
+
+    runner = OpenAIBatchRunner(OpenAIReportExtractor("gpt-4.1"), workdir="batch/")
+    runner.run(patients, groups)
+    print(runner.stats)
+
+The JSONL inputs/outputs are kept under `workdir` (wave1.jsonl,
+wave1.output.jsonl, ...). With a response cache on the extractor, cached
+requests are answered locally and left out of the batch. Point the
+extractor's client at MockOpenAIServer to run offline.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+from CorpusScheduler import _gate_open, is_dependent
+from ReportExtractor import OpenAIReportExtractor, _assign_fields
+
+
+TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatchRunner:
+    """Render -> upload -> batch -> poll -> download -> ingest, one batch per wave."""
+
+    def __init__(self, extractor: OpenAIReportExtractor, workdir: str = "batch/", poll_interval: float = 30.0,
+                 completion_window: str = "24h", max_output_tokens: int = 256, include_fewshots: bool = False):
+        """
+        Args:
+            extractor: OpenAIReportExtractor (its client, model_id and section_pruning are used).
+            workdir: Directory for the JSONL input/output files.
+            poll_interval: Seconds between batches.retrieve calls.
+            completion_window: Batch API completion window.
+            max_output_tokens: Per-request output cap, as in the online path.
+            include_fewshots: Passed to request_for.
+        """
+        self.extractor = extractor
+        self.client = extractor.client
+        self.workdir = workdir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_output_tokens = max_output_tokens
+        self.include_fewshots = include_fewshots
+        self.stats: dict = {}
+
+    # ------------------------------------------------------------------
+    # Render / submit / poll / download
+    # ------------------------------------------------------------------
+
+    def render(self, jobs: list[tuple], path: str) -> dict:
+        """
+        Write one Batch API line per (patient_index, patient, keys) job; jobs
+        found in the response cache are assigned right away instead.
+        Returns {custom_id: (patient, keys, DynModel, cache_key)} for ingestion.
+        """
+        cache = self.extractor.response_cache
+        index = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for i, patient, keys in jobs:
+                request = self.extractor.request_for(keys, self.include_fewshots)
+                prompt = self.extractor.build_prompt(patient.report_text, request)
+                DynModel = self.extractor.make_model(request)
+                body = self.extractor.response_request(prompt, DynModel, self.max_output_tokens)
+                cache_key = cache.key(**body) if cache is not None else None
+                cached = cache.get(cache_key) if cache_key is not None else None
+                if cached is not None:
+                    _assign_fields(patient, keys, DynModel.model_validate(json.loads(cached)).model_dump())
+                    continue
+                custom_id = f"{i}:{'+'.join(keys)}"
+                line = {"custom_id": custom_id, "method": "POST", "url": "/v1/responses", "body": body}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                index[custom_id] = (patient, keys, DynModel, cache_key)
+        return index
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/responses",
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def wait(self, batch_id: str):
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_STATES:
+                return batch
+            time.sleep(self.poll_interval)
+
+    def download(self, batch, path: str) -> dict:
+        """Save the output (and error) file under `path`; returns {custom_id: output line}."""
+        results = {}
+        for file_id, out_path in ((batch.output_file_id, path),
+                                  (batch.error_file_id, path.replace(".output.", ".errors."))):
+            if not file_id:
+                continue
+            data = self.client.files.content(file_id).read()
+            with open(out_path, "wb") as f:
+                f.write(data)
+            for raw in data.decode("utf-8").splitlines():
+                if raw.strip():
+                    line = json.loads(raw)
+                    results[line["custom_id"]] = line
+        return results
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _output_text(body: dict) -> str:
+        for item in body.get("output", []):
+            for content in item.get("content") or []:
+                if content.get("type") == "output_text":
+                    return content["text"]
+        raise ValueError("no output_text in response")
+
+    def ingest(self, index: dict, results: dict) -> int:
+        """Assign every result onto its Patient; missing/failed lines become None. Returns failures."""
+        failed = 0
+        for custom_id, (patient, keys, DynModel, cache_key) in index.items():
+            line = results.get(custom_id) or {}
+            response = line.get("response") or {}
+            try:
+                if response.get("status_code") != 200:
+                    raise ValueError(line.get("error") or f"status {response.get('status_code')}")
+                text = self._output_text(response["body"])
+                obj = DynModel.model_validate(json.loads(text)).model_dump()
+                if cache_key is not None:
+                    self.extractor.response_cache.put(cache_key, text, model=self.extractor.model_id)
+            except (ValueError, KeyError) as e:
+                print(f"[batch] {custom_id}: {e}")
+                obj = {}
+                failed += 1
+            _assign_fields(patient, keys, obj)
+        return failed
+
+    def _run_wave(self, name: str, jobs: list[tuple]) -> dict:
+        if not jobs:
+            return {"requests": 0, "failed": 0, "batch_id": None, "status": None, "seconds": 0.0}
+        t0 = time.perf_counter()
+        index = self.render(jobs, os.path.join(self.workdir, f"{name}.jsonl"))
+        if not index:
+            return {"requests": 0, "failed": 0, "batch_id": None, "status": "cached",
+                    "seconds": time.perf_counter() - t0}
+        batch_id = self.submit(os.path.join(self.workdir, f"{name}.jsonl"))
+        print(f"[batch] {name}: {len(index)} requests -> {batch_id}")
+        batch = self.wait(batch_id)
+        results = self.download(batch, os.path.join(self.workdir, f"{name}.output.jsonl"))
+        failed = self.ingest(index, results)
+        return {"requests": len(index), "failed": failed, "batch_id": batch_id,
+                "status": batch.status, "seconds": time.perf_counter() - t0}
+
+    def run(self, patients: list, groups: list[list[str]]) -> list:
+        """Extract every group for every patient with two batches. Returns `patients`."""
+        wave1 = [g for g in groups if not is_dependent(g)]
+        wave2 = [g for g in groups if is_dependent(g)]
+
+        s1 = self._run_wave("wave1", [(i, p, keys) for keys in wave1 for i, p in enumerate(patients)])
+
+        jobs, skipped = [], 0
+        for keys in wave2:
+            for i, patient in enumerate(patients):
+                if _gate_open(patient, keys):
+                    jobs.append((i, patient, keys))
+                else:
+                    _assign_fields(patient, keys, {})
+                    skipped += 1
+        s2 = self._run_wave("wave2", jobs)
+
+        self.stats = {
+            "reports": len(patients),
+            "wave1": s1,
+            "wave2": s2,
+            "skipped_calls": skipped,
+            "naive_calls": len(patients) * len(groups),
+        }
+        return patients
@@ -10,113 +10,113 @@ import re
 import csv
 import json
 
+# "<number> mm|cm" (decimal point or comma) -> diameter in mm
+_DIAM_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(mm|cm)\s*$", flags=re.IGNORECASE)
+
+# value -> code mappings of the categorical fields
+VALUE_CODES = {
+    "massMargins": {"σαφή": "C", "ασαφή": "NC"},
+    "nmeMargins": {"σαφή": "C", "ασαφή": "NC"},
+    "massInternalEnhancement": {"ομοιογενής": "HO", "ανομοιογενής": "HE"},
+    "nmeInternalEnhancement": {"ομοιογενής": "HO", "ανομοιογενής": "HE"},
+    "LATERALITY": {"UNILATERAL": "UNI", "BILATERAL": "BIL"},
+}
+
+
+# ----------------------------------------------------------------------
+# Field normalizers
+# ----------------------------------------------------------------------
+# key -> fn(value) -> value. Patient applies the normalizer of a field once,
+# when the field is set, so every normalizer must be idempotent
+# (fn(fn(v)) == fn(v)): a value that is already normalized is returned as is.
+
+NORMALIZERS = {}
+_BITS = {}   # key -> bit of Patient._normalized
+
+
+def normalizer(*keys):
+    """Register the decorated function as the normalizer of `keys`."""
+    def register(fn):
+        for key in keys:
+            NORMALIZERS[key] = fn
+            _BITS.setdefault(key, 1 << len(_BITS))
+        return fn
+    return register
+
+
+@normalizer("FamilyHistory")
+def _family_history(value):
+    return "No" if value is None else value
+
+
+@normalizer("ADC")
+def _adc(value):
+    """ADC number (x10^-3 mm^2/s) -> NR / I / R; categories pass through."""
+    if value is None or isinstance(value, str):
+        return value
+    return Patient.adc_category(value)
+
+
+@normalizer("massDiameter", "nmeDiameter")
+def _diameter(value):
+    """"<n> mm|cm" -> float mm; other strings -> None; numbers pass through."""
+    if not isinstance(value, str):
+        return value
+    m = _DIAM_RE.match(value)
+    if not m:
+        return None
+    num = float(m.group(1).replace(",", "."))
+    return num * 10.0 if m.group(2).lower() == "cm" else num
+
+
+def _value_code(mapping):
+    return lambda value: mapping.get(value, value) if isinstance(value, str) else value
+
+
+for _key, _mapping in VALUE_CODES.items():
+    normalizer(_key)(_value_code(_mapping))
+
 
 class Patient:
     def __init__(self, report_text: str):
+        self.normalizer_calls = 0   # field normalizations applied to this report
+        self._normalized = 0        # bit set of the fields normalized so far
         self.report_text = report_text
         self.mass_gate, self.nme_gate = True, True
+        self.field_confidence = {}  # key -> probability of the chosen value (enum scoring)
 
-    def post_process(self):
-
-        _DIAM_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(mm|cm)\s*$", flags=re.IGNORECASE)
-
-        if hasattr(self, 'FamilyHistory'):
-            if getattr(self, 'FamilyHistory', None) is None:
-                self.FamilyHistory = 'No'
-
-        if hasattr(self, 'ADC'):
-            adc_value = getattr(self, 'ADC', None)
-            print(f"Post-processing ADC value: {adc_value}, the type is {type(adc_value)}")
-            if adc_value is None:
-                self.ADC = None
-            elif adc_value >= 1.4:
-                self.ADC = "NR"
-            elif 1.0 < adc_value < 1.4:
-                self.ADC = "I"
-            elif adc_value <= 1.0:
-                self.ADC = "R"
-            else:
-                self.ADC = None
-
-        # --- Post-process massDiameter: "<number> mm|cm" -> float mm ---
-        if hasattr(self, 'massDiameter'):
-            massDiameter_value = getattr(self, 'massDiameter', None)
-            if massDiameter_value is None:
-                self.massDiameter = None
-            elif isinstance(massDiameter_value, str):
-                m = _DIAM_RE.match(massDiameter_value)
-                if not m:
-                    self.massDiameter = None
-                else:
-                    num_str, unit = m.group(1), m.group(2).lower()
-                    num_str = num_str.replace(",", ".")
-                    try:
-                        num = float(num_str)
-                    except ValueError:
-                        self.massDiameter = None
-                    else:
-                        if unit == "cm":
-                            num *= 10.0
-                        self.massDiameter = num
-
-        if hasattr(self, 'massMargins'):
-            val = getattr(self, 'massMargins', None)
-            if val == 'σαφή':
-                self.massMargins = 'C'
-            elif val == 'ασαφή':
-                self.massMargins = 'NC'
-
-        if hasattr(self, 'massInternalEnhancement'):
-            val = getattr(self, 'massInternalEnhancement', None)
-            if val == 'ομοιογενής':
-                self.massInternalEnhancement = 'HO'
-            elif val == 'ανομοιογενής':
-                self.massInternalEnhancement = 'HE'
-
-        if hasattr(self, 'LATERALITY'):
-            val = getattr(self, 'LATERALITY', None)
-            if val == 'UNILATERAL':
-                self.LATERALITY = 'UNI'
-            elif val == 'BILATERAL':
-                self.LATERALITY = 'BIL'
-
-        if hasattr(self, 'nmeMargins'):
-            val = getattr(self, 'nmeMargins', None)
-            if val == 'σαφή':
-                self.nmeMargins = 'C'
-            elif val == 'ασαφή':
-                self.nmeMargins = 'NC'
-
-        # --- Post-process nmeDiameter: "<number> mm|cm" -> float mm ---
-        if hasattr(self, 'nmeDiameter'):
-            nmeDiameter_value = getattr(self, 'nmeDiameter', None)
-            if nmeDiameter_value is None:
-                self.nmeDiameter = None
-            elif isinstance(nmeDiameter_value, str):
-                m = _DIAM_RE.match(nmeDiameter_value)
-                if not m:
-                    self.nmeDiameter = None
-                else:
-                    num_str, unit = m.group(1), m.group(2).lower()
-                    num_str = num_str.replace(",", ".")
-                    try:
-                        num = float(num_str)
-                    except ValueError:
-                        self.nmeDiameter = None
-                    else:
-                        if unit == "cm":
-                            num *= 10.0
-                        self.nmeDiameter = num
-
-        if hasattr(self, 'nmeInternalEnhancement'):
-            val = getattr(self, 'nmeInternalEnhancement', None)
-            if val == 'ομοιογενής':
-                self.nmeInternalEnhancement = 'HO'
-            elif val == 'ανομοιογενής':
-                self.nmeInternalEnhancement = 'HE'
+    def __setattr__(self, name, value):
+        fn = NORMALIZERS.get(name)
+        if fn is not None:
+            value = fn(value)
+            self.normalizer_calls += 1
+            self._normalized |= _BITS[name]
+        object.__setattr__(self, name, value)
 
+    def finalize(self):
+        """
+        Once per report, after its last field group. Fields are normalized
+        when set; this only normalizes values placed without setattr (e.g.
+        vars(patient).update(...)).
+        """
+        for name in NORMALIZERS.keys() & vars(self).keys():
+            if not self._normalized & _BITS[name]:
+                setattr(self, name, getattr(self, name))
         return self
 
+    def default_gate(self, obj: dict, key: str):
+        """A null MASS / NME answer in `obj` means "No" (gates stay closed)."""
+        if obj.get(key) is None:
+            obj[key] = "No"
+            self.note_null(key)
+
+    def note_null(self, key: str):
+        """Hook: the extractor answered null for `key` before a default replaced it."""
+
+    def post_process(self):
+        """Former per-group post-processing; fields are now normalized when set. Same as finalize()."""
+        return self.finalize()
+
     @staticmethod
     def adc_category(adc_value: float) -> str:
         """
@@ -141,7 +141,7 @@ class Patient:
             csv_path (str): Path to the CSV file.
         """
         fieldnames = ORDERED_FIELDS
-        row = {k: getattr(self, k) for k in fieldnames}
+        row = {k: getattr(self, k, None) for k in fieldnames}
         file_exists = os.path.exists(csv_path)
         # Use UTF-8 BOM on first write so Excel auto-detects encoding
         if not file_exists:
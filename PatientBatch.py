@@ -0,0 +1,262 @@
+"""
+PatientBatch.py
+---------------
+Columnar store of the extracted fields of many reports: one NumPy array per
+field instead of one Patient object per report.
+
+  * closed-set fields (Yes/No, BPE, margins, BIRADS 0..6, ...): int16 codes
+    into `categories[field]`, -1 = null. The leading categories are the
+    values of the field's `_field_spec` (Literal values or int range), then
+    the codes the Patient normalizers map them to (C/NC, HO/HE, UNI/BIL), so
+    a code means the same in every batch; other values (e.g. ACR combos
+    "C-D") are appended as they are seen;
+  * diameters and ADC: float64, NaN = null. String values (an unparsed
+    "12 mm", or the ADC category once post-processed) are kept in
+    `text[field]`;
+  * `present[field]`: the attribute is set on the Patient (the
+    normalizers and to_patients rely on hasattr);
+  * ids, mass_gate / nme_gate and per-field confidence (NaN = none).
+
+report_text is only kept with keep_text=True. post_process() applies the
+Patient field normalizers to the whole batch at once.
+
+    batch = PatientBatch.from_patients(patients)          # or from_csv(predictions)
+    batch.to_csv("reports_extracted.csv", ORDERED_FIELDS)
+    df = lib.evaluate_categorical_metrics(path_pred=batch.to_frame(ORDERED_FIELDS), path_gt=GT_XLSX)
+    patients = batch.to_patients()
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+
+import numpy as np
+import pandas as pd
+
+import lib
+from Patient import NORMALIZERS, VALUE_CODES, Patient
+
+FIELDS = ("BIRADS", "FamilyHistory", "ACR", "BPE", "MASS", "massDiameter", "massMargins",
+          "massInternalEnhancement", "NME", "nmeDiameter", "nmeMargins", "nmeInternalEnhancement",
+          "NonEnhancingFindings", "CurveMorphology", "ADC", "LATERALITY")
+FLOAT_FIELDS = ("massDiameter", "nmeDiameter", "ADC")
+NULL = -1
+
+
+def base_categories(key: str) -> list:
+    """Fixed leading categories of a closed-set field: spec values, then post-processed codes."""
+    values = [v for v in (lib.enum_candidates(key) or []) if v is not None]
+    return values + [c for c in VALUE_CODES.get(key, {}).values() if c not in values]
+
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+class PatientBatch:
+    """Field columns (codes / floats) for a batch of reports."""
+
+    def __init__(self, ids, fields=FIELDS):
+        n = len(ids)
+        self.ids = np.asarray(ids, dtype=object)
+        self.fields = tuple(fields)
+        self.report_text = None
+        self.mass_gate = np.ones(n, dtype=bool)
+        self.nme_gate = np.ones(n, dtype=bool)
+        self.categories: dict[str, list] = {}
+        self.codes: dict[str, np.ndarray] = {}
+        self.floats: dict[str, np.ndarray] = {}
+        self.text: dict[str, np.ndarray] = {}
+        self.present: dict[str, np.ndarray] = {}
+        self.confidence: dict[str, np.ndarray] = {}
+        self._lookup: dict[str, dict] = {}
+        for f in self.fields:
+            self.present[f] = np.zeros(n, dtype=bool)
+            self.confidence[f] = np.full(n, np.nan)
+            if f in FLOAT_FIELDS:
+                self.floats[f] = np.full(n, np.nan)
+                self.text[f] = np.full(n, None, dtype=object)
+            else:
+                self.categories[f] = base_categories(f)
+                self.codes[f] = np.full(n, NULL, dtype=np.int16)
+                self._lookup[f] = {v: i for i, v in enumerate(self.categories[f])}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the field arrays (ids / text / categories are object references)."""
+        arrays = [self.mass_gate, self.nme_gate, *self.codes.values(), *self.floats.values(),
+                  *self.present.values(), *self.confidence.values()]
+        return sum(a.nbytes for a in arrays)
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def code(self, field: str, value) -> int:
+        """Code of `value` in `field` (appended to its categories when new); -1 for null."""
+        if _is_null(value):
+            return NULL
+        lookup = self._lookup[field]
+        code = lookup.get(value)
+        if code is None and _is_number(value) and float(value).is_integer():
+            # CSV round trips turn 3 into 3.0 and "1" into 1
+            code = lookup.get(int(value), lookup.get(str(int(value))))
+        if code is None:
+            code = lookup[value] = len(self.categories[field])
+            self.categories[field].append(value)
+        return code
+
+    def set_column(self, field: str, values, present=None):
+        """Store a whole column; `present` (bool per row) defaults to all True."""
+        self.present[field][:] = True if present is None else present
+        if field in FLOAT_FIELDS:
+            floats, text = self.floats[field], self.text[field]
+            floats[:] = np.nan
+            text[:] = None
+            for i, v in enumerate(values):
+                if _is_null(v):
+                    continue
+                if _is_number(v):
+                    floats[i] = v
+                else:
+                    text[i] = v
+        else:
+            self.codes[field][:] = [self.code(field, v) for v in values]
+
+    def values(self, field: str) -> np.ndarray:
+        """Decoded column as an object array (None for null)."""
+        if field in FLOAT_FIELDS:
+            out = self.floats[field].astype(object)
+            out[np.isnan(self.floats[field])] = None
+            has_text = self.text[field] != None  # noqa: E711 (elementwise)
+            out[has_text] = self.text[field][has_text]
+            return out
+        table = np.empty(len(self.categories[field]) + 1, dtype=object)
+        table[:-1] = self.categories[field]
+        return table[self.codes[field]]  # code -1 -> trailing None
+
+    def counts(self, field: str) -> dict:
+        """{value: rows} of a closed-set field (null included as None)."""
+        n = np.bincount(self.codes[field] + 1, minlength=len(self.categories[field]) + 1)
+        return {v: int(c) for v, c in zip([None] + self.categories[field], n) if c}
+
+    # ------------------------------------------------------------------
+    # Post-processing
+    # ------------------------------------------------------------------
+
+    def post_process(self) -> "PatientBatch":
+        """
+        The Patient field normalizers over every row, column by column:
+          * FamilyHistory present but null -> "No";
+          * ADC number -> "NR" (>= 1.4), "I" (1.0 < x < 1.4), "R" (<= 1.0), kept in `text`;
+          * diameter strings "<n> mm|cm" -> float mm, other strings -> null;
+          * Greek / laterality values -> codes (VALUE_CODES).
+        Rows without the attribute are left alone. Idempotent: ADC categories
+        and parsed diameters are not touched again.
+        """
+        if "FamilyHistory" in self.codes:
+            codes = self.codes["FamilyHistory"]
+            codes[self.present["FamilyHistory"] & (codes == NULL)] = self.code("FamilyHistory", "No")
+
+        if "ADC" in self.floats:
+            adc = self.floats["ADC"]
+            rows = self.present["ADC"] & ~np.isnan(adc)
+            v = adc[rows]
+            self.text["ADC"][rows] = np.select([v >= 1.4, v > 1.0], ["NR", "I"], "R").astype(object)
+            adc[rows] = np.nan
+
+        for f in ("massDiameter", "nmeDiameter"):
+            if f in self.floats:
+                self._parse_diameters(f)
+
+        for f, mapping in VALUE_CODES.items():
+            if f in self.codes:
+                # old code -> new code; index 0 is null (code -1)
+                table = np.arange(-1, len(self.categories[f]), dtype=np.int16)
+                for old, new in mapping.items():
+                    if old in self._lookup[f]:
+                        table[self._lookup[f][old] + 1] = self.code(f, new)
+                self.codes[f][:] = table[self.codes[f] + 1]
+        return self
+
+    def _parse_diameters(self, field: str):
+        """Diameter strings -> mm; each distinct string is parsed once."""
+        text = self.text[field]
+        rows = np.flatnonzero(self.present[field] & (text != None))  # noqa: E711 (elementwise)
+        if not len(rows):
+            return
+        codes, uniques = pd.factorize(text[rows])
+        is_str = np.array([isinstance(u, str) for u in uniques], dtype=bool)
+        mm = np.array([NORMALIZERS[field](u) if isinstance(u, str) else np.nan for u in uniques], dtype=float)
+        rows, codes = rows[is_str[codes]], codes[is_str[codes]]
+        self.floats[field][rows] = mm[codes]  # NaN (null) where the pattern did not match
+        text[rows] = None
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_patients(cls, patients: list, fields=FIELDS, keep_text: bool = False) -> "PatientBatch":
+        batch = cls([getattr(p, "ID", None) for p in patients], fields)
+        for f in batch.fields:
+            present = np.array([hasattr(p, f) for p in patients], dtype=bool)
+            batch.set_column(f, [getattr(p, f, None) for p in patients], present)
+            batch.confidence[f][:] = [p.field_confidence.get(f, np.nan) for p in patients]
+        batch.mass_gate[:] = [p.mass_gate for p in patients]
+        batch.nme_gate[:] = [p.nme_gate for p in patients]
+        if keep_text:
+            batch.report_text = np.array([p.report_text for p in patients], dtype=object)
+        return batch
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: str | None = None) -> "PatientBatch":
+        """Batch from a prediction table (first column: IDs); its field columns are all present."""
+        id_col = id_col or df.columns[0]
+        fields = [c for c in df.columns if c != id_col and c in FIELDS]
+        batch = cls(df[id_col].tolist(), fields)
+        for f in fields:
+            batch.set_column(f, df[f].tolist())
+        return batch
+
+    @classmethod
+    def from_csv(cls, path: str, id_col: str | None = None) -> "PatientBatch":
+        return cls.from_frame(pd.read_csv(path), id_col)
+
+    def to_patients(self) -> list:
+        columns = {f: self.values(f) for f in self.fields}
+        patients = []
+        for i in range(len(self)):
+            p = Patient(self.report_text[i] if self.report_text is not None else "")
+            if self.ids[i] is not None:
+                p.ID = self.ids[i]
+            p.mass_gate, p.nme_gate = bool(self.mass_gate[i]), bool(self.nme_gate[i])
+            for f in self.fields:
+                if self.present[f][i]:
+                    setattr(p, f, columns[f][i])
+                if not np.isnan(self.confidence[f][i]):
+                    p.field_confidence[f] = float(self.confidence[f][i])
+            patients.append(p)
+        return patients
+
+    def to_frame(self, columns=None) -> pd.DataFrame:
+        """Decoded table; "ID" selects the ids. Default: ID + every field."""
+        columns = columns or ("ID",) + self.fields
+        return pd.DataFrame({c: self.ids if c == "ID" else self.values(c) for c in columns})
+
+    def to_csv(self, csv_path: str, columns=None):
+        """Same file Patient.save_to_csv writes row by row (UTF-8 BOM, empty cell for null)."""
+        columns = list(columns or ("ID",) + self.fields)
+        data = [self.ids if c == "ID" else self.values(c) for c in columns]
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*data))
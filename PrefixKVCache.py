@@ -0,0 +1,121 @@
+"""
+PrefixKVCache.py
+----------------
+KV caches of static prompt prefixes for ReportExtractor's
+"instructions_first" layout.
+
+For one field group the instruction part of the prompt (task line, field
+rules, static few-shots, JSON stub) is the same for every report, so its
+prefill is computed once and reused for every report of the group:
+
+  * in memory, an LRU of at most `max_entries` prefixes (one per field
+    group and few-shot setting) keyed by a hash of (model, precision,
+    prefix text);
+  * the prefix text is the head of the prompt exactly as the model is given
+    it (ReportExtractor.fed_prompt for the outlines generator), so the
+    cached KV belongs to the very tokens it is reused for;
+  * on disk (optional), the key/value tensors are saved under the same hash,
+    so a fresh process skips the prefill as well.
+
+Counters: `hits` (memory), `disk_hits` (loaded from disk), `misses` (prefilled).
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from importlib.metadata import version
+from pathlib import Path
+
+import torch
+from transformers import DynamicCache
+
+
+FORMAT = 2  # bumped when what a saved prefix holds changes; older files are not read
+
+
+class PrefixKVCache:
+    """LRU of (prefix_ids, DynamicCache) per static prefix, optionally persisted."""
+
+    def __init__(self, hf_model, model_key: str, cache_dir: str | Path | None = None, max_entries: int = 16):
+        """
+        Args:
+            hf_model: The transformers model that prefills the prefixes.
+            model_key: Model id and precision (anything that changes the KV values).
+            cache_dir: Directory for the saved KV tensors (None: memory only).
+            max_entries: Prefixes kept in memory (each holds a full KV cache).
+        """
+        self.hf_model = hf_model
+        self.model_key = model_key
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, prefix_text: str) -> str:
+        blob = f"{FORMAT}\n{version('transformers')}\n{self.model_key}\n{prefix_text}"
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Disk
+    # ------------------------------------------------------------------
+
+    def _save(self, key: str, prefix_ids, cache):
+        layers = [(layer.keys, layer.values) for layer in cache.layers]
+        torch.save({
+            "ids": prefix_ids.cpu(),
+            "layers": [(k.cpu(), v.cpu()) for k, v in layers],
+            "devices": [str(k.device) for k, _ in layers],
+        }, self.cache_dir / f"{key}.pt")
+
+    def _load(self, key: str):
+        path = self.cache_dir / f"{key}.pt"
+        if not path.exists():
+            return None
+        try:
+            data = torch.load(path, map_location="cpu")
+        except Exception as e:
+            print(f"[PrefixKVCache] WARNING: ignoring unreadable cache {path.name}: {e}")
+            return None
+        cache = DynamicCache(config=self.hf_model.config)
+        for i, ((k, v), device) in enumerate(zip(data["layers"], data["devices"])):
+            cache.update(k.to(device), v.to(device), i)
+        return data["ids"].to(self.hf_model.device), cache
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    @torch.no_grad()
+    def get(self, prefix_text: str, encode):
+        """(prefix_ids, cache) for `prefix_text`; `encode(text)` gives the input ids on a miss."""
+        key = self._key(prefix_text)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        entry = self._load(key) if self.cache_dir is not None else None
+        if entry is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            prefix_ids = encode(prefix_text)
+            out = self.hf_model(input_ids=prefix_ids, use_cache=True)
+            entry = (prefix_ids, out.past_key_values)
+            if self.cache_dir is not None:
+                self._save(key, *entry)
+
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "entries": len(self._entries)}
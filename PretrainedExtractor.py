@@ -81,13 +81,14 @@ class PretrainedExtractor:
                 continue
 
             # GLiNER first
-            val = self.gliner.extract_value(key, cache)
+            val, score = self.gliner.extract_value_with_score(key, cache)
 
             # QA fallback if GLiNER missed
             if val is None:
-                val = self.qa.extract_value(key, text)
+                val, score = self.qa.extract_value_with_score(key, text)
 
             setattr(Patient, key, val)
+            Patient.field_confidence[key] = score
 
         # 3. Update gates
         if "MASS" in keys:
@@ -106,6 +107,4 @@ class PretrainedExtractor:
             if self._skip_nme_field(key, Patient):
                 setattr(Patient, key, None)
 
-        # 5. Post-process once
-        Patient.post_process()
         return Patient
@@ -116,20 +116,24 @@ class QAExtractor:
         )
 
     def extract_value(self, field: str, context: str):
+        return self.extract_value_with_score(field, context)[0]
+
+    def extract_value_with_score(self, field: str, context: str):
+        """(value, QA answer score); the score of an empty answer is the no-answer score."""
         if field not in _QUESTIONS:
-            return None
+            return None, 0.0
         out = self._ask(field, context)
         answer = out.get("answer", "") or ""
         score = float(out.get("score", 0.0))
 
         if field in _PRESENCE_FIELDS:
-            return _yes_no_from_answer(answer, score, self.threshold)
+            return _yes_no_from_answer(answer, score, self.threshold), score
 
         if score < self.threshold or not answer.strip():
-            return None
+            return None, score
 
         parser = _PARSERS.get(field)
-        return parser(answer) if parser else answer.strip()
+        return (parser(answer) if parser else answer.strip()), score
 
     # ------------------------------------------------------------------
     # Gating
@@ -165,7 +169,9 @@ class QAExtractor:
             if self._skip_nme_field(key, Patient):
                 setattr(Patient, key, None)
                 continue
-            setattr(Patient, key, self.extract_value(key, context))
+            val, score = self.extract_value_with_score(key, context)
+            setattr(Patient, key, val)
+            Patient.field_confidence[key] = score
 
         if "MASS" in keys:
             val = getattr(Patient, "MASS", None) or "No"
@@ -182,5 +188,4 @@ class QAExtractor:
             if self._skip_nme_field(key, Patient):
                 setattr(Patient, key, None)
 
-        Patient.post_process()
         return Patient
@@ -339,7 +339,7 @@ def extract_massDiameter(text: str) -> Optional[str]:
     val = _parse_diameter(text, _MASS_KW)
     if val is None:
         return None
-    # Return as "<number> mm" string; post_process converts to float
+    # Return as "<number> mm" string; the Patient normalizer converts to float
     return f"{val} mm"
 
 
@@ -364,9 +364,9 @@ _MARGINS_ILL_RE = re.compile(
 
 def _extract_margins(text: str) -> Optional[str]:
     if _MARGINS_CLEAR_RE.search(text):
-        return "σαφή"   # post_process maps -> 'C'
+        return "σαφή"   # normalized -> 'C'
     if _MARGINS_ILL_RE.search(text):
-        return "ασαφή"  # post_process maps -> 'NC'
+        return "ασαφή"  # normalized -> 'NC'
     return None
 
 
@@ -392,9 +392,9 @@ _ENH_HE_RE = re.compile(
 
 def _extract_internal_enhancement(text: str) -> Optional[str]:
     if _ENH_HO_RE.search(text):
-        return "ομοιογενής"   # post_process -> 'HO'
+        return "ομοιογενής"   # normalized -> 'HO'
     if _ENH_HE_RE.search(text):
-        return "ανομοιογενής" # post_process -> 'HE'
+        return "ανομοιογενής" # normalized -> 'HE'
     return None
 
 
@@ -698,13 +698,11 @@ class RegexExtractor:
 
         # ----- apply gate updates -----
         if "MASS" in keys:
-            if obj.get("MASS") is None:
-                obj["MASS"] = "No"
+            Patient.default_gate(obj, "MASS")
             Patient.mass_gate = obj["MASS"] == "Yes"
 
         if "NME" in keys:
-            if obj.get("NME") is None:
-                obj["NME"] = "No"
+            Patient.default_gate(obj, "NME")
             Patient.nme_gate = obj["NME"] == "Yes"
 
         # Re-apply gate overrides after the gate fields are decided
@@ -718,5 +716,4 @@ class RegexExtractor:
         for key in keys:
             setattr(Patient, key, obj.get(key, None))
 
-        Patient.post_process()
         return Patient
@@ -1,7 +1,11 @@
 from typing import Optional, Literal
 from pydantic import Field, create_model
 
-import os, re, json, unicodedata
+import os, re, json, copy, math, threading, unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
 from pathlib import Path
 from datetime import datetime
 
@@ -10,9 +14,16 @@ import lib
 # Heavy ML deps — imported at module level only when this file is loaded.
 # If you only need Patient, import from Patient.py directly.
 import outlines, torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import (AutoModelForCausalLM, AutoTokenizer, LogitsProcessorList, StoppingCriteria,
+                          StoppingCriteriaList)
 from transformers.utils.logging import set_verbosity_error
 
+from GeneratorCache import GeneratorCache
+from PrefixKVCache import PrefixKVCache
+from FewShotIndex import FewShotIndex
+from ResponseCache import ResponseCache
+from TokenCache import TokenCache
+
 os.environ["TORCHDYNAMO_DISABLE"] = "1"
 os.environ["TORCHINDUCTOR_DISABLE"] = "1"
 os.environ["PYTORCH_TRITON_DISABLE"] = "1"
@@ -23,6 +34,7 @@ BASE = Path(__file__).resolve().parent
 CACHE_DIR = BASE / ".hf_cache"
 CACHE_DIR.mkdir(exist_ok=True)
 os.environ["HF_HOME"] = str(CACHE_DIR)
+INDEX_CACHE_DIR = BASE / ".index_cache"  # compiled outlines indexes (see GeneratorCache.py)
 
 # Load HF token from environment — do not hardcode secrets in source.
 # Set via:  export HUGGINGFACEHUB_API_TOKEN="hf_..."
@@ -32,7 +44,176 @@ else:
     print("[ReportExtractor] WARNING: HUGGINGFACEHUB_API_TOKEN not set in environment.")
 
 set_verbosity_error()
-assert torch.cuda.is_available(), "CUDA GPU not found."
+
+
+def cpu_dtype(requested: str = "auto") -> torch.dtype:
+    """
+    Weight dtype for CPU inference: bf16 on CPUs with native bf16 support
+    (AVX512-BF16 / AMX), fp32 otherwise. fp16 matmuls are slow on CPU.
+    """
+    if requested == "bf16":
+        return torch.bfloat16
+    if requested == "fp32":
+        return torch.float32
+    native_bf16 = getattr(torch.cpu, "_is_avx512_bf16_supported", lambda: False)() \
+        or getattr(torch.cpu, "_is_amx_tile_supported", lambda: False)()
+    return torch.bfloat16 if native_bf16 else torch.float32
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of every nn.Linear (weights int8, activations
+    quantized on the fly; runs on any CPU). Done one decoder layer at a time,
+    so starting from a bf16 checkpoint the fp32 copy never exists as a whole.
+    Embeddings and norms stay fp32.
+    """
+    quantize = torch.ao.quantization.quantize_dynamic
+    for layer in model.model.layers:
+        quantize(layer.float(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    quantize(model.float(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)  # lm_head
+    return model
+
+FREE_TEXT_TOKENS = 24   # budget for a free-text / numeric value (ACR "C-D", "12 mm", ADC)
+BUDGET_SLACK = 8        # braces, separators and optional whitespace
+SPLICE_WINDOW = 8       # prefix tokens re-encoded with the suffix to catch merges across the boundary
+
+
+class JsonCloseCriteria(StoppingCriteria):
+    """
+    Stop each sequence as soon as its top-level JSON object closes, instead of
+    spending one more step (or more) on EOS. Braces inside strings are ignored.
+    Also counts the generated tokens per sequence (`n_tokens`).
+    """
+
+    def __init__(self, hf_tok, stop: bool = True):
+        self.hf_tok = hf_tok
+        self.stop = stop
+        self.rows = None  # per sequence: [depth, in_string, escaped, closed, n_tokens]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.rows is None:
+            self.rows = [[0, False, False, False, 0] for _ in range(input_ids.shape[0])]
+        for row, tok in zip(self.rows, input_ids[:, -1].tolist()):
+            if row[3]:
+                if not self.stop and row[3] is True:  # count the EOS step the early stop saves
+                    row[3], row[4] = "eos", row[4] + 1
+                continue
+            row[4] += 1
+            for ch in self.hf_tok.decode([tok]):
+                if row[1]:
+                    if row[2]:
+                        row[2] = False
+                    elif ch == "\\":
+                        row[2] = True
+                    elif ch == '"':
+                        row[1] = False
+                elif ch == '"':
+                    row[1] = True
+                elif ch == "{":
+                    row[0] += 1
+                elif ch == "}":
+                    row[0] -= 1
+                    if row[0] == 0:
+                        row[3] = True
+                        break
+        done = [bool(row[3]) and self.stop for row in self.rows]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    @property
+    def n_tokens(self) -> list[int]:
+        return [row[4] for row in self.rows or []]
+
+
+class _RecordingProcessor:
+    """Outlines logits processor proxy that hands the constrained logits to a TokenLogprobs."""
+
+    def __init__(self, inner, recorder: "TokenLogprobs"):
+        self.inner = inner
+        self.recorder = recorder
+
+    def __call__(self, input_ids, logits):
+        out = self.inner(input_ids, logits)
+        self.recorder._last = torch.log_softmax(out.float(), dim=-1)
+        return out
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class TokenLogprobs(StoppingCriteria):
+    """
+    Log-probability of every generated token under the constrained (masked)
+    distribution. The generator's logits processor is wrapped (see `wrap`) to
+    keep the last step's log-softmax; as a stopping criterion that never
+    stops, this then pairs it with the token that was actually chosen.
+    """
+
+    def __init__(self):
+        self._last = None
+        self.rows = None  # per sequence: [[token_id, logprob], ...]
+
+    def wrap(self, generator):
+        """Same generator, with the recording processor in front of its compiled one."""
+        return type(generator).from_processor(generator.model, _RecordingProcessor(generator.logits_processor, self))
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.rows is None:
+            self.rows = [[] for _ in range(input_ids.shape[0])]
+        if self._last is not None:
+            ids = input_ids[:, -1]
+            logps = self._last.gather(1, ids[:, None].to(self._last.device))[:, 0].tolist()
+            for row, tok, lp in zip(self.rows, ids.tolist(), logps):
+                row.append([tok, lp])
+            self._last = None
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    def field_confidence(self, hf_tok, text: str, keys: list[str], row: int = 0) -> dict[str, float]:
+        """
+        {key: probability of the tokens spelling that key's value} for the
+        top-level JSON object in `text` (the decoded generation of `row`).
+        Keys the model left out (null by omission) get the probability of
+        the tokens that closed the object after the last value instead.
+        """
+        tokens = (self.rows or [[]])[row]
+        spans, prev, ids = [], 0, []
+        for tok, lp in tokens:  # character span of every token in the decoded text
+            ids.append(tok)
+            end = len(hf_tok.decode(ids, skip_special_tokens=True))
+            spans.append((prev, end, lp))
+            prev = end
+
+        def prob(start: int, end: int) -> float:
+            return math.exp(sum(lp for s, e, lp in spans if s < end and e > start))
+
+        values = _json_value_spans(text)
+        tail = max((end for _, end in values.values()), default=text.find("{") + 1)
+        return {k: prob(*values[k]) if k in values else prob(tail, len(text)) for k in keys}
+
+
+def _json_value_spans(text: str) -> dict[str, tuple[int, int]]:
+    """Character span of each top-level value in a JSON object string."""
+    dec = json.JSONDecoder()
+    spans = {}
+    i = text.find("{") + 1
+    if i == 0:
+        return spans
+    ws = " \t\r\n,"
+    while i < len(text):
+        while i < len(text) and text[i] in ws:
+            i += 1
+        if i >= len(text) or text[i] != '"':
+            break
+        key, i = dec.raw_decode(text, i)
+        while i < len(text) and text[i] in " \t\r\n:":
+            i += 1
+        try:
+            _, end = dec.raw_decode(text, i)
+        except ValueError:
+            break
+        spans[key] = (i, end)
+        i = end
+    return spans
+
 
 # Import Patient from its own module (no heavy deps)
 from Patient import Patient  # noqa: E402
@@ -43,31 +224,89 @@ _Patient = Patient
 
 from openai import OpenAI
 
+
+def _gated_out(Patient, keys: list[str]) -> bool:
+    """True when the group is a MASS/NME detail field whose gate is already closed."""
+    return ((keys[0] in lib.MASS_DEPENDENT_KEYS and not Patient.mass_gate)
+            or (keys[0] in lib.NME_DEPENDENT_KEYS and not Patient.nme_gate))
+
+
+def _assign_fields(Patient, keys: list[str], obj: dict):
+    """
+    Write a flat {key: value} result onto Patient, applying the same
+    MASS/NME gating as the one-key-per-call path.
+    """
+    if 'MASS' in keys:
+        Patient.default_gate(obj, 'MASS')
+        Patient.mass_gate = obj['MASS'] == 'Yes'
+    if 'NME' in keys:
+        Patient.default_gate(obj, 'NME')
+        Patient.nme_gate = obj['NME'] == 'Yes'
+
+    for key in keys:
+        if key in lib.MASS_DEPENDENT_KEYS and not Patient.mass_gate:
+            obj[key] = None
+        if key in lib.NME_DEPENDENT_KEYS and not Patient.nme_gate:
+            obj[key] = None
+        setattr(Patient, key, obj.get(key, None))
+    return Patient
+
+
+@dataclass(frozen=True)
+class FieldRequest:
+    """
+    Immutable state of one extraction call: the field group with its pydantic
+    field specs and prompt rules. Built per call and passed down explicitly,
+    so one extractor can serve many threads or tasks at once.
+    """
+    keys: tuple[str, ...]
+    include_fewshots: bool
+    field_spec: Mapping[str, tuple]
+    rules: Mapping[str, str]
+
+
+def field_request(keys: list[str], include_fewshots: bool = False, fewshot_index=None) -> FieldRequest:
+    """FieldRequest for `keys`; with a fewshot_index the rules leave out `_fewshots` (retrieved per report)."""
+    classes = {k: lib.get_class_by_key(k) for k in keys}
+    static_fewshots = include_fewshots and fewshot_index is None
+    return FieldRequest(
+        keys=tuple(keys),
+        include_fewshots=bool(include_fewshots),
+        field_spec=MappingProxyType({k: c._field_spec for k, c in classes.items()}),
+        rules=MappingProxyType({k: c._prompt + c._fewshots if static_fewshots else c._prompt
+                                for k, c in classes.items()}),
+    )
+
+
 class OpenAIReportExtractor(Patient):
-    def __init__(self, model_id: str = "gpt-4.1"):
-        self.client = OpenAI()
+    def __init__(self, model_id: str = "gpt-4.1", section_pruning: bool = False, client: OpenAI | None = None,
+                 response_cache: ResponseCache | None = None, fewshot_index: FewShotIndex | None = None,
+                 fewshot_k: int = 2):
+        self.client = client or OpenAI()
         self.model_id = model_id
+        self.section_pruning = section_pruning  # send only the sections the fields need
+        self.response_cache = response_cache    # answers keyed by the full request body
+        self.fewshot_index = fewshot_index      # include_fewshots → top-k retrieved examples only
+        self.fewshot_k = fewshot_k
+        self.request = None                     # last FieldRequest made by set_keys (old callers)
 
-    def set_keys(self, keys: list[str], include_fewshots: bool = False):
-        self.include_fewshots = include_fewshots
-        self.keys = keys
-        for key in self.keys: setattr(Patient, key, None)
-        self.FIELDS_SPEC = {
-            **{k: lib.get_class_by_key(k)._field_spec for k in self.keys},
-        }
-        self._PROMPT_FIELD_RULES = {
-            **{k: lib.get_class_by_key(k)._prompt + lib.get_class_by_key(k)._fewshots if self.include_fewshots else lib.get_class_by_key(k)._prompt for k in self.keys},
-        }
+    def request_for(self, keys: list[str], include_fewshots: bool = False) -> FieldRequest:
+        return field_request(keys, include_fewshots, self.fewshot_index)
+
+    def set_keys(self, keys: list[str], include_fewshots: bool = False) -> FieldRequest:
+        """request_for, also kept in `self.request` for old single-threaded callers; pass it on explicitly."""
+        self.request = self.request_for(keys, include_fewshots)
+        return self.request
 
-    def build_prompt(self, report: str) -> str:
+    def build_prompt(self, report: str, request: FieldRequest) -> str:
+        if self.section_pruning:
+            report = lib.select_sections(report, request.keys)
         lines = [
             "Task: Read the medical report (may be in Greek) and extract ONLY the following if present:"
             ]
-        for k in self.keys:
-            lines.append(self._PROMPT_FIELD_RULES[k])
-        fields_stub = []
-        for k in self.keys:
-            fields_stub = [lib.get_class_by_key(k)._field_stub for k in self.keys]
+        for k in request.keys:
+            lines.append(request.rules[k] + self.retrieved_fewshots(k, report, request))
+        fields_stub = [lib.get_class_by_key(k)._field_stub for k in request.keys]
 
         lines += [
             "Output ONLY JSON:",
@@ -77,130 +316,236 @@ class OpenAIReportExtractor(Patient):
         ]
         return "\n".join(lines)
     
-    def make_model(self):
-        fields = {k: self.FIELDS_SPEC[k] for k in self.keys}
-        return create_model("ExtractSelected", **fields)
+    def make_model(self, request: FieldRequest):
+        return create_model("ExtractSelected", **request.field_spec)
+
+    def retrieved_fewshots(self, key: str, report: str, request: FieldRequest) -> str:
+        """Top-k few-shot block for `key` from fewshot_index ("" unless include_fewshots)."""
+        if not request.include_fewshots or self.fewshot_index is None:
+            return ""
+        return self.fewshot_index.block(key, report, self.fewshot_k)
+
+    def response_request(self, prompt: str, DynModel, max_output_tokens: int = 256) -> dict:
+        """Responses API arguments (strict json_schema) for one prompt; also the Batch API body."""
+        schema = lib._openai_strict_schema(DynModel.model_json_schema())
+        return {
+            "model": self.model_id,
+            "input": prompt,
+            "max_output_tokens": max_output_tokens,
+            "text": {
+                "format": {
+                    "type": "json_schema",
+                    "name": "extract_selected",
+                    "schema": schema,
+                    "strict": True,
+                }
+            },
+        }
+
+    def _complete(self, prompt: str, DynModel, max_output_tokens: int = 256) -> dict:
+        request = self.response_request(prompt, DynModel, max_output_tokens)
+        key = self.response_cache.key(**request) if self.response_cache is not None else None
+        cached = self.response_cache.get(key) if key is not None else None
+        text = cached if cached is not None else self.client.responses.create(**request).output_text
+        obj = DynModel.model_validate(json.loads(text)).model_dump()
+        if key is not None and cached is None:
+            self.response_cache.put(key, text, model=self.model_id)
+        return obj
+
+    def extract_all_fields(self, Patient, keys: list[str], include_fewshots: bool = False):
+        """
+        Single-pass mode: extract every key in one structured response.
+        MASS/NME dependent fields are nested under optional "mass"/"nme" objects.
+        """
+        DynModel = lib.make_single_pass_model(keys)
+        prompt = lib.build_single_pass_prompt(keys, Patient.report_text, include_fewshots,
+                                              self.fewshot_index, self.fewshot_k)
+        obj = self._complete(prompt, DynModel, max_output_tokens=1024)
+        return _assign_fields(Patient, keys, lib.flatten_single_pass(obj, keys))
 
     def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False) -> dict:
-        self.set_keys(keys, include_fewshots=include_fewshots)
+        request = self.request_for(keys, include_fewshots)
 
         
 
         if not Patient.mass_gate:
-            if 'massDiameter' == self.keys[0]: setattr(Patient, 'massDiameter', None)
-            if 'massMargins' == self.keys[0]: setattr(Patient, 'massMargins', None)
-            if 'massInternalEnhancement' == self.keys[0]: setattr(Patient, 'massInternalEnhancement', None)
-
-            if 'massDiameter' == self.keys[0] or 'massMargins' == self.keys[0] or 'massInternalEnhancement' == self.keys[0]:
-                Patient.post_process()
+            if 'massDiameter' == keys[0]: setattr(Patient, 'massDiameter', None)
+            if 'massMargins' == keys[0]: setattr(Patient, 'massMargins', None)
+            if 'massInternalEnhancement' == keys[0]: setattr(Patient, 'massInternalEnhancement', None)
 
+            if 'massDiameter' == keys[0] or 'massMargins' == keys[0] or 'massInternalEnhancement' == keys[0]:
                 return Patient
             
         if not Patient.nme_gate:
-            if 'nmeDiameter' == self.keys[0]: setattr(Patient, 'nmeDiameter', None)
-            if 'nmeMargins' == self.keys[0]: setattr(Patient, 'nmeMargins', None)
-            if 'nmeInternalEnhancement' == self.keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
-
-            if 'nmeDiameter' == self.keys[0] or 'nmeMargins' == self.keys[0] or 'nmeInternalEnhancement' == self.keys[0]:
-                Patient.post_process()
+            if 'nmeDiameter' == keys[0]: setattr(Patient, 'nmeDiameter', None)
+            if 'nmeMargins' == keys[0]: setattr(Patient, 'nmeMargins', None)
+            if 'nmeInternalEnhancement' == keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
 
+            if 'nmeDiameter' == keys[0] or 'nmeMargins' == keys[0] or 'nmeInternalEnhancement' == keys[0]:
                 return Patient
 
 
-        DynModel = self.make_model()
-        schema = DynModel.model_json_schema()
-        schema["additionalProperties"] = False  # flat object => enforce no extra keys
+        DynModel = self.make_model(request)
+        obj = self._complete(self.build_prompt(Patient.report_text, request), DynModel)
 
-        main_prompt = self.apply_chat_template(self.build_prompt(Patient.report_text))
-        out = self.model(main_prompt, DynModel, max_new_tokens=320, do_sample=False)
-        obj = DynModel.model_validate_json(out).model_dump()
-
-        if 'MASS' in self.keys:
-            if obj.get('MASS') is None: obj['MASS'] = 'No'
+        if 'MASS' in keys:
+            Patient.default_gate(obj, 'MASS')
             Patient.mass_gate = True if obj.get('MASS', None)=='Yes' else False
-        if 'NME' in self.keys:
-            if obj.get('NME') is None: obj['NME'] = 'No'
+        if 'NME' in keys:
+            Patient.default_gate(obj, 'NME')
             Patient.nme_gate = True if obj.get('NME', None)=='Yes' else False
         
         
-        if 'massDiameter' == self.keys[0] and not Patient.mass_gate:
+        if 'massDiameter' == keys[0] and not Patient.mass_gate:
             obj['massDiameter'] = None
-        if 'massMargins' == self.keys[0] and not Patient.mass_gate:
+        if 'massMargins' == keys[0] and not Patient.mass_gate:
             obj['massMargins'] = None
-        if 'massInternalEnhancement' == self.keys[0] and not Patient.mass_gate:
+        if 'massInternalEnhancement' == keys[0] and not Patient.mass_gate:
             obj['massInternalEnhancement'] = None
             # return Patient
         
-        if 'nmeDiameter' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeDiameter' == keys[0] and not Patient.nme_gate:
             obj['nmeDiameter'] = None
             # Patient.nmeDiameter = None
-        if 'nmeMargins' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeMargins' == keys[0] and not Patient.nme_gate:
             obj['nmeMargins'] = None
-        if 'nmeInternalEnhancement' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeInternalEnhancement' == keys[0] and not Patient.nme_gate:
             obj['nmeInternalEnhancement'] = None
         
-        # if 'massDiameter' in self.keys and not Patient.mass_gate:
+        # if 'massDiameter' in keys and not Patient.mass_gate:
         #     Patient.massDiameter = None
 
-        # if 'nmeDiameter' in self.keys and not Patient.nme_gate:
+        # if 'nmeDiameter' in keys and not Patient.nme_gate:
         #     Patient.nmeDiameter = None
 
-        for key in self.keys:
+        for key in keys:
             setattr(Patient, key, obj.get(key, None))
 
-        Patient.post_process()
-
         return Patient
 
 
 class ReportExtractor(Patient):
-    def __init__(self, MODEL_ID):
+    def __init__(self, MODEL_ID, prompt_layout: str = "rules_first", index_cache_dir=INDEX_CACHE_DIR,
+                 device: str = "cuda", cpu_precision: str = "auto", num_threads: int | None = None,
+                 enum_scoring: bool = False, token_budgets: bool = True, section_pruning: bool = False,
+                 response_cache: ResponseCache | None = None, logprob_confidence: bool = False,
+                 fewshot_index: FewShotIndex | None = None, fewshot_k: int = 2,
+                 fast_tokenizer: bool = False, token_cache_dir=None, kv_cache_dir=None):
         """
         Initializes the ReportExtractor with a list of keys.
         Args:
             keys (list[str]): A list of string keys used to configure field extraction.
+            prompt_layout (str): "rules_first" (field rules, then report),
+                "report_first" (report, then field rules) or "instructions_first"
+                (the report-independent instructions, then any retrieved few-shots,
+                then the report). "report_first" lets all field groups of one report
+                share the KV cache of the report prefix; "instructions_first" lets
+                all reports share the KV cache of one field group's instructions.
+            index_cache_dir: Directory for compiled outlines indexes shared across
+                processes (None keeps the cache in memory only).
+            device (str): "cuda" (fp16, device_map="auto") or "cpu".
+            cpu_precision (str): "auto" | "bf16" | "fp32" | "int8" weights on CPU; "auto"
+                picks bf16 only when the CPU supports it natively, "int8" loads in bf16
+                and dynamically quantizes the Linear layers (~1/4 of the fp32 memory).
+            num_threads (int): torch intra-op threads on CPU (default: all cores).
+            enum_scoring (bool): For single-key groups over a closed value set (Yes/No,
+                BPE, margins, CurveMorphology, BIRADS 0..6, ...), score every allowed
+                value (and null) by likelihood instead of generating JSON; the
+                winner's probability goes to Patient.field_confidence.
+            token_budgets (bool): Cap max_new_tokens per field group at a budget derived
+                from the fields' `_field_spec` and stop as soon as the JSON closes.
+                False restores the fixed 320-token limit.
+            section_pruning (bool): Send only the report sections the fields read from
+                (their `_sections`), or the full report when those cannot be parsed.
+                Pruned prompts no longer share a report prefix across groups.
+            response_cache (ResponseCache): Persistent answer cache keyed by model,
+                precision, prompt, schema and decoding parameters; hits skip generation.
+            logprob_confidence (bool): Record the log-probability of the generated
+                tokens and put each field's value probability in Patient.field_confidence.
+            fewshot_index (FewShotIndex): With include_fewshots=True, insert only the
+                `fewshot_k` examples per field that best match the report instead of
+                the whole `_fewshots` block.
+            fast_tokenizer (bool): Load the Rust (fast) tokenizer instead of the slow
+                one; check it with TokenCache.check_tokenizer_parity first.
+            token_cache_dir: Directory of the persistent token-id cache of the
+                chat-templated report prefixes (see TokenCache.py); None disables it.
+            kv_cache_dir: Directory where the "instructions_first" prefix KV caches
+                are saved and reloaded across processes (None: memory only).
         Attributes:
-            keys (list[str]): Stores the provided keys.
-            FIELDS_SPEC (dict): Specification for fields, including type and validation rules.
-            _PROMPT_FIELD_RULES (dict): Mapping of keys to their corresponding prompt rules, 
-                constructed by merging prompt rules from classes obtained via lib.get_class_by_key.
+            request (FieldRequest): Last field group made by set_keys, for old
+                single-threaded callers. Nothing reads it: the prompt and generation
+                methods take their FieldRequest as an argument and the extract methods
+                build their own per call, so one extractor can be shared by many threads.
         """
+        if prompt_layout not in ("rules_first", "report_first", "instructions_first"):
+            raise ValueError(f"Unknown prompt_layout: {prompt_layout!r}")
+        if device not in ("cuda", "cpu"):
+            raise ValueError(f"Unknown device: {device!r}")
+        if cpu_precision not in ("auto", "bf16", "fp32", "int8"):
+            raise ValueError(f"Unknown cpu_precision: {cpu_precision!r}")
         self.MODEL_ID = MODEL_ID
+        self.prompt_layout = prompt_layout
+        self.device = device
+        self.enum_scoring = enum_scoring
+        self.token_budgets = token_budgets
+        self.section_pruning = section_pruning
+        self.response_cache = response_cache
+        self.logprob_confidence = logprob_confidence
+        self.fewshot_index = fewshot_index
+        self.fewshot_k = fewshot_k
+        self._budgets: dict[tuple, int] = {}
+        self.token_counts: dict[tuple, list[int]] = {}  # field group -> generated tokens per call
+        # prefix_text -> (prefix_ids, DynamicCache) of the last reports (one per concurrent thread)
+        self._prefix_cache: OrderedDict[str, tuple] = OrderedDict()
+        self.report_prefix_slots = 8
+        self._kv_lock = threading.RLock()  # guards _prefix_cache / instruction_caches across threads
+        self._stats_lock = threading.Lock()
+        self.request = None
+
+        if device == "cuda":
+            assert torch.cuda.is_available(), "CUDA GPU not found. Use device='cpu'."
+            load_kwargs = dict(dtype=torch.float16, device_map="auto")
+        else:
+            torch.set_num_threads(num_threads or os.cpu_count())
+            dtype = torch.bfloat16 if cpu_precision == "int8" else cpu_dtype(cpu_precision)
+            load_kwargs = dict(dtype=dtype, device_map="cpu", low_cpu_mem_usage=True)
+
         self.hf_model = AutoModelForCausalLM.from_pretrained(
             self.MODEL_ID,
-            dtype=torch.float16,
             cache_dir=str(CACHE_DIR),
             trust_remote_code=True,
-            device_map="auto",
             temperature=0.0,
+            **load_kwargs,
         )
+        if device == "cpu" and cpu_precision == "int8":
+            self.hf_model = quantize_int8(self.hf_model)
+        self.hf_model.eval()
+        self.precision = "int8" if device == "cpu" and cpu_precision == "int8" else str(self.hf_model.dtype)
         self.hf_tok = AutoTokenizer.from_pretrained(self.MODEL_ID,
-                                            use_fast=False,
+                                            use_fast=fast_tokenizer,
                                             cache_dir=str(CACHE_DIR),
                                             trust_remote_code=True)
+        self.token_cache = TokenCache(self.hf_tok, token_cache_dir) if token_cache_dir else None
+        self.instruction_caches = PrefixKVCache(self.hf_model, f"{self.MODEL_ID}:{self.precision}",
+                                                cache_dir=kv_cache_dir)
         self.model = outlines.from_transformers(self.hf_model, self.hf_tok)
-        print("Model loaded:", self.MODEL_ID)       
+        self.generators = GeneratorCache(self.model, cache_dir=index_cache_dir)
+        print("Model loaded:", self.MODEL_ID, "on", self.device, self.precision)
     
-    def set_keys(self, keys: list[str], include_fewshots: bool = False):
-
-        self.include_fewshots = include_fewshots
-        
-        self.keys = keys
-
-        for key in self.keys: setattr(Patient, key, None)
+    def request_for(self, keys: list[str], include_fewshots: bool = False) -> FieldRequest:
+        return field_request(keys, include_fewshots, self.fewshot_index)
 
+    def set_keys(self, keys: list[str], include_fewshots: bool = False) -> FieldRequest:
+        """request_for, also kept in `self.request` for old single-threaded callers; pass it on explicitly."""
+        self.request = self.request_for(keys, include_fewshots)
+        return self.request
 
-        # print("Extracting fields:", self.keys, getattr(Patient, key))
-
-        self.FIELDS_SPEC = {
-            **{k: lib.get_class_by_key(k)._field_spec for k in self.keys},
-        }
-        
-        self._PROMPT_FIELD_RULES = {
-            **{k: lib.get_class_by_key(k)._prompt + lib.get_class_by_key(k)._fewshots if self.include_fewshots else lib.get_class_by_key(k)._prompt for k in self.keys},
-        }
-
-    def build_prompt(self, report: str) -> str:
+    def build_prompt(self, report: str, request: FieldRequest) -> str:
+        if self.section_pruning:
+            report = lib.select_sections(report, request.keys)
+        if self.prompt_layout == "instructions_first":
+            fewshots = "".join(self.retrieved_fewshots(k, report, request) for k in request.keys)
+            return self.instruction_block(request) + fewshots + f'Report:\n"""\n{report}\n"""\nJSON:'
         lines = [
             "Task: Read the medical report (may be in Greek) and extract ONLY the following if present:"
             # "Task: Read the breast MRI medical report (may be in Greek) and extract ONLY the the requested fields:"
@@ -210,11 +555,19 @@ class ReportExtractor(Patient):
             # "- Return null unless there is an explicit cue in the text. Do not infer.",
             # "- Follow each field’s rule exactly."
             ]
-        for k in self.keys:
-            lines.append(self._PROMPT_FIELD_RULES[k])
-        fields_stub = []
-        for k in self.keys:
-            fields_stub = [lib.get_class_by_key(k)._field_stub for k in self.keys]
+        for k in request.keys:
+            lines.append(request.rules[k] + self.retrieved_fewshots(k, report, request))
+        fields_stub = [lib.get_class_by_key(k)._field_stub for k in request.keys]
+
+        if self.prompt_layout == "report_first":
+            lines[0] = "Task: Read the medical report above (may be in Greek) and extract ONLY the following if present:"
+            lines += [
+                "Output ONLY JSON:",
+                "{ " + ", ".join(fields_stub) + " }",
+                "If an item is missing, return null. No extra keys.",
+                "JSON:"
+            ]
+            return self.report_block(report) + "\n".join(lines)
 
         lines += [
             "Output ONLY JSON:",
@@ -224,6 +577,25 @@ class ReportExtractor(Patient):
         ]
         return "\n".join(lines)
 
+    def instruction_block(self, request: FieldRequest) -> str:
+        """
+        Report-independent head of the "instructions_first" prompt: task line,
+        field rules (with the static few-shots) and JSON stub.
+        """
+        lines = ["Task: Read the medical report (may be in Greek) and extract ONLY the following if present:"]
+        lines += [request.rules[k] for k in request.keys]
+        lines += [
+            "Output ONLY JSON:",
+            "{ " + ", ".join(lib.get_class_by_key(k)._field_stub for k in request.keys) + " }",
+            "If an item is missing, return null. No extra keys.\n",
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def report_block(report: str) -> str:
+        """Report section that opens the prompt in the "report_first" layout."""
+        return f'Report:\n"""\n{report}\n"""\n\n'
+
     def apply_chat_template(self, text: str) -> str:
         if hasattr(self.hf_tok, "apply_chat_template"):
             return self.hf_tok.apply_chat_template(
@@ -233,75 +605,536 @@ class ReportExtractor(Patient):
             )
         return text
 
-    def make_model(self):
-        fields = {k: self.FIELDS_SPEC[k] for k in self.keys}
-        return create_model("ExtractSelected", **fields)
+    def make_model(self, request: FieldRequest):
+        return create_model("ExtractSelected", **request.field_spec)
+
+    def retrieved_fewshots(self, key: str, report: str, request: FieldRequest) -> str:
+        """Top-k few-shot block for `key` from fewshot_index ("" unless include_fewshots)."""
+        if not request.include_fewshots or self.fewshot_index is None:
+            return ""
+        return self.fewshot_index.block(key, report, self.fewshot_k)
+
+    # ------------------------------------------------------------------
+    # Generation (with report-prefix KV reuse)
+    # ------------------------------------------------------------------
+
+    def _encode(self, text: str):
+        return self.hf_tok(text, return_tensors="pt")["input_ids"].to(self.hf_model.device)
+
+    def _encode_cached(self, text: str):
+        """_encode through the token cache (when attached)."""
+        if self.token_cache is None:
+            return self._encode(text)
+        ids = torch.tensor(self.token_cache.ids(text), dtype=torch.long)
+        return ids.unsqueeze(0).to(self.hf_model.device)
+
+    def fed_prompt(self, main_prompt: str) -> str:
+        """
+        The text the outlines generator actually tokenizes for `main_prompt`: its
+        type adapter applies the chat template to the (already templated) prompt
+        string once more. Prefix KV caches reused by generate() must be built
+        from, and matched against, this text.
+        """
+        return self.model.type_adapter.format_input(main_prompt)
+
+    def report_prefix(self, report: str) -> str:
+        """Generator input text up to the end of the report block ("report_first" layout)."""
+        block = self.report_block(report)
+        text = self.fed_prompt(self.apply_chat_template(block))
+        return text[:text.find(block) + len(block)]
+
+    def _splice_ids(self, prefix_ids, prefix_text: str, text: str):
+        """
+        Token ids of `text`, which starts with `prefix_text` (tokenized as
+        `prefix_ids`): the prefix ids followed by an encode of the suffix alone.
+        The last SPLICE_WINDOW prefix tokens are encoded again with the suffix;
+        if a merge across the boundary changes them, `text` is encoded whole.
+        """
+        k = min(SPLICE_WINDOW, prefix_ids.shape[1])
+        head = self.hf_tok.decode(prefix_ids[0, -k:])
+        if prefix_text.endswith(head):
+            tail = self.hf_tok(head + text[len(prefix_text):], add_special_tokens=False,
+                               return_tensors="pt")["input_ids"].to(prefix_ids.device)
+            if tail.shape[1] > k and torch.equal(tail[0, :k], prefix_ids[0, -k:]):
+                return torch.cat([prefix_ids[:, :-k], tail], dim=1)
+        return self._encode(text)
+
+    def prompt_ids(self, text: str, report: str | None = None):
+        """
+        Token ids of `text` (the prompt exactly as the model is given it). With a
+        token cache in the "report_first" layout, the report prefix ids come from
+        the cache and only the field-group suffix is tokenized.
+        """
+        if self.token_cache is not None and self.prompt_layout == "report_first" and report is not None:
+            block = self.report_block(report)
+            end = text.find(block)
+            if end >= 0:
+                prefix_text = text[:end + len(block)]
+                return self._splice_ids(self._encode_cached(prefix_text), prefix_text, text)
+        return self._encode(text)
+
+    @torch.no_grad()
+    def report_prefix_cache(self, report: str, text: str):
+        """
+        Prefill the report prefix of `text` (the prompt exactly as the model is
+        given it) once per report and keep its KV cache. Returns (prefix_len,
+        cache, prompt_ids), or None when the tokenized text does not start with
+        the tokenized prefix (the generation then runs a full prefill as before).
+        prompt_ids are the token ids of `text`, spliced from the prefix ids and
+        the tokenized suffix (see _splice_ids).
+        """
+        block = self.report_block(report)
+        end = text.find(block)
+        if end < 0:
+            return None
+        prefix_text = text[:end + len(block)]
+
+        entry = self._prefix_cache.get(prefix_text)
+        if entry is None:
+            prefix_ids = self._encode_cached(prefix_text)
+            out = self.hf_model(input_ids=prefix_ids, use_cache=True)
+            entry = self._prefix_cache[prefix_text] = (prefix_ids, out.past_key_values)
+            while len(self._prefix_cache) > self.report_prefix_slots:
+                self._prefix_cache.popitem(last=False)
+        self._prefix_cache.move_to_end(prefix_text)
+
+        prefix_ids, cache = entry
+        return self._reuse_prefix(prefix_ids, cache, prefix_text, text)
+
+    def instruction_prefix_cache(self, text: str, request: FieldRequest):
+        """
+        KV cache of the instruction head of `text` (the prompt exactly as the
+        model is given it) in the "instructions_first" layout, prefilled once
+        per field group (see PrefixKVCache.py).
+        Returns (prefix_len, cache, prompt_ids) or None, like report_prefix_cache.
+        """
+        block = self.instruction_block(request)
+        end = text.find(block)
+        if end < 0:
+            return None
+        prefix_text = text[:end + len(block)]
+        prefix_ids, cache = self.instruction_caches.get(prefix_text, self._encode)
+        return self._reuse_prefix(prefix_ids, cache, prefix_text, text)
+
+    def prefix_hit(self, text: str, report: str | None, request: FieldRequest | None):
+        """
+        The reusable prefix of `text` for the current layout: (prefix_len, cache,
+        prompt_ids) or None. `text` is the prompt exactly as the model is given it:
+        fed_prompt(main_prompt) for the outlines generator, the chat-templated
+        prompt itself for direct forward passes (score_candidates). Prompts built
+        without a field request (single-pass) are a miss.
+        """
+        if self.prompt_layout == "report_first" and report is not None:
+            return self.report_prefix_cache(report, text)
+        if self.prompt_layout == "instructions_first" and request is not None:
+            return self.instruction_prefix_cache(text, request)
+        return None
+
+    def fork_prefix(self, text: str, report: str | None, request: FieldRequest | None):
+        """
+        Private copy of the reusable prefix KV cache of `text`, cropped to the
+        matched length: (prefix_len, cache, prompt_ids) or None. The shared caches are only
+        touched under the lock (lookup / prefill and copy); decoding then runs
+        on the copy, so threads sharing the extractor generate concurrently.
+        """
+        if self.prompt_layout == "rules_first":
+            return None
+        with self._kv_lock:
+            hit = self.prefix_hit(text, report, request)
+            if hit is None:
+                return None
+            n, cache, prompt_ids = hit[0], copy.deepcopy(hit[1]), hit[2]
+        cache.crop(n)
+        return n, cache, prompt_ids
+
+    def _reuse_prefix(self, prefix_ids, cache, prefix_text: str, text: str):
+        prompt_ids = self._splice_ids(prefix_ids, prefix_text, text)
+        # BPE can merge across the prefix/suffix boundary; reuse only the exact
+        # match, and always leave at least one prompt token to prefill.
+        m = min(cache.get_seq_length(), prompt_ids.shape[1] - 1)
+        same = prompt_ids[0, :m] == prefix_ids[0, :m]
+        n = m if bool(same.all()) else int(same.long().argmin())
+        if n == 0:
+            return None
+        return n, cache, prompt_ids  # the shared cache is left whole; fork_prefix crops its copy
+
+    def _generate_ids(self, generator, input_ids, attention_mask=None, **kwargs) -> list[str]:
+        """
+        What the outlines generator does after tokenizing its prompt (reset the
+        logits processor, hf generate, decode the new tokens), for prompts whose
+        token ids are already known. One decoded string per row of `input_ids`.
+        """
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        generator.logits_processor.reset()
+        out = self.hf_model.generate(input_ids=input_ids, attention_mask=attention_mask,
+                                     logits_processor=LogitsProcessorList([generator.logits_processor]), **kwargs)
+        return self.hf_tok.batch_decode(out[:, input_ids.shape[1]:], skip_special_tokens=True)
+
+    # ------------------------------------------------------------------
+    # Token budgets
+    # ------------------------------------------------------------------
+
+    def _n_tokens(self, text: str) -> int:
+        return len(self.hf_tok(text, add_special_tokens=False)["input_ids"])
+
+    def field_token_budget(self, key: str) -> int:
+        """Tokens of the longest legal `"key": value` pair of one field."""
+        name = self._n_tokens(json.dumps(key) + ": ")
+        candidates = lib.enum_candidates(key)
+        if candidates is None:
+            return name + FREE_TEXT_TOKENS
+        return name + max(self._n_tokens(json.dumps(c, ensure_ascii=False)) for c in candidates)
+
+    def token_budget(self, keys: list[str]) -> int:
+        """max_new_tokens for one JSON object holding `keys` (320 when budgets are off)."""
+        if not self.token_budgets:
+            return 320
+        key = tuple(keys)
+        if key not in self._budgets:
+            self._budgets[key] = sum(self.field_token_budget(k) for k in keys) + len(keys) + BUDGET_SLACK
+        return self._budgets[key]
+
+    def _record_tokens(self, tag: tuple, criteria: JsonCloseCriteria):
+        with self._stats_lock:
+            self.token_counts.setdefault(tag, []).extend(criteria.n_tokens)
+
+    def token_stats(self) -> dict:
+        """Generated-token distribution per field group: n, mean, p50, p95, max, budget."""
+        stats = {}
+        for tag, counts in self.token_counts.items():
+            c = sorted(counts)
+            stats[tag] = {
+                "n": len(c),
+                "mean": sum(c) / len(c),
+                "p50": c[len(c) // 2],
+                "p95": c[min(len(c) - 1, int(0.95 * len(c)))],
+                "max": c[-1],
+                "budget": self._budgets.get(tag, 320) if self.token_budgets else 320,
+            }
+        return stats
+
+    def log_token_stats(self):
+        print(f"Generated tokens per field group (token_budgets={self.token_budgets}):")
+        for tag, st in self.token_stats().items():
+            print(f"  {'+'.join(tag):<28} n={st['n']:<5} mean={st['mean']:6.1f} p50={st['p50']:<4} "
+                  f"p95={st['p95']:<4} max={st['max']:<4} budget={st['budget']}")
+
+    # ------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, main_prompt: str, DynModel, **params) -> str | None:
+        """Response-cache key of one answer (None when no cache is attached)."""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.key(
+            model=self.MODEL_ID,
+            precision=self.precision,
+            prompt=main_prompt,
+            schema=DynModel.model_json_schema(),
+            params=params,
+        )
+
+    def _decoding_params(self, max_new_tokens: int) -> dict:
+        params = {"max_new_tokens": max_new_tokens, "do_sample": False, "stop_on_close": self.token_budgets}
+        if self.logprob_confidence:
+            params["logprobs"] = True  # cached as {"out", "logprobs"} instead of the bare text
+        return params
+
+    def _cache_get(self, cache_key: str | None, logprobs: TokenLogprobs | None = None, row: int = 0):
+        """Cached generation for `cache_key` (restoring its token log-probs into `logprobs`), or None."""
+        if cache_key is None:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if cached is None or logprobs is None:
+            return cached
+        entry = json.loads(cached)
+        if logprobs.rows is None:
+            logprobs.rows = []
+        logprobs.rows += [[] for _ in range(row + 1 - len(logprobs.rows))]
+        logprobs.rows[row] = entry["logprobs"]
+        return entry["out"]
+
+    def _cache_put(self, cache_key: str | None, out: str, logprobs: TokenLogprobs | None = None, row: int = 0):
+        if cache_key is None:
+            return
+        if logprobs is not None:
+            out = json.dumps({"out": out, "logprobs": logprobs.rows[row]})
+        self.response_cache.put(cache_key, out, model=self.MODEL_ID)
+
+    def generate(self, main_prompt: str, generator, request: FieldRequest | None, report: str | None = None,
+                 max_new_tokens: int = 320, tag: tuple | None = None, cache_key: str | None = None,
+                 logprobs: TokenLogprobs | None = None) -> str:
+        """
+        Constrained generation of one JSON object, stopped as soon as the object
+        closes when token budgets are on. In the "report_first" layout the shared
+        report prefix is served from its KV cache and only the field-group suffix
+        is tokenized and prefilled; in "instructions_first" the instruction block
+        of `request` is, and only the report is (`request` is None for prompts
+        built without one, e.g. single-pass). `tag` names the field group in
+        `token_counts`; with a `cache_key` the answer is looked up in / stored to
+        the response cache; `logprobs` receives the generated tokens' log-probabilities.
+        """
+        out = self._cache_get(cache_key, logprobs)
+        if out is not None:
+            return out
+        criteria = JsonCloseCriteria(self.hf_tok, stop=self.token_budgets)
+        kwargs = {"stopping_criteria": StoppingCriteriaList([criteria])}
+        if logprobs is not None:
+            generator = logprobs.wrap(generator)
+            kwargs["stopping_criteria"].append(logprobs)
+        hit = self.fork_prefix(self.fed_prompt(main_prompt), report, request)
+        if hit is None:
+            out = generator(main_prompt, max_new_tokens=max_new_tokens, do_sample=False, **kwargs)
+        else:
+            _, cache, ids = hit
+            out = self._generate_ids(generator, ids, past_key_values=cache, max_new_tokens=max_new_tokens,
+                                     do_sample=False, **kwargs)[0]
+        if tag is not None:
+            self._record_tokens(tag, criteria)
+        self._cache_put(cache_key, out, logprobs)
+        return out
+
+    def _generate_validated(self, main_prompt: str, generator, DynModel, keys: list[str], request: FieldRequest,
+                            report: str | None = None, tag: tuple | None = None,
+                            field_confidence: dict | None = None) -> dict:
+        """
+        generate() under the group's token budget; retries at 320 if the budget
+        truncated the JSON. With logprob_confidence, the value probability of
+        each field is written to `field_confidence`.
+        """
+        budget = self.token_budget(keys)
+        logprobs = TokenLogprobs() if self.logprob_confidence else None
+        out = self.generate(main_prompt, generator, request, report=report, max_new_tokens=budget, tag=tag,
+                            cache_key=self._cache_key(main_prompt, DynModel, **self._decoding_params(budget)),
+                            logprobs=logprobs)
+        try:
+            obj = DynModel.model_validate_json(out).model_dump()
+        except ValueError:
+            if budget >= 320:
+                raise
+            print(f"[ReportExtractor] WARNING: budget {budget} truncated {tag}; retrying with 320 tokens")
+            logprobs = TokenLogprobs() if self.logprob_confidence else None
+            out = self.generate(main_prompt, generator, request, report=report, max_new_tokens=320, tag=tag,
+                                cache_key=self._cache_key(main_prompt, DynModel, **self._decoding_params(320)),
+                                logprobs=logprobs)
+            obj = DynModel.model_validate_json(out).model_dump()
+        if logprobs is not None and field_confidence is not None:
+            field_confidence.update(logprobs.field_confidence(self.hf_tok, out, keys))
+        return obj
+
+    @torch.no_grad()
+    def score_candidates(self, main_prompt: str, key: str, candidates: list, request: FieldRequest,
+                         report: str | None = None) -> dict:
+        """
+        Likelihood of each completed answer `{"<key>": <value>}` after the prompt.
+
+        The prompt is prefilled once (from the report- or instruction-prefix
+        cache when the layout allows), its KV cache is repeated per candidate,
+        and all candidate continuations are scored in one right-padded forward
+        pass. Returns {value: probability}, a softmax over the summed token log-probs.
+        """
+        hit = self.fork_prefix(main_prompt, report, request)
+        if hit is not None:
+            n, prefix, ids = hit
+            out = self.hf_model(input_ids=ids[:, n:], past_key_values=prefix, use_cache=True)
+        else:
+            ids = self._encode(main_prompt)
+            out = self.hf_model(input_ids=ids, use_cache=True)
+        first = torch.log_softmax(out.logits[0, -1].float(), dim=-1)
+        cache = out.past_key_values
+        P = ids.shape[1]
+
+        conts = [self.hf_tok(json.dumps({key: c}, ensure_ascii=False), add_special_tokens=False)["input_ids"]
+                 for c in candidates]
+        T = max(len(c) for c in conts)
+        pad = self.hf_tok.pad_token_id if self.hf_tok.pad_token_id is not None else 0
+        cont_ids = torch.full((len(conts), T), pad, dtype=torch.long, device=ids.device)
+        mask = torch.zeros(len(conts), P + T, dtype=torch.long, device=ids.device)
+        mask[:, :P] = 1
+        for i, c in enumerate(conts):
+            cont_ids[i, :len(c)] = torch.tensor(c)
+            mask[i, P:P + len(c)] = 1
+
+        cache.batch_repeat_interleave(len(conts))
+        logits = self.hf_model(
+            input_ids=cont_ids,
+            attention_mask=mask,
+            position_ids=torch.arange(P, P + T, device=ids.device).expand(len(conts), T),
+            past_key_values=cache,
+            use_cache=True,
+        ).logits.float()
+        logp = torch.log_softmax(logits, dim=-1)
+
+        scores = []
+        for i, c in enumerate(conts):
+            s = first[c[0]]
+            if len(c) > 1:
+                s = s + logp[i, torch.arange(len(c) - 1), torch.tensor(c[1:])].sum()
+            scores.append(s)
+        probs = torch.softmax(torch.stack(scores), dim=0).tolist()
+        return dict(zip(candidates, probs))
+
+    def extract_all_fields(self, Patient, keys: list[str], include_fewshots: bool = False,
+                           max_new_tokens: int | None = None):
+        """
+        Single-pass mode: one constrained generation per report for every key.
+        MASS/NME dependent fields are nested under optional "mass"/"nme" objects,
+        so the gate is decided before its details are generated.
+        """
+        DynModel, generator = self.generators.get(
+            keys, include_fewshots, lambda: lib.make_single_pass_model(keys), kind="single_pass")
+        prompt = self.apply_chat_template(
+            lib.build_single_pass_prompt(keys, Patient.report_text, include_fewshots,
+                                         self.fewshot_index, self.fewshot_k))
+        if max_new_tokens is None:
+            max_new_tokens = self.token_budget(keys) + 16 if self.token_budgets else 1024  # + nesting
+        out = self.generate(prompt, generator, None, max_new_tokens=max_new_tokens, tag=("single_pass",),
+                            cache_key=self._cache_key(prompt, DynModel, **self._decoding_params(max_new_tokens)))
+        obj = DynModel.model_validate_json(out).model_dump()
+        return _assign_fields(Patient, keys, lib.flatten_single_pass(obj, keys))
+
+    def extract_batch(self, patients: list, keys: list[str], include_fewshots: bool = False,
+                      batch_size: int = 8, max_new_tokens: int | None = None):
+        """
+        Extract one field group across many reports with padded batched generation.
+
+        Prompts are tokenized once (through prompt_ids, so a token cache serves the
+        report prefixes) and sorted by token length before batching so each batch
+        pads as little as possible; each result is written back to its own Patient with
+        the usual MASS/NME gating. Call once per group, in group order, so the
+        gate fields are decided for every report before their dependents run.
+        """
+        request = self.request_for(keys, include_fewshots)
+        DynModel, generator = self.generators.get(keys, include_fewshots, lambda: self.make_model(request))
+        if max_new_tokens is None:
+            max_new_tokens = self.token_budget(keys)
+
+        todo = []
+        for patient in patients:
+            if _gated_out(patient, keys):
+                _assign_fields(patient, keys, {})
+                continue
+            prompt = self.apply_chat_template(self.build_prompt(patient.report_text, request))
+            cache_key = self._cache_key(prompt, DynModel, **self._decoding_params(max_new_tokens))
+            logprobs = TokenLogprobs() if self.logprob_confidence else None
+            out = self._cache_get(cache_key, logprobs)
+            if out is not None:
+                if logprobs is not None:
+                    patient.field_confidence.update(logprobs.field_confidence(self.hf_tok, out, keys))
+                _assign_fields(patient, keys, DynModel.model_validate_json(out).model_dump())
+                continue
+            ids = self.prompt_ids(self.fed_prompt(prompt), patient.report_text)
+            todo.append((ids, patient, cache_key))
+        todo.sort(key=lambda t: t[0].shape[1])
+        pad = self.hf_tok.pad_token_id if self.hf_tok.pad_token_id is not None else self.hf_tok.eos_token_id
+
+        for i in range(0, len(todo), batch_size):
+            chunk = todo[i:i + batch_size]
+            criteria = JsonCloseCriteria(self.hf_tok, stop=self.token_budgets)
+            stopping = StoppingCriteriaList([criteria])
+            logprobs, batch_generator = None, generator
+            if self.logprob_confidence:
+                logprobs = TokenLogprobs()
+                batch_generator = logprobs.wrap(generator)
+                stopping.append(logprobs)
+            # left-padded like the outlines tokenizer pads a batch
+            width = max(ids.shape[1] for ids, _, _ in chunk)
+            input_ids = torch.full((len(chunk), width), pad, dtype=torch.long, device=self.hf_model.device)
+            mask = torch.zeros_like(input_ids)
+            for row, (ids, _, _) in enumerate(chunk):
+                input_ids[row, width - ids.shape[1]:] = ids[0]
+                mask[row, width - ids.shape[1]:] = 1
+            outs = self._generate_ids(batch_generator, input_ids, mask, max_new_tokens=max_new_tokens,
+                                      do_sample=False, stopping_criteria=stopping)
+            self._record_tokens(tuple(keys), criteria)
+            for row, ((_, patient, cache_key), out) in enumerate(zip(chunk, outs)):
+                obj = DynModel.model_validate_json(out).model_dump()
+                if logprobs is not None:
+                    # drop the steps this row spent padding after its JSON closed
+                    logprobs.rows[row] = logprobs.rows[row][:criteria.n_tokens[row]]
+                    patient.field_confidence.update(logprobs.field_confidence(self.hf_tok, out, keys, row=row))
+                self._cache_put(cache_key, out, logprobs, row=row)
+                _assign_fields(patient, keys, obj)
+
+        return len(todo)
 
     def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False) -> dict:
-        self.set_keys(keys, include_fewshots=include_fewshots)
+        request = self.request_for(keys, include_fewshots)
 
         
 
         if not Patient.mass_gate:
-            if 'massDiameter' == self.keys[0]: setattr(Patient, 'massDiameter', None)
-            if 'massMargins' == self.keys[0]: setattr(Patient, 'massMargins', None)
-            if 'massInternalEnhancement' == self.keys[0]: setattr(Patient, 'massInternalEnhancement', None)
-
-            if 'massDiameter' == self.keys[0] or 'massMargins' == self.keys[0] or 'massInternalEnhancement' == self.keys[0]:
-                Patient.post_process()
+            if 'massDiameter' == keys[0]: setattr(Patient, 'massDiameter', None)
+            if 'massMargins' == keys[0]: setattr(Patient, 'massMargins', None)
+            if 'massInternalEnhancement' == keys[0]: setattr(Patient, 'massInternalEnhancement', None)
 
+            if 'massDiameter' == keys[0] or 'massMargins' == keys[0] or 'massInternalEnhancement' == keys[0]:
                 return Patient
             
         if not Patient.nme_gate:
-            if 'nmeDiameter' == self.keys[0]: setattr(Patient, 'nmeDiameter', None)
-            if 'nmeMargins' == self.keys[0]: setattr(Patient, 'nmeMargins', None)
-            if 'nmeInternalEnhancement' == self.keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
-
-            if 'nmeDiameter' == self.keys[0] or 'nmeMargins' == self.keys[0] or 'nmeInternalEnhancement' == self.keys[0]:
-                Patient.post_process()
+            if 'nmeDiameter' == keys[0]: setattr(Patient, 'nmeDiameter', None)
+            if 'nmeMargins' == keys[0]: setattr(Patient, 'nmeMargins', None)
+            if 'nmeInternalEnhancement' == keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
 
+            if 'nmeDiameter' == keys[0] or 'nmeMargins' == keys[0] or 'nmeInternalEnhancement' == keys[0]:
                 return Patient
 
 
-        DynModel = self.make_model()
-        main_prompt = self.apply_chat_template(self.build_prompt(Patient.report_text))
-        out = self.model(main_prompt, DynModel, max_new_tokens=320, do_sample=False)
-        obj = DynModel.model_validate_json(out).model_dump()
+        candidates = lib.enum_candidates(keys[0]) if self.enum_scoring and len(keys) == 1 else None
+        main_prompt = self.apply_chat_template(self.build_prompt(Patient.report_text, request))
+        if candidates:
+            cache_key = self._cache_key(main_prompt, self.make_model(request), enum_scoring=candidates)
+            cached = self.response_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                probs = dict(zip(candidates, json.loads(cached)))
+            else:
+                probs = self.score_candidates(main_prompt, keys[0], candidates, request,
+                                              report=Patient.report_text)
+                if cache_key is not None:
+                    self.response_cache.put(cache_key, json.dumps(list(probs.values())), model=self.MODEL_ID)
+            value = max(probs, key=probs.get)
+            obj = {keys[0]: value}
+            Patient.field_confidence[keys[0]] = probs[value]
+        else:
+            DynModel, generator = self.generators.get(keys, include_fewshots, lambda: self.make_model(request))
+            obj = self._generate_validated(main_prompt, generator, DynModel, keys, request,
+                                           report=Patient.report_text, tag=tuple(keys),
+                                           field_confidence=Patient.field_confidence)
 
-        if 'MASS' in self.keys:
-            if obj.get('MASS') is None: obj['MASS'] = 'No'
+        if 'MASS' in keys:
+            Patient.default_gate(obj, 'MASS')
             Patient.mass_gate = True if obj.get('MASS', None)=='Yes' else False
-        if 'NME' in self.keys:
-            if obj.get('NME') is None: obj['NME'] = 'No'
+        if 'NME' in keys:
+            Patient.default_gate(obj, 'NME')
             Patient.nme_gate = True if obj.get('NME', None)=='Yes' else False
         
         
-        if 'massDiameter' == self.keys[0] and not Patient.mass_gate:
+        if 'massDiameter' == keys[0] and not Patient.mass_gate:
             obj['massDiameter'] = None
-        if 'massMargins' == self.keys[0] and not Patient.mass_gate:
+        if 'massMargins' == keys[0] and not Patient.mass_gate:
             obj['massMargins'] = None
-        if 'massInternalEnhancement' == self.keys[0] and not Patient.mass_gate:
+        if 'massInternalEnhancement' == keys[0] and not Patient.mass_gate:
             obj['massInternalEnhancement'] = None
             # return Patient
         
-        if 'nmeDiameter' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeDiameter' == keys[0] and not Patient.nme_gate:
             obj['nmeDiameter'] = None
             # Patient.nmeDiameter = None
-        if 'nmeMargins' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeMargins' == keys[0] and not Patient.nme_gate:
             obj['nmeMargins'] = None
-        if 'nmeInternalEnhancement' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeInternalEnhancement' == keys[0] and not Patient.nme_gate:
             obj['nmeInternalEnhancement'] = None
         
-        # if 'massDiameter' in self.keys and not Patient.mass_gate:
+        # if 'massDiameter' in keys and not Patient.mass_gate:
         #     Patient.massDiameter = None
 
-        # if 'nmeDiameter' in self.keys and not Patient.nme_gate:
+        # if 'nmeDiameter' in keys and not Patient.nme_gate:
         #     Patient.nmeDiameter = None
 
-        for key in self.keys:
+        for key in keys:
             setattr(Patient, key, obj.get(key, None))
 
-        Patient.post_process()
-
         return Patient
 
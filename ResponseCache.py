@@ -0,0 +1,172 @@
+"""
+ResponseCache.py
+----------------
+Persistent, content-addressed cache of LLM answers, shared by ReportExtractor,
+OpenAIReportExtractor, AsyncOpenAIExtractor and OpenAIBatchRunner.
+
+An entry is keyed by a SHA-256 of everything that determines the answer
+(model id, rendered prompt, JSON schema, decoding parameters), so re-running a
+driver after a crash, or after editing one field's prompt, only regenerates
+the prompts that actually changed. Stored in one SQLite file (stdlib, safe
+across processes).
+
+  * eviction: entries older than `max_age_days`, then least recently used
+    ones until the file holds at most `max_mb` of answers;
+  * read_only=True opens the database read-only (e.g. a shared team cache):
+    lookups work, nothing is written or evicted;
+  * counters: hits, misses, writes, evicted; log_stats() prints the hit rate.
+
+    cache = ResponseCache(".response_cache/responses.sqlite", max_mb=512, max_age_days=30)
+    ex = ReportExtractor(MODEL_ID, response_cache=cache)
+    ...
+    cache.log_stats()
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path(".response_cache") / "responses.sqlite"
+EVICT_EVERY = 256  # writes between eviction passes
+
+
+class ResponseCache:
+    """SQLite key -> answer store with size/age eviction and hit-rate counters."""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE_PATH, max_mb: float | None = None,
+                 max_age_days: float | None = None, read_only: bool = False):
+        """
+        Args:
+            path: SQLite file (created unless read_only).
+            max_mb: Upper bound on stored answer bytes (None: unbounded).
+            max_age_days: Drop entries not used for this long (None: keep).
+            read_only: Never write, update access times or evict.
+        """
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 2 ** 20) if max_mb else None
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.writes = self.evicted = 0
+        self._since_evict = 0
+
+        if read_only:
+            self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, model TEXT,"
+                " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+            self.evict()
+
+    @staticmethod
+    def key(**parts) -> str:
+        """Hash of the answer-determining inputs, e.g. key(model=..., prompt=..., schema=..., params=...)."""
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.read_only:
+                self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str, model: str | None = None):
+        if self.read_only:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, model, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, model, len(value.encode("utf-8")), now, now),
+            )
+            self._db.commit()
+            self.writes += 1
+            self._since_evict += 1
+        if self._since_evict >= EVICT_EVERY:
+            self.evict()
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def evict(self) -> int:
+        """Apply the age and size limits; returns the number of entries removed."""
+        if self.read_only:
+            return 0
+        removed = 0
+        with self._lock:
+            self._since_evict = 0
+            if self.max_age is not None:
+                cur = self._db.execute("DELETE FROM responses WHERE accessed < ?", (time.time() - self.max_age,))
+                removed += cur.rowcount
+            if self.max_bytes is not None:
+                total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    doomed, excess = [], total - self.max_bytes
+                    for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                        if excess <= 0:
+                            break
+                        doomed.append((key,))
+                        excess -= size
+                    self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                    removed += len(doomed)
+            self._db.commit()
+            self.evicted += removed
+        return removed
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evicted": self.evicted,
+            "entries": n,
+            "mb": size / 2 ** 20,
+        }
+
+    def log_stats(self):
+        st = self.stats()
+        mode = "read-only" if self.read_only else "read-write"
+        print(f"Response cache {self.path} ({mode}): {st['hits']} hits / {st['misses']} misses "
+              f"({st['hit_rate']:.1%}), {st['writes']} written, {st['evicted']} evicted, "
+              f"{st['entries']} entries ({st['mb']:.1f} MB)")
+
+    def close(self):
+        if not self.read_only:
+            self.evict()
+        self._db.close()
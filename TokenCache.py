@@ -0,0 +1,171 @@
+"""
+TokenCache.py
+-------------
+Persistent cache of chat-templated report token ids, for ReportExtractor.
+
+The chat-templated report prefix ("report_first" layout: chat header +
+report block) is identical for every field group of a report, and across
+runs, so its token ids are computed once and stored in one SQLite file per
+(tokenizer, chat template) under `cache_dir`:
+
+  * key: SHA-256 of the prefix text; value: int32 token ids;
+  * the token count of every entry is stored with it, so length_stats()
+    (n, mean, p50, p95, max) is available to batch schedulers without
+    tokenizing anything;
+  * counters: hits, misses; log_stats() prints the hit rate.
+
+    extractor = ReportExtractor(MODEL_ID, prompt_layout="report_first", token_cache_dir=".token_cache")
+    extractor.token_cache.warm([extractor.report_prefix(r) for r in reports])
+    extractor.token_cache.log_stats()
+
+check_tokenizer_parity() compares the fast tokenizer with the slow
+(`use_fast=False`) one on a set of texts before switching to
+ReportExtractor(fast_tokenizer=True).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from GeneratorCache import tokenizer_fingerprint
+
+DEFAULT_TOKEN_CACHE_DIR = Path(".token_cache")
+
+
+def template_fingerprint(hf_tok) -> str:
+    """Id of one (tokenizer, chat template) pair; fast and slow tokenizers get different ids."""
+    template = getattr(hf_tok, "chat_template", None) or ""
+    blob = f"{tokenizer_fingerprint(hf_tok)}\n{type(hf_tok).__name__}:{hf_tok.is_fast}\n{template}"
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class TokenCache:
+    """SQLite text -> token ids store for one tokenizer and chat template."""
+
+    def __init__(self, hf_tok, cache_dir: str | Path = DEFAULT_TOKEN_CACHE_DIR):
+        self.hf_tok = hf_tok
+        self.namespace = template_fingerprint(hf_tok)
+        self.path = Path(cache_dir) / f"{self.namespace}.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory: dict[str, np.ndarray] = {}
+        self.hits = self.misses = 0
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, ids BLOB NOT NULL, n INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        ids = self._memory.get(key)
+        if ids is None:
+            with self._lock:
+                row = self._db.execute("SELECT ids FROM tokens WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                ids = self._memory[key] = np.frombuffer(row[0], dtype=np.int32)
+        return ids
+
+    def _store(self, items: list[tuple[str, np.ndarray]]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tokens (key, ids, n) VALUES (?, ?, ?)",
+                [(key, ids.tobytes(), len(ids)) for key, ids in items],
+            )
+            self._db.commit()
+        self._memory.update(items)
+
+    def ids(self, text: str) -> np.ndarray:
+        """Token ids of `text` as the tokenizer's __call__ returns them (special tokens included)."""
+        key = self.key(text)
+        ids = self._lookup(key)
+        if ids is not None:
+            self.hits += 1
+            return ids
+        self.misses += 1
+        ids = np.asarray(self.hf_tok(text)["input_ids"], dtype=np.int32)
+        self._store([(key, ids)])
+        return ids
+
+    def length(self, text: str) -> int:
+        return len(self.ids(text))
+
+    def warm(self, texts: list[str], batch_size: int = 64) -> int:
+        """Tokenize (in batches) and store the texts not cached yet; returns how many were added."""
+        todo = {}
+        for text in texts:
+            key = self.key(text)
+            if key not in todo and self._lookup(key) is None:
+                todo[key] = text
+        keys = list(todo)
+        for i in range(0, len(keys), batch_size):
+            chunk = keys[i:i + batch_size]
+            encoded = self.hf_tok([todo[k] for k in chunk])["input_ids"]
+            self._store([(k, np.asarray(ids, dtype=np.int32)) for k, ids in zip(chunk, encoded)])
+        return len(keys)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def length_stats(self) -> dict:
+        """Token-count distribution of the stored texts: n, mean, p50, p95, max, total."""
+        with self._lock:
+            lengths = np.array([n for (n,) in self._db.execute("SELECT n FROM tokens")], dtype=np.int64)
+        if not len(lengths):
+            return {"n": 0, "mean": 0.0, "p50": 0, "p95": 0, "max": 0, "total": 0}
+        lengths.sort()
+        return {
+            "n": len(lengths),
+            "mean": float(lengths.mean()),
+            "p50": int(lengths[len(lengths) // 2]),
+            "p95": int(lengths[min(len(lengths) - 1, int(0.95 * len(lengths)))]),
+            "max": int(lengths[-1]),
+            "total": int(lengths.sum()),
+        }
+
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        st = self.length_stats()
+        print(f"Token cache {self.path}: {self.hits} hits / {self.misses} misses "
+              f"({self.hits / lookups if lookups else 0.0:.1%}), {st['n']} entries, "
+              f"tokens mean={st['mean']:.0f} p50={st['p50']} p95={st['p95']} max={st['max']}")
+
+    def close(self):
+        self._db.close()
+
+
+def check_tokenizer_parity(slow_tok, fast_tok, texts: list[str]) -> dict:
+    """
+    Compare the token ids of two tokenizers (slow reference, fast candidate)
+    on `texts`. Returns {"n", "mismatches", "first_mismatch"}, where
+    first_mismatch is (text index, token position) or None.
+    """
+    mismatches, first = 0, None
+    for i, text in enumerate(texts):
+        a = slow_tok(text)["input_ids"]
+        b = fast_tok(text)["input_ids"]
+        if a != b:
+            mismatches += 1
+            if first is None:
+                pos = next((j for j, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+                first = (i, pos)
+    return {"n": len(texts), "mismatches": mismatches, "first_mismatch": first}
@@ -6,6 +6,7 @@ from pydantic import create_model
 
 import lib
 from ReportExtractor import Patient  # if you keep Patient in same file, remove this import
+from ReportExtractor import FieldRequest, field_request
 
 from typing import Optional, Literal
 from pydantic import Field, create_model
@@ -264,29 +265,20 @@ class ReportExtractorOpenAI:
     def __init__(self, MODEL_ID: str, *, api_key: str | None = None, base_url: str | None = None):
         self.MODEL_ID = MODEL_ID
         self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.request = None
 
-    def set_keys(self, keys: list[str], include_fewshots: bool = False):
-        self.include_fewshots = include_fewshots
-        self.keys = keys
+    def set_keys(self, keys: list[str], include_fewshots: bool = False) -> FieldRequest:
+        # default request of build_prompt/make_model; extract_structured_data builds its own
+        self.request = field_request(keys, include_fewshots)
+        return self.request
 
-        # keep your existing behavior (optional)
-        for key in self.keys:
-            setattr(Patient, key, None)
-
-        self.FIELDS_SPEC = {k: lib.get_class_by_key(k)._field_spec for k in self.keys}
-        self._PROMPT_FIELD_RULES = {
-            k: (lib.get_class_by_key(k)._prompt + lib.get_class_by_key(k)._fewshots)
-            if self.include_fewshots
-            else lib.get_class_by_key(k)._prompt
-            for k in self.keys
-        }
-
-    def build_prompt(self, report: str) -> str:
+    def build_prompt(self, report: str, request: FieldRequest | None = None) -> str:
+        request = request or self.request
         lines = ["Task: Read the medical report (may be in Greek) and extract ONLY the following if present:"]
-        for k in self.keys:
-            lines.append(self._PROMPT_FIELD_RULES[k])
+        for k in request.keys:
+            lines.append(request.rules[k])
 
-        fields_stub = [lib.get_class_by_key(k)._field_stub for k in self.keys]
+        fields_stub = [lib.get_class_by_key(k)._field_stub for k in request.keys]
         lines += [
             "Output ONLY JSON:",
             "{ " + ", ".join(fields_stub) + " }",
@@ -295,9 +287,9 @@ class ReportExtractorOpenAI:
         ]
         return "\n".join(lines)
 
-    def make_model(self):
-        fields = {k: self.FIELDS_SPEC[k] for k in self.keys}
-        return create_model("ExtractSelected", **fields)
+    def make_model(self, request: FieldRequest | None = None):
+        request = request or self.request
+        return create_model("ExtractSelected", **request.field_spec)
 
     def extract_structured_data(
         self,
@@ -314,34 +306,34 @@ class ReportExtractorOpenAI:
         if not keys:
             return patient
 
-        self.set_keys(keys, include_fewshots=include_fewshots)
+        request = field_request(keys, include_fewshots)
 
         if not Patient.mass_gate:
-            if 'massDiameter' == self.keys[0]: setattr(Patient, 'massDiameter', None)
-            if 'massMargins' == self.keys[0]: setattr(Patient, 'massMargins', None)
-            if 'massInternalEnhancement' == self.keys[0]: setattr(Patient, 'massInternalEnhancement', None)
+            if 'massDiameter' == keys[0]: setattr(Patient, 'massDiameter', None)
+            if 'massMargins' == keys[0]: setattr(Patient, 'massMargins', None)
+            if 'massInternalEnhancement' == keys[0]: setattr(Patient, 'massInternalEnhancement', None)
 
-            if 'massDiameter' == self.keys[0] or 'massMargins' == self.keys[0] or 'massInternalEnhancement' == self.keys[0]:
+            if 'massDiameter' == keys[0] or 'massMargins' == keys[0] or 'massInternalEnhancement' == keys[0]:
                 Patient.post_process()
 
                 return Patient
             
         if not Patient.nme_gate:
-            if 'nmeDiameter' == self.keys[0]: setattr(Patient, 'nmeDiameter', None)
-            if 'nmeMargins' == self.keys[0]: setattr(Patient, 'nmeMargins', None)
-            if 'nmeInternalEnhancement' == self.keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
+            if 'nmeDiameter' == keys[0]: setattr(Patient, 'nmeDiameter', None)
+            if 'nmeMargins' == keys[0]: setattr(Patient, 'nmeMargins', None)
+            if 'nmeInternalEnhancement' == keys[0]: setattr(Patient, 'nmeInternalEnhancement', None)
 
-            if 'nmeDiameter' == self.keys[0] or 'nmeMargins' == self.keys[0] or 'nmeInternalEnhancement' == self.keys[0]:
+            if 'nmeDiameter' == keys[0] or 'nmeMargins' == keys[0] or 'nmeInternalEnhancement' == keys[0]:
                 Patient.post_process()
 
                 return Patient
 
-        DynModel = self.make_model()
+        DynModel = self.make_model(request)
         schema = _openai_strict_schema(DynModel.model_json_schema())
 
         resp = self.client.responses.create(
             model=self.MODEL_ID,
-            input=self.build_prompt(patient.report_text),
+            input=self.build_prompt(patient.report_text, request),
             max_output_tokens=max_output_tokens,
             text={
                 "format": {
@@ -356,32 +348,32 @@ class ReportExtractorOpenAI:
         data = json.loads(resp.output_text)
         obj = DynModel.model_validate(data).model_dump()
 
-        if 'MASS' in self.keys:
+        if 'MASS' in keys:
             if obj.get('MASS') is None: obj['MASS'] = 'No'
             Patient.mass_gate = True if obj.get('MASS', None)=='Yes' else False
-        if 'NME' in self.keys:
+        if 'NME' in keys:
             if obj.get('NME') is None: obj['NME'] = 'No'
             Patient.nme_gate = True if obj.get('NME', None)=='Yes' else False
         
         
-        if 'massDiameter' == self.keys[0] and not Patient.mass_gate:
+        if 'massDiameter' == keys[0] and not Patient.mass_gate:
             obj['massDiameter'] = None
-        if 'massMargins' == self.keys[0] and not Patient.mass_gate:
+        if 'massMargins' == keys[0] and not Patient.mass_gate:
             obj['massMargins'] = None
-        if 'massInternalEnhancement' == self.keys[0] and not Patient.mass_gate:
+        if 'massInternalEnhancement' == keys[0] and not Patient.mass_gate:
             obj['massInternalEnhancement'] = None
             # return Patient
         
-        if 'nmeDiameter' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeDiameter' == keys[0] and not Patient.nme_gate:
             obj['nmeDiameter'] = None
             # Patient.nmeDiameter = None
-        if 'nmeMargins' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeMargins' == keys[0] and not Patient.nme_gate:
             obj['nmeMargins'] = None
-        if 'nmeInternalEnhancement' == self.keys[0] and not Patient.nme_gate:
+        if 'nmeInternalEnhancement' == keys[0] and not Patient.nme_gate:
             obj['nmeInternalEnhancement'] = None
 
         # assign extracted fields
-        for k in self.keys:
+        for k in keys:
             setattr(patient, k, obj.get(k, None))
 
         patient.post_process()
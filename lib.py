@@ -1,7 +1,11 @@
 import csv
+import json
 import os
-from typing import Optional, Literal, Iterable, Sequence, Dict, Any
+import re
+import unicodedata
+from typing import Optional, Literal, Iterable, Sequence, Dict, Any, get_args, get_origin
 from pydantic import Field, create_model
+from pydantic.fields import FieldInfo
 import pandas as pd
 
 from MedicalInformation import *
@@ -44,6 +48,264 @@ def merge_dicts(dicts: list[dict]) -> dict:
         result.update(d)
     return result
 
+def enum_candidates(key: str) -> Optional[list]:
+    """
+    Every value a closed-set field may take, with None (null) last, read from
+    its `_field_spec`: Optional[Literal[...]] or a bounded Optional[int] (BIRADS).
+    Returns None for free-text / numeric fields (ACR, diameters, ADC).
+    """
+    annotation, info = get_class_by_key(key)._field_spec
+    args = [a for a in get_args(annotation) if a is not type(None)]
+    if len(args) == 1 and get_origin(args[0]) is Literal:
+        return list(get_args(args[0])) + [None]
+    if args == [int] and isinstance(info, FieldInfo):
+        ge = next((m.ge for m in info.metadata if hasattr(m, "ge")), None)
+        le = next((m.le for m in info.metadata if hasattr(m, "le")), None)
+        if ge is not None and le is not None:
+            return list(range(ge, le + 1)) + [None]
+    return None
+
+
+# ─── Report sections ─────────────────────────────────────────────────────────
+
+SECTION_NAMES = ("ΕΝΔΕΙΞΗ", "ΤΕΧΝΙΚΗ", "ΕΥΡΗΜΑΤΑ", "ΣΥΜΠΕΡΑΣΜΑ")
+# heading at the start of a line (after BOM/bullets), optionally followed by text:
+# "ΕΥΡΗΜΑΤΑ", "ΕΥΡΗΜΑΤΑ:", "ΣΥΜΠΕΡΑΣΜΑ. BIRADS 3", ...
+_SECTION_RE = re.compile(r"^[\W_]*(" + "|".join(SECTION_NAMES) + r")(?![Α-Ω])[\s:.,\-]*")
+
+
+class _FoldTable(dict):
+    """str.translate table: char -> its NFD base char, filled on first use."""
+    def __missing__(self, code):
+        self[code] = ch = unicodedata.normalize("NFD", chr(code))[0]
+        return ch
+
+
+_FOLD_TABLE = _FoldTable()
+_HEADING_SPAN = 64  # headings sit at the start of a line; only this much is folded
+
+
+def _fold(text: str) -> str:
+    """Uppercase without Greek accents, one output char per input char."""
+    return text.translate(_FOLD_TABLE).upper()
+
+
+def parse_sections(report: str) -> dict[str, str]:
+    """
+    Split a report into its ΕΝΔΕΙΞΗ / ΤΕΧΝΙΚΗ / ΕΥΡΗΜΑΤΑ / ΣΥΜΠΕΡΑΣΜΑ sections.
+    Text on the heading line itself (e.g. "ΣΥΜΠΕΡΑΣΜΑ. BIRADS 3") belongs to the
+    section; text before the first heading is dropped. Returns {} when no
+    heading is found.
+    """
+    sections: dict[str, list[str]] = {}
+    current = None
+    for line in report.splitlines():
+        m = _SECTION_RE.match(_fold(line[:_HEADING_SPAN]))
+        if m:
+            current = m.group(1)
+            sections.setdefault(current, [])
+            line = line[m.end():]
+            if not line.strip():
+                continue
+        if current is not None:
+            sections[current].append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items()}
+
+
+def select_sections(report: str, keys: Sequence[str]) -> str:
+    """
+    The part of `report` the fields in `keys` need, per their `_sections`.
+    Falls back to the full report when a field has no section map or when a
+    needed section is missing or empty (unparsed / unusual layouts).
+    """
+    wanted = set()
+    for k in keys:
+        names = getattr(get_class_by_key(k), "_sections", None)
+        if not names:
+            return report
+        wanted.update(names)
+    sections = parse_sections(report)
+    if not all(sections.get(name) for name in wanted):
+        return report
+    return "\n\n".join(f"{name}\n{sections[name]}" for name in SECTION_NAMES if name in wanted)
+
+
+# ─── Field groups ────────────────────────────────────────────────────────────
+
+# The extraction groups of report_extract_vFinal.py (one generation each), in
+# output-column order. MASS / NME come before the fields they gate.
+FIELD_GROUPS = [
+    ["BIRADS"],
+    ["FamilyHistory"],
+    ["ACR"],
+    ["BPE"],
+    ["MASS"],
+    ["massInternalEnhancement"],
+    ["massMargins"],
+    ["massDiameter"],
+    ["NME"],
+    ["nmeInternalEnhancement"],
+    ["nmeMargins"],
+    ["nmeDiameter"],
+    ["NonEnhancingFindings"],
+    ["CurveMorphology"],
+    ["LATERALITY"],
+]
+ORDERED_FIELDS = ["ID"] + [k for grp in FIELD_GROUPS for k in grp]
+
+
+# ─── Gating / single-pass schema ─────────────────────────────────────────────
+
+MASS_DEPENDENT_KEYS = ("massDiameter", "massMargins", "massInternalEnhancement")
+NME_DEPENDENT_KEYS = ("nmeDiameter", "nmeMargins", "nmeInternalEnhancement")
+
+# gate key -> (name of the nested sub-object, keys that live inside it)
+GATED_GROUPS = {
+    "MASS": ("mass", MASS_DEPENDENT_KEYS),
+    "NME": ("nme", NME_DEPENDENT_KEYS),
+}
+
+
+def _single_pass_layout(keys: Sequence[str]) -> list[tuple[str, tuple[str, ...]]]:
+    """
+    Order the requested keys for a single nested object.
+
+    Returns a list of (name, members): plain fields have no members, a gate
+    key is immediately followed by its sub-object so the model decides the
+    gate before filling the dependent fields. Dependent keys whose gate is
+    not requested stay flat and are gated by the Patient state afterwards.
+    """
+    layout = []
+    nested = set()
+    for gate, (_, members) in GATED_GROUPS.items():
+        if gate in keys:
+            nested.update(m for m in members if m in keys)
+    for k in keys:
+        if k in nested:
+            continue
+        layout.append((k, ()))
+        if k in GATED_GROUPS:
+            sub_name, members = GATED_GROUPS[k]
+            sub_keys = tuple(m for m in members if m in keys)
+            if sub_keys:
+                layout.append((sub_name, sub_keys))
+    return layout
+
+
+def make_single_pass_model(keys: Sequence[str]):
+    """
+    Build one pydantic model covering every key in `keys`, with the MASS/NME
+    dependent fields expressed as optional sub-objects ("mass", "nme").
+    """
+    fields = {}
+    for name, members in _single_pass_layout(keys):
+        if not members:
+            fields[name] = get_class_by_key(name)._field_spec
+            continue
+        sub_model = create_model(
+            name.capitalize() + "Details",
+            **{m: get_class_by_key(m)._field_spec for m in members},
+        )
+        fields[name] = (Optional[sub_model], None)
+    return create_model("ExtractAll", **fields)
+
+
+def build_single_pass_prompt(keys: Sequence[str], report: str, include_fewshots: bool = False,
+                             fewshot_index=None, fewshot_k: int = 2) -> str:
+    """
+    With include_fewshots, each field's `_fewshots` block is appended to its
+    rule, or only its top `fewshot_k` examples for this report when a
+    FewShotIndex is given.
+    """
+    lines = [
+        "Task: Read the medical report (may be in Greek) and extract ALL of the following in one JSON object:"
+    ]
+    for k in keys:
+        cls = get_class_by_key(k)
+        if not include_fewshots:
+            lines.append(cls._prompt)
+        elif fewshot_index is not None:
+            lines.append(cls._prompt + fewshot_index.block(k, report, fewshot_k))
+        else:
+            lines.append(cls._prompt + getattr(cls, "_fewshots", ""))
+
+    stub = []
+    for name, members in _single_pass_layout(keys):
+        if not members:
+            stub.append(get_class_by_key(name)._field_stub)
+            continue
+        inner = ", ".join(get_class_by_key(m)._field_stub for m in members)
+        stub.append(f'"{name}": <null or {{ {inner} }}>')
+
+    gates = [g for g, (sub, members) in GATED_GROUPS.items() if g in keys and any(m in keys for m in members)]
+    lines += [
+        "Output ONLY JSON:",
+        "{ " + ", ".join(stub) + " }",
+    ]
+    for g in gates:
+        lines.append(f'Fill "{GATED_GROUPS[g][0]}" only if {g} is "Yes"; otherwise set it to null.')
+    lines += [
+        "If an item is missing, return null. No extra keys.\n",
+        f'Report:\n"""\n{report}\n"""\nJSON:'
+    ]
+    return "\n".join(lines)
+
+
+def flatten_single_pass(obj: dict, keys: Sequence[str]) -> dict:
+    """Turn the nested single-pass output back into {key: value} for `keys`."""
+    flat = {}
+    for name, members in _single_pass_layout(keys):
+        if not members:
+            flat[name] = obj.get(name)
+            continue
+        sub = obj.get(name) or {}
+        for m in members:
+            flat[m] = sub.get(m)
+    return flat
+
+
+def _openai_strict_schema(schema: dict) -> dict:
+    """
+    OpenAI Structured Outputs (strict=True) requires:
+      - every object has additionalProperties: false
+      - every object has required listing ALL keys in properties
+    Also strips some Pydantic-emitted keys that can trigger 400s (e.g., "default").
+    """
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            for k in ("title", "default", "examples"):
+                if k in node:
+                    del node[k]
+
+            for k in ("anyOf", "allOf", "oneOf"):
+                if k in node and isinstance(node[k], list):
+                    for item in node[k]:
+                        walk(item)
+
+            if "items" in node:
+                walk(node["items"])
+
+            for defs_key in ("$defs", "definitions"):
+                if defs_key in node and isinstance(node[defs_key], dict):
+                    for v in node[defs_key].values():
+                        walk(v)
+
+            if node.get("type") == "object" and isinstance(node.get("properties"), dict):
+                props = node["properties"]
+                node["required"] = list(props.keys())
+                node["additionalProperties"] = False
+                for v in props.values():
+                    walk(v)
+
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    schema = json.loads(json.dumps(schema))  # deep copy
+    walk(schema)
+    return schema
+
 
 # ─── Evaluation utilities ────────────────────────────────────────────────────
 
@@ -58,6 +320,10 @@ def _normalize_series(
     strip: bool = True,
 ) -> pd.Series:
     # Keep NA as NA; normalize strings only
+    if pd.api.types.is_float_dtype(s) or s.dtype == object:
+        # 3.0 -> "3": an int column, a float one (ints with NaN) and an object one compare equal
+        s = pd.Series([int(v) if isinstance(v, float) and v.is_integer() else v for v in s],
+                      index=s.index, dtype=object)
     out = s.astype("string")
     if strip:
         out = out.str.strip()
@@ -74,7 +340,7 @@ def _is_missing(
     return s_norm.isna() | s_norm.isin(missing_strings)
 
 def evaluate_categorical_metrics(
-    path_pred: str,
+    path_pred: str | pd.DataFrame,
     path_gt: str,
     *,
     id_col_pred: Optional[str] = None,   # if None -> first column
@@ -97,6 +363,7 @@ def evaluate_categorical_metrics(
     Notes:
       - Treats None/NaN/""/"null"/"none"/... as missing (configurable).
       - Compares normalized strings (strip + casefold).
+      - path_pred may also be a prediction DataFrame (e.g. PatientBatch.to_frame()).
     """
     metrics_set = set(metrics)
     allowed = {"AccAll", "AccPresent", "AccNull", "GoldCoverage"}
@@ -111,7 +378,7 @@ def evaluate_categorical_metrics(
     if casefold:
         missing_strings = {x.casefold() for x in missing_strings}
 
-    pred_df = pd.read_csv(path_pred)
+    pred_df = path_pred.copy() if isinstance(path_pred, pd.DataFrame) else pd.read_csv(path_pred)
     gt_df = pd.read_excel(path_gt)
 
     if id_col_pred is None:
@@ -0,0 +1,79 @@
+"""
+report_extract_vAsyncOpenAI.py
+------------------------------
+Concurrent OpenAI extraction with AsyncOpenAIExtractor (in-flight limit,
+adaptive token bucket, jittered retries).
+
+MOCK = True runs offline against MockOpenAIServer, with injected latency,
+429 throttling and 500s. The values it returns are placeholders, so no
+evaluation is done in that mode.
+"""
+
+import os
+import time
+
+import lib
+from AsyncOpenAIExtractor import AsyncOpenAIExtractor
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID       = "gpt-4.1"
+    MOCK           = False                # True → local MockOpenAIServer, no network
+    INPUT_DIR      = "txt/"
+    N_REPORTS      = None                 # None → whole corpus
+    MAX_IN_FLIGHT  = 32
+    REQUESTS_PER_S = 20.0
+    OUTPUT_CSV     = "reports_extracted_async_openai.csv"
+    GT_XLSX        = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    server = None
+    kwargs = {}
+    if MOCK:
+        from MockOpenAIServer import MockOpenAIServer
+        server = MockOpenAIServer(rate=REQUESTS_PER_S, burst=8, error_rate=0.02).start()
+        kwargs = dict(base_url=server.base_url, api_key="mock")
+
+    extractor = AsyncOpenAIExtractor(MODEL_ID, max_in_flight=MAX_IN_FLIGHT, requests_per_s=REQUESTS_PER_S, **kwargs)
+
+    patients = []
+    for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        patients.append(patient)
+
+    t0 = time.perf_counter()
+    extractor.run(patients, groups)
+    elapsed = time.perf_counter() - t0
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    st = extractor.stats
+    print(f"\n=== Async OpenAI ({'mock' if MOCK else MODEL_ID}) ===")
+    print(f"reports      : {len(patients)} in {elapsed:.1f} s  ({len(patients) / elapsed:.2f} reports/s)")
+    print(f"requests     : {st['requests']}  ok {st['ok']}  throttled {st['throttled']}  "
+          f"retries {st['retries']}  failed {st['failed']}")
+    print(f"request rate : {st['ok'] / elapsed:.2f} ok/s  (bucket ended at {extractor.bucket.rate:.1f}/s)")
+    if server is not None:
+        print(f"mock server  : {server.requests} requests, {server.throttled} throttled, {server.errors} errors")
+        server.stop()
+    elif os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
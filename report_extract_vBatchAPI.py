@@ -0,0 +1,85 @@
+"""
+report_extract_vBatchAPI.py
+---------------------------
+OpenAI extraction through the Batch API (OpenAIBatch.OpenAIBatchRunner):
+two batches (gates/independent fields, then gate-positive dependents)
+instead of one request per (report, field group).
+
+MOCK = True runs offline against MockOpenAIServer's batch endpoints. The
+values it returns are placeholders, so no evaluation is done in that mode.
+"""
+
+import os
+import time
+
+from openai import OpenAI
+
+import lib
+from OpenAIBatch import OpenAIBatchRunner
+from Patient import Patient
+from ReportExtractor import OpenAIReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID      = "gpt-4.1"
+    MOCK          = False                 # True → local MockOpenAIServer, no network
+    INPUT_DIR     = "txt/"
+    N_REPORTS     = None                  # None → whole corpus
+    WORKDIR       = "batch/"              # JSONL inputs / outputs
+    POLL_INTERVAL = 60.0                  # seconds between status checks
+    OUTPUT_CSV    = "reports_extracted_batch_api.csv"
+    GT_XLSX       = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    server = None
+    client = None
+    if MOCK:
+        from MockOpenAIServer import MockOpenAIServer
+        server = MockOpenAIServer(batch_delay=1.0).start()
+        client = OpenAI(base_url=server.base_url, api_key="mock")
+        POLL_INTERVAL = 0.25
+
+    extractor = OpenAIReportExtractor(MODEL_ID, client=client)
+    runner = OpenAIBatchRunner(extractor, workdir=WORKDIR, poll_interval=POLL_INTERVAL)
+
+    patients = []
+    for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        patients.append(patient)
+
+    t0 = time.perf_counter()
+    runner.run(patients, groups)
+    elapsed = time.perf_counter() - t0
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    st = runner.stats
+    print(f"\n=== Batch API ({'mock' if MOCK else MODEL_ID}) ===")
+    print(f"reports  : {st['reports']} in {elapsed:.1f} s")
+    for wave in ("wave1", "wave2"):
+        w = st[wave]
+        print(f"{wave}    : {w['requests']} requests, {w['failed']} failed, "
+              f"status {w['status']}, {w['seconds']:.1f} s")
+    print(f"skipped  : {st['skipped_calls']} gated-out requests (naive: {st['naive_calls']})")
+    if server is not None:
+        server.stop()
+    elif os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
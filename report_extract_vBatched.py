@@ -0,0 +1,79 @@
+"""
+report_extract_vBatched.py
+--------------------------
+Cross-report batched extraction: each field group runs over the whole corpus
+in length-sorted, padded batches instead of one report at a time.
+
+Prints throughput for every batch size in BATCH_SIZES and evaluates the
+output of the last one.
+"""
+
+import os
+import time
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID    = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR   = "txt/"
+    N_REPORTS   = None                    # None → whole corpus
+    BATCH_SIZES = [1, 4, 8, 16]
+    OUTPUT_CSV  = "reports_extracted_batched.csv"
+    GT_XLSX     = "GT_gpt5_2_1.xlsx"
+    INCLUDE_FEWSHOTS = False
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = ReportExtractor(MODEL_ID)
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    reports = [lib.get_report_data(p) for p in report_paths]
+    print(f"Processing {len(reports)} reports, batch sizes {BATCH_SIZES}…")
+
+    results = []
+    for batch_size in BATCH_SIZES:
+        patients = []
+        for pat_id, report_text in reports:
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            patients.append(patient)
+
+        n_gen = 0
+        t0 = time.perf_counter()
+        for group in groups:
+            n_gen += extractor.extract_batch(patients, group, include_fewshots=INCLUDE_FEWSHOTS,
+                                             batch_size=batch_size)
+        elapsed = time.perf_counter() - t0
+        results.append((batch_size, elapsed, n_gen))
+        print(f"batch_size={batch_size:3d}: {elapsed:8.1f} s  "
+              f"{len(patients) / elapsed:6.3f} reports/s  {n_gen / elapsed:6.2f} generations/s")
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    print("\n=== Throughput per batch size ===")
+    base = results[0][1]
+    for batch_size, elapsed, n_gen in results:
+        print(f"{batch_size:3d}  {len(reports) / elapsed:7.3f} reports/s  "
+              f"{n_gen / elapsed:7.2f} generations/s  speed-up {base / elapsed:5.2f}x")
+    print("Generator cache:", extractor.generators.stats())
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
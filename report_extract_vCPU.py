@@ -0,0 +1,73 @@
+"""
+report_extract_vCPU.py
+----------------------
+CPU-only run of the LLM extractor (no CUDA needed) plus a reports/minute
+benchmark. Meant for the small models, e.g. Qwen2.5-1.5B-Instruct.
+"""
+
+import os
+import time
+
+import torch
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID      = "Qwen/Qwen2.5-1.5B-Instruct"
+    INPUT_DIR     = "txt/"
+    N_REPORTS     = 20                    # None → whole corpus
+    CPU_PRECISION = "auto"                # "auto" | "bf16" | "fp32"
+    NUM_THREADS   = None                  # None → all cores
+    OUTPUT_CSV    = "reports_extracted_cpu.csv"
+    GT_XLSX       = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    t0 = time.perf_counter()
+    extractor = ReportExtractor(MODEL_ID, device="cpu", cpu_precision=CPU_PRECISION, num_threads=NUM_THREADS)
+    t_load = time.perf_counter() - t0
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    print(f"Processing {len(report_paths)} reports on CPU…")
+
+    per_report = []
+    for report_path in report_paths:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+
+        t0 = time.perf_counter()
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+        per_report.append(time.perf_counter() - t0)
+
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    total = sum(per_report)
+    print("\n=== CPU benchmark ===")
+    print(f"model        : {MODEL_ID} ({extractor.hf_model.dtype}, {torch.get_num_threads()} threads)")
+    print(f"load time    : {t_load:.1f} s")
+    print(f"reports      : {len(per_report)} in {total:.1f} s")
+    print(f"throughput   : {60.0 * len(per_report) / total:.2f} reports/minute")
+    print(f"per report   : min {min(per_report):.1f} s / max {max(per_report):.1f} s")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,74 @@
+"""
+report_extract_vCached.py
+-------------------------
+Corpus extraction with a persistent ResponseCache in front of the LLM.
+Re-running after a crash, or after changing one field's prompt, only
+generates the answers that are not in the cache yet; the hit rate is
+printed at the end.
+
+CACHE_READ_ONLY = True uses a shared cache without modifying it (misses are
+generated but not stored).
+"""
+
+import os
+import time
+
+import lib
+from Patient import Patient
+from ResponseCache import ResponseCache
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    BACKEND            = "hf"             # "hf" | "openai"
+    MODEL_ID           = "Qwen/Qwen2.5-14B-Instruct"   # e.g. "gpt-4.1" for "openai"
+    INPUT_DIR          = "txt/"
+    N_REPORTS          = None             # None → whole corpus
+    CACHE_PATH         = ".response_cache/responses.sqlite"
+    CACHE_READ_ONLY    = False
+    CACHE_MAX_MB       = 512              # None → unbounded
+    CACHE_MAX_AGE_DAYS = 90               # None → never expire
+    OUTPUT_CSV         = "reports_extracted_cached.csv"
+    GT_XLSX            = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    cache = ResponseCache(CACHE_PATH, max_mb=CACHE_MAX_MB, max_age_days=CACHE_MAX_AGE_DAYS,
+                          read_only=CACHE_READ_ONLY)
+    if BACKEND == "hf":
+        from ReportExtractor import ReportExtractor
+        extractor = ReportExtractor(MODEL_ID, response_cache=cache)
+    else:
+        from ReportExtractor import OpenAIReportExtractor
+        extractor = OpenAIReportExtractor(MODEL_ID, response_cache=cache)
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    t0 = time.perf_counter()
+    for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+    elapsed = time.perf_counter() - t0
+
+    print(f"\nExtraction finished in {elapsed:.1f} s")
+    cache.log_stats()
+    cache.close()
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
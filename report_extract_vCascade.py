@@ -0,0 +1,93 @@
+"""
+report_extract_vCascade.py
+--------------------------
+Regex -> GLiNER -> QA -> LLM cascade (CascadeExtractor): every field is
+answered by the cheapest tier whose confidence clears that tier's threshold
+for the field; the LLM only sees what the cheap tiers could not resolve.
+
+Thresholds are learned from the ground truth on the first FIT_REPORTS
+reports (and saved to THRESHOLDS_JSON, reused on the next run). Prints the
+fraction of fields each tier resolved, wall time and the usual evaluation.
+"""
+
+import os
+import time
+
+import lib
+from CascadeExtractor import CascadeExtractor
+from ExtractionServer import make_backend
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    TIERS = [                             # cheapest first; the last tier always answers
+        ("regex",  "regex", {}),
+        ("gliner", "gliner", {}),
+        ("qa",     "qa", {}),
+        ("llm",    "hf", {"model_id": "Qwen/Qwen2.5-14B-Instruct"}),
+    ]
+    INPUT_DIR        = "txt/"
+    N_REPORTS        = None               # None → whole corpus
+    GT_XLSX          = "GT_gpt5_2_1.xlsx"
+    FIT_REPORTS      = 300                # reports used to learn the thresholds
+    TARGET_PRECISION = 0.95
+    THRESHOLDS_JSON  = "cascade_thresholds.json"
+    OUTPUT_CSV       = "reports_extracted_cascade.csv"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    cascade = CascadeExtractor([(name, make_backend(backend, **kwargs)) for name, backend, kwargs in TIERS])
+
+    def load_patients(paths):
+        patients = []
+        for report_path in paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            patients.append(patient)
+        return patients
+
+    report_paths = sorted(os.listdir(INPUT_DIR))
+
+    if os.path.exists(THRESHOLDS_JSON):
+        cascade.load_thresholds(THRESHOLDS_JSON)
+        print(f"Loaded thresholds from {THRESHOLDS_JSON}")
+    elif os.path.exists(GT_XLSX):
+        t0 = time.perf_counter()
+        cascade.fit_thresholds(load_patients(report_paths[:FIT_REPORTS]), GT_XLSX, groups,
+                               target_precision=TARGET_PRECISION)
+        cascade.save_thresholds(THRESHOLDS_JSON)
+        print(f"Fitted thresholds on {FIT_REPORTS} reports in {time.perf_counter() - t0:.1f} s")
+    else:
+        print(f"No thresholds and no ground truth ({GT_XLSX}); using default_threshold={cascade.default_threshold}")
+    for name, per_field in cascade.thresholds.items():
+        print(f"  {name:<8} " + ", ".join(f"{k}={v:.2f}" for k, v in sorted(per_field.items())))
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    t0 = time.perf_counter()
+    for patient in load_patients(report_paths[:N_REPORTS]):
+        for group in groups:
+            cascade.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+    elapsed = time.perf_counter() - t0
+
+    print(f"\nExtraction finished in {elapsed:.1f} s")
+    cascade.log_stats()
+
+    if os.path.exists(GT_XLSX):
+        print(f"(reports 1..{FIT_REPORTS} were used to fit the thresholds)")
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,57 @@
+"""
+report_extract_vCascadeNulls.py
+-------------------------------
+CascadeExtractor escalation of null answers that Patient defaults would
+otherwise hide: FamilyHistory (normalized to "No") and the MASS / NME gates
+(defaulted to "No"). Two stub tiers, no model: the cheap one answers null for
+those fields and a value for BIRADS, the expensive one answers everything.
+
+With escalate_null=True the null fields must come from the expensive tier and
+BIRADS from the cheap one; with escalate_null=False the cheap nulls are kept
+(and defaulted). Exits 1 on any difference.
+"""
+
+import sys
+
+from CascadeExtractor import CascadeExtractor
+from Patient import Patient
+from ReportExtractor import _assign_fields
+
+
+class StubTier:
+    """Extractor answering fixed values (through the usual _assign_fields gating)."""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+
+    def extract_structured_data(self, Patient, keys: list[str], include_fewshots: bool = False):
+        return _assign_fields(Patient, keys, {k: self.answers.get(k) for k in keys})
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    CHEAP     = {"BIRADS": 3, "FamilyHistory": None, "MASS": None, "NME": None}
+    EXPENSIVE = {"BIRADS": 4, "FamilyHistory": "Yes", "MASS": "Yes", "NME": "Yes"}
+    groups    = [["BIRADS"], ["FamilyHistory"], ["MASS"], ["NME"]]
+    EXPECTED  = {
+        True:  {"BIRADS": 3, "FamilyHistory": "Yes", "MASS": "Yes", "NME": "Yes"},
+        False: {"BIRADS": 3, "FamilyHistory": "No", "MASS": "No", "NME": "No"},
+    }
+    # ================================================================
+
+    failed = False
+    for escalate_null, expected in EXPECTED.items():
+        cascade = CascadeExtractor([("cheap", StubTier(CHEAP)), ("expensive", StubTier(EXPENSIVE))],
+                                   escalate_null=escalate_null)
+        patient = Patient("report")
+        for group in groups:
+            cascade.extract_structured_data(Patient=patient, keys=group)
+        patient.finalize()
+        got = {k: getattr(patient, k, None) for k in expected}
+        ok = got == expected
+        failed |= not ok
+        print(f"escalate_null={escalate_null}: {got} {'OK' if ok else f'expected {expected}'}")
+        cascade.log_stats()
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,59 @@
+"""
+report_extract_vColumnar.py
+---------------------------
+PatientBatch (columnar, enum-coded) next to the per-report Patient objects
+for a stored prediction file: load, per-field value counts, evaluation and
+CSV export from the arrays, with the memory and time of each.
+"""
+
+import os
+import time
+import tracemalloc
+
+import lib
+from PatientBatch import PatientBatch
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    PRED_CSV    = "Predictions/predictions_Qwen32B.csv"
+    GT_XLSX     = "GT_gpt5_2_1.xlsx"
+    OUTPUT_CSV  = "reports_extracted_columnar.csv"
+    # ================================================================
+
+    t0 = time.perf_counter()
+    batch = PatientBatch.from_csv(PRED_CSV)
+    load_s = time.perf_counter() - t0
+    batch_mb = batch.nbytes / 2 ** 20
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    patients = batch.to_patients()
+    objects_s = time.perf_counter() - t0
+    objects_mb = (tracemalloc.get_traced_memory()[0] - base) / 2 ** 20
+    tracemalloc.stop()
+
+    ORDERED_FIELDS = ["ID"] + list(batch.fields)
+    print(f"{len(batch)} reports from {PRED_CSV}")
+    print(f"  PatientBatch: {load_s * 1e3:.1f} ms to load, {batch_mb:.2f} MB of arrays")
+    print(f"  Patient objects: {objects_s * 1e3:.1f} ms to build, {objects_mb:.2f} MB")
+
+    for field in ("BIRADS", "MASS", "NME", "BPE"):
+        if field in batch.codes:
+            print(f"  {field}: {batch.counts(field)}")
+
+    t0 = time.perf_counter()
+    batch.to_csv(OUTPUT_CSV, ORDERED_FIELDS)
+    print(f"Exported {OUTPUT_CSV} in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=batch.to_frame(ORDERED_FIELDS),
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
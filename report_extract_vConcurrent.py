@@ -0,0 +1,106 @@
+"""
+report_extract_vConcurrent.py
+-----------------------------
+Concurrency stress test: one loaded extractor shared by a thread pool.
+
+Every report is first extracted serially; then, ROUNDS times, all reports
+are extracted again by N_THREADS threads at once (reports in shuffled
+order, so threads run different field groups and layouts' prefix caches
+concurrently), and every field of every report is compared with the
+serial result. Exits with status 1 on any mismatch or error.
+
+BACKEND "hf" shares one ReportExtractor; "openai" shares one
+OpenAIReportExtractor, against the local MockOpenAIServer when MOCK=True.
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lib
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    BACKEND           = "hf"              # "hf" | "openai"
+    MODEL_ID          = "Qwen/Qwen2.5-1.5B-Instruct"
+    PROMPT_LAYOUT     = "rules_first"     # hf: "rules_first" | "report_first" | "instructions_first"
+    ENUM_SCORING      = False
+    MOCK              = True              # openai: local MockOpenAIServer, no network
+    INPUT_DIR         = "txt/"
+    N_REPORTS         = 32
+    N_THREADS         = 8
+    ROUNDS            = 3
+    INCLUDE_FEWSHOTS  = False
+    SEED              = 0
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    server = None
+    if BACKEND == "hf":
+        from ReportExtractor import ReportExtractor
+        extractor = ReportExtractor(MODEL_ID, prompt_layout=PROMPT_LAYOUT, enum_scoring=ENUM_SCORING)
+    elif BACKEND == "openai":
+        from openai import OpenAI
+        from ReportExtractor import OpenAIReportExtractor
+        client = None
+        if MOCK:
+            from MockOpenAIServer import MockOpenAIServer
+            server = MockOpenAIServer(rate=1000, burst=100).start()
+            client = OpenAI(base_url=server.base_url, api_key="mock")
+        extractor = OpenAIReportExtractor(client=client)
+    else:
+        raise ValueError(f"Unknown BACKEND: {BACKEND!r}")
+
+    reports = [lib.get_report_data(p) for p in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]]
+
+    def run_report(pat_id, report_text) -> dict:
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=INCLUDE_FEWSHOTS)
+        return {k: getattr(patient, k, None) for k in ORDERED_FIELDS}
+
+    t0 = time.perf_counter()
+    serial = {pat_id: run_report(pat_id, text) for pat_id, text in reports}
+    serial_s = time.perf_counter() - t0
+    print(f"Serial: {len(reports)} reports in {serial_s:.1f} s")
+
+    rng = random.Random(SEED)
+    failures = 0
+    for r in range(ROUNDS):
+        order = reports[:]
+        rng.shuffle(order)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=N_THREADS) as pool:
+            futures = {pat_id: pool.submit(run_report, pat_id, text) for pat_id, text in order}
+        elapsed = time.perf_counter() - t0
+
+        mismatches = {}
+        for pat_id, future in futures.items():
+            try:
+                row = future.result()
+            except Exception as e:
+                print(f"  {pat_id}: {type(e).__name__}: {e}")
+                failures += 1
+                continue
+            for k in ORDERED_FIELDS:
+                if row[k] != serial[pat_id][k]:
+                    mismatches.setdefault(k, []).append(pat_id)
+        failures += sum(len(v) for v in mismatches.values())
+        print(f"Round {r + 1}: {N_THREADS} threads, {elapsed:.1f} s "
+              f"({serial_s / elapsed:.2f}x serial), "
+              f"{sum(len(v) for v in mismatches.values())} mismatching fields")
+        for k, ids in mismatches.items():
+            print(f"  {k}: {ids[:5]}{' ...' if len(ids) > 5 else ''}")
+
+    if server is not None:
+        server.stop()
+    print("OK: threaded results identical to serial" if not failures else f"FAILED: {failures} differences")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,110 @@
+"""
+report_extract_vDistilled.py
+----------------------------
+Distilled per-field classifiers (DistilledExtractor): TF-IDF over a fitted
+n-gram vocabulary + linear model per closed-set field, trained on the GT
+labels of a random split of the corpus; diameters come from the regex parsers.
+
+Trains (or loads MODEL_PATH), extracts the held-out reports, prints the
+per-report inference time (against the TARGET_MS latency goal) and model size, and evaluates the held-out split
+against the GT. PSEUDO_LABELS adds an LLM prediction CSV as labels for the
+reports the GT does not cover. MODEL_PATH stores the split it was trained
+on (SEED, TEST_FRACTION, PSEUDO_LABELS, ANALYZER and the training IDs); a
+saved model from another split is retrained, so no held-out report is ever
+one it was fitted on.
+"""
+
+import os
+import random
+import time
+
+import lib
+from DistilledExtractor import DistilledExtractor, load_distilled, save_distilled, train_distilled
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    INPUT_DIR      = "txt/"
+    GT_XLSX        = "GT_gpt5_2_1.xlsx"
+    PSEUDO_LABELS  = []                   # e.g. ["Predictions/predictions_Qwen32B.csv"]
+    MODEL_PATH     = "models/distilled.joblib"
+    RETRAIN        = False                # True → refit even if MODEL_PATH exists
+    ANALYZER       = "word"               # "word" | "char_wb" (char n-grams: slower to vectorise)
+    TEST_FRACTION  = 0.2                  # held-out share of the labelled reports
+    SEED           = 0
+    OUTPUT_CSV     = "reports_extracted_distilled.csv"
+    TARGET_MS      = 1.0                  # latency goal per report (extraction and classifiers alone)
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    reports = {}
+    for report_path in sorted(os.listdir(INPUT_DIR)):
+        pat_id, report_text = lib.get_report_data(report_path)
+        reports[pat_id] = report_text
+
+    ids = sorted(reports)
+    random.Random(SEED).shuffle(ids)
+    n_test = int(len(ids) * TEST_FRACTION)
+    test_ids, train_ids = sorted(ids[:n_test]), ids[n_test:]
+
+    split = {"seed": SEED, "test_fraction": TEST_FRACTION, "pseudo_labels": list(PSEUDO_LABELS),
+             "analyzer": ANALYZER}
+    models = None
+    if not RETRAIN and os.path.exists(MODEL_PATH):
+        models = load_distilled(MODEL_PATH)
+        if models.get("split") != split or not set(models.get("train_ids", test_ids)).isdisjoint(test_ids):
+            print(f"{MODEL_PATH} was trained on another split ({models.get('split')}); retraining")
+            models = None
+    if models is None:
+        t0 = time.perf_counter()
+        models = train_distilled({i: reports[i] for i in train_ids}, [GT_XLSX] + PSEUDO_LABELS,
+                                 keys=ORDERED_FIELDS[1:], analyzer=ANALYZER)
+        models["split"] = split
+        save_distilled(models, MODEL_PATH)
+        print(f"Trained on {models['trained_on']} reports in {time.perf_counter() - t0:.1f} s")
+    print(f"Model: {MODEL_PATH} ({os.path.getsize(MODEL_PATH) / 2**20:.1f} MB)")
+    extractor = DistilledExtractor(models)
+
+    patients = []
+    for pat_id in test_ids:
+        patient = Patient(reports[pat_id])
+        patient.ID = pat_id
+        patients.append(patient)
+
+    t0 = time.perf_counter()
+    for patient in patients:
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+    elapsed = time.perf_counter() - t0
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    t0 = time.perf_counter()
+    for patient in patients:
+        extractor.predict(patient.report_text)
+    classify = time.perf_counter() - t0
+
+    n = max(len(patients), 1)
+    per_report, per_classify = elapsed / n * 1e3, classify / n * 1e3
+    print(f"\nExtracted {len(patients)} held-out reports in {elapsed:.2f} s "
+          f"({per_report:.2f} ms/report, of which classifiers {per_classify:.2f} ms)")
+    print(f"Target < {TARGET_MS:.2f} ms: extraction {'met' if per_report < TARGET_MS else 'MISSED'}, "
+          f"classifiers {'met' if per_classify < TARGET_MS else 'MISSED'}")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,79 @@
+"""
+report_extract_vEngine.py
+-------------------------
+Run the corpus through the continuous-batching engine: N_CLIENTS driver
+threads each walk one report through the usual field groups (so MASS/NME
+gating is unchanged) while the engine decodes all their requests together.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+from InferenceEngine import ContinuousBatchingEngine
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID       = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR      = "txt/"
+    N_REPORTS      = None                 # None → whole corpus
+    MAX_BATCH_SIZE = 16
+    N_CLIENTS      = 32                   # reports in flight
+    OUTPUT_CSV     = "reports_extracted_engine.csv"
+    GT_XLSX        = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    patients = []
+    for report_path in report_paths:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        patients.append(patient)
+
+    extractor = ReportExtractor(MODEL_ID)
+    engine = ContinuousBatchingEngine(extractor, max_batch_size=MAX_BATCH_SIZE)
+
+    def run_report(patient):
+        for group in groups:
+            engine.extract_structured_data(Patient=patient, keys=group)
+        return patient
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=N_CLIENTS) as pool:
+        futures = [pool.submit(run_report, p) for p in patients]
+        for i, fut in enumerate(as_completed(futures), 1):
+            patient = fut.result()
+            if i % 10 == 0 or i == len(futures):
+                print(f"[{i}/{len(futures)}] {patient.ID}  {engine.metrics()}")
+    elapsed = time.perf_counter() - t0
+    final = engine.metrics()
+    engine.close()
+
+    print(f"\n{len(patients)} reports in {elapsed:.1f} s  ({len(patients) / elapsed:.3f} reports/s)")
+    print(f"{final['tokens_generated']} tokens in {final['steps']} decode steps, "
+          f"avg {final['tokens_generated'] / elapsed:.1f} tokens/s overall")
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
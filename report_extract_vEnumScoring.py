@@ -0,0 +1,76 @@
+"""
+report_extract_vEnumScoring.py
+------------------------------
+Constrained JSON generation vs likelihood scoring (enum_scoring=True) for the
+closed-set fields. Free-text fields (ACR, diameters) are generated in both runs.
+
+Reports wall time per mode, per-field accuracy against the ground truth, and
+the mean confidence of the scored fields.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID  = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR = "txt/"
+    N_REPORTS = 50                        # None → whole corpus
+    GT_XLSX   = "GT_gpt5_2_1.xlsx"
+    OUT_GEN   = "reports_extracted_generate.csv"
+    OUT_SCORE = "reports_extracted_enumscore.csv"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = ReportExtractor(MODEL_ID)
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+
+    timings, confidences = {}, []
+    for enum_scoring, out_csv in ((False, OUT_GEN), (True, OUT_SCORE)):
+        extractor.enum_scoring = enum_scoring
+        if os.path.exists(out_csv):
+            os.remove(out_csv)
+        t0 = time.perf_counter()
+        for report_path in report_paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            for group in groups:
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+            patient.finalize()
+            patient.save_to_csv(ORDERED_FIELDS, csv_path=out_csv)
+            if enum_scoring:
+                confidences.append(patient.field_confidence)
+        timings[out_csv] = time.perf_counter() - t0
+
+    n = len(report_paths)
+    t_gen, t_score = timings[OUT_GEN], timings[OUT_SCORE]
+    print("\n=== Throughput ===")
+    print(f"generate : {t_gen:8.1f} s  {n / t_gen:6.3f} reports/s")
+    print(f"score    : {t_score:8.1f} s  {n / t_score:6.3f} reports/s")
+    print(f"speed-up : {t_gen / t_score:.2f}x")
+
+    conf = pd.DataFrame(confidences)
+    print("\n=== Confidence of scored fields (mean / min) ===")
+    print(pd.DataFrame({"mean": conf.mean(), "min": conf.min()}).to_string(float_format="%.3f"))
+
+    if os.path.exists(GT_XLSX):
+        df_gen = lib.evaluate_categorical_metrics(path_pred=OUT_GEN, path_gt=GT_XLSX, metrics=("AccAll",))
+        df_score = lib.evaluate_categorical_metrics(path_pred=OUT_SCORE, path_gt=GT_XLSX, metrics=("AccAll",))
+        df = pd.merge(df_gen[["field", "AccAll"]], df_score[["field", "AccAll"]],
+                      on="field", suffixes=("_gen", "_score"))
+        df["dAccAll"] = df["AccAll_score"] - df["AccAll_gen"]
+        print("\n=== Per-field accuracy (generate vs score) ===")
+        print(df.to_string(index=False))
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,84 @@
+"""
+report_extract_vEscalation.py
+-----------------------------
+Small-to-large LLM escalation: the small model answers every field with
+per-field confidence from its generation log-probs
+(ReportExtractor(logprob_confidence=True)); only fields below the
+confidence threshold are asked again to the large model (CascadeExtractor
+with two LLM tiers).
+
+Prints the escalation rate per field, how the wall time splits between the
+two models, and the evaluation next to the stored large-model run
+(Predictions/predictions_Qwen32B.csv).
+"""
+
+import os
+import time
+
+import lib
+from CascadeExtractor import CascadeExtractor
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    SMALL_MODEL     = "Qwen/Qwen2.5-1.5B-Instruct"
+    LARGE_MODEL     = "Qwen/Qwen2.5-32B-Instruct"
+    THRESHOLD       = 0.9                 # min small-model value probability to keep its answer
+    FIT_REPORTS     = 0                   # >0 → learn per-field thresholds on these GT reports instead
+    INPUT_DIR       = "txt/"
+    N_REPORTS       = None                # None → whole corpus
+    OUTPUT_CSV      = "reports_extracted_escalation.csv"
+    LARGE_ONLY_CSV  = "Predictions/predictions_Qwen32B.csv"
+    GT_XLSX         = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    small = ReportExtractor(SMALL_MODEL, logprob_confidence=True)
+    large = ReportExtractor(LARGE_MODEL)
+    cascade = CascadeExtractor([("small", small), ("large", large)], default_threshold=THRESHOLD,
+                               escalate_null=False)
+
+    def load_patients(paths):
+        patients = []
+        for report_path in paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            patients.append(patient)
+        return patients
+
+    report_paths = sorted(os.listdir(INPUT_DIR))
+    if FIT_REPORTS > 0 and os.path.exists(GT_XLSX):
+        cascade.fit_thresholds(load_patients(report_paths[:FIT_REPORTS]), GT_XLSX, groups)
+        print("Learned thresholds:", cascade.thresholds["small"])
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    t0 = time.perf_counter()
+    for patient in load_patients(report_paths[:N_REPORTS]):
+        for group in groups:
+            cascade.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+    elapsed = time.perf_counter() - t0
+
+    print(f"\nExtraction finished in {elapsed:.1f} s")
+    cascade.log_stats()
+
+    if os.path.exists(GT_XLSX):
+        metrics = ("AccAll", "AccPresent", "AccNull", "GoldCoverage")
+        df = lib.evaluate_categorical_metrics(path_pred=OUTPUT_CSV, path_gt=GT_XLSX, metrics=metrics)
+        print("\n=== Escalation ===")
+        print(df)
+        if os.path.exists(LARGE_ONLY_CSV):
+            ref = lib.evaluate_categorical_metrics(path_pred=LARGE_ONLY_CSV, path_gt=GT_XLSX, metrics=metrics)
+            print(f"\n=== Large model only ({LARGE_ONLY_CSV}) ===")
+            print(ref)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
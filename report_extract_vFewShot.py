@@ -0,0 +1,84 @@
+"""
+report_extract_vFewShot.py
+--------------------------
+Dynamic few-shot selection: runs the same extraction three times,
+  none : no few-shot examples,
+  all  : every field's full `_fewshots` block (include_fewshots=True),
+  topk : only the FEWSHOT_K examples per field that best match the report
+         (FewShotIndex, BM25 over the sections the field reads),
+and prints the mean prompt length in tokens per call and the evaluation of
+each mode against the GT.
+"""
+
+import os
+import time
+
+import lib
+from FewShotIndex import FewShotIndex
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID    = "Qwen/Qwen2.5-32B-Instruct"
+    INPUT_DIR   = "txt/"
+    N_REPORTS   = None                    # None → whole corpus
+    FEWSHOT_K   = 2                       # examples kept per field in "topk"
+    MODES       = ["none", "all", "topk"]
+    OUTPUT_CSV  = "reports_extracted_fewshot_{mode}.csv"
+    GT_XLSX     = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    index = FewShotIndex.from_classes()
+    print(f"Few-shot index: {len(index)} examples")
+    extractor = ReportExtractor(MODEL_ID, fewshot_k=FEWSHOT_K)
+
+    summary = {}
+    for mode in MODES:
+        extractor.fewshot_index = index if mode == "topk" else None
+        include_fewshots = mode != "none"
+        output_csv = OUTPUT_CSV.format(mode=mode)
+        if os.path.exists(output_csv):
+            os.remove(output_csv)
+
+        prompt_tokens = []
+        t0 = time.perf_counter()
+        for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            for group in groups:
+                # the prompt extract_structured_data sends for this group
+                request = extractor.request_for(group, include_fewshots)
+                prompt = extractor.apply_chat_template(extractor.build_prompt(report_text, request))
+                prompt_tokens.append(extractor._n_tokens(prompt))
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=include_fewshots)
+            patient.finalize()
+            patient.save_to_csv(ORDERED_FIELDS, csv_path=output_csv)
+        elapsed = time.perf_counter() - t0
+
+        n = max(len(prompt_tokens), 1)
+        summary[mode] = {"prompt_tokens": sum(prompt_tokens) / n, "seconds": elapsed}
+        print(f"[{mode}] {sum(prompt_tokens) / n:.0f} prompt tokens/call, {elapsed:.1f} s")
+
+        if os.path.exists(GT_XLSX):
+            df = lib.evaluate_categorical_metrics(
+                path_pred=output_csv,
+                path_gt=GT_XLSX,
+                metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+            )
+            print(f"\n=== {mode} ===")
+            print(df)
+            summary[mode]["AccAll"] = df["AccAll"].mean()
+        else:
+            print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
+
+    print("\nmode   prompt tokens/call   time (s)   mean AccAll")
+    for mode, row in summary.items():
+        acc = f"{row['AccAll']:.3f}" if "AccAll" in row else "-"
+        print(f"{mode:<6} {row['prompt_tokens']:>18.0f} {row['seconds']:>10.1f}   {acc:>11}")
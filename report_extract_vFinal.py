@@ -34,6 +34,10 @@ if __name__ == "__main__":
     # MODEL_ID = "mistralai/Mistral-Nemo-Instruct-2407"
     # MODEL_ID = "ilsp/Llama-Krikri-8B-Instruct"
 
+    DEVICE = "cuda"                   # "cuda" | "cpu"
+    PROMPT_LAYOUT = "rules_first"
+    # PROMPT_LAYOUT = "report_first"  # report prefix prefilled once, KV cache shared by all groups
+
 
     # report_paths = ["pat0001.txt", "pat0002.txt", "pat0003.txt"]
     # report_paths = ["pat0002.txt", "pat0003.txt"]
@@ -58,7 +62,7 @@ if __name__ == "__main__":
 
     if extract_information:
 
-        re = ReportExtractor(MODEL_ID)
+        re = ReportExtractor(MODEL_ID, prompt_layout=PROMPT_LAYOUT, device=DEVICE)
         # # re = ReportExtractorOpenAI(MODEL_ID="gpt-4.1")
         # # re = ReportExtractorOpenAI(MODEL_ID="gpt-5.2")
         # re = ReportExtractorOpenAI(MODEL_ID="gpt-5-pro")
@@ -102,12 +106,15 @@ if __name__ == "__main__":
                 if attr not in ["report_text", "mass_gate", "nme_gate"]:
                     print(f"{attr}: {getattr(patient, attr)}")
             
+            patient.finalize()
             patient.save_to_csv(ORDERED_FIELDS, csv_path="reports_extracted_test_729_1066reports_14B.csv")
             # patient.save_to_csv(ORDERED_FIELDS, csv_path="reports_extracted_test_728reports_32B_fewshots.csv")
             # patient.save_to_csv(ORDERED_FIELDS, csv_path="reports_extracted_temp.csv")
             # save_to_json_path = f"json/{pat_id}.json"
             # patient.save_to_json(ORDERED_FIELDS, json_path=save_to_json_path)
             # print('\n')
+
+        print("Generator cache:", re.generators.stats())
             
 
     # lib.model_performace(path_pred="GT_gpt5_2_1.csv", path_gt='GT - edit.xlsx', per_class_breakdown=True)
@@ -0,0 +1,76 @@
+"""
+report_extract_vInstructionCache.py
+-----------------------------------
+Static instruction-prefix KV reuse: ReportExtractor(prompt_layout=
+"instructions_first") puts each field group's report-independent
+instructions (task line, rules, few-shots, JSON stub) first and prefills
+them once per group; every report then only prefills its own text.
+KV_CACHE_DIR keeps those prefixes on disk, so the next run skips even the
+first prefill.
+
+Runs the per-report loop with the "rules_first" layout and with
+"instructions_first" (few-shots on, where the instructions are longest),
+and prints wall time, prefix-cache counters and the evaluation of both.
+"""
+
+import os
+import time
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID          = "Qwen/Qwen2.5-32B-Instruct"
+    INPUT_DIR         = "txt/"
+    N_REPORTS         = None              # None → whole corpus
+    INCLUDE_FEWSHOTS  = True
+    KV_CACHE_DIR      = ".kv_cache"       # None → keep the prefixes in memory only
+    LAYOUTS           = ["rules_first", "instructions_first"]
+    OUTPUT_CSV        = "reports_extracted_{layout}.csv"
+    GT_XLSX           = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = ReportExtractor(MODEL_ID, kv_cache_dir=KV_CACHE_DIR)
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+
+    timings = {}
+    for layout in LAYOUTS:
+        extractor.prompt_layout = layout
+        output_csv = OUTPUT_CSV.format(layout=layout)
+        if os.path.exists(output_csv):
+            os.remove(output_csv)
+
+        t0 = time.perf_counter()
+        for report_path in report_paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            for group in groups:
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=INCLUDE_FEWSHOTS)
+            patient.finalize()
+            patient.save_to_csv(ORDERED_FIELDS, csv_path=output_csv)
+        timings[layout] = time.perf_counter() - t0
+        print(f"[{layout}] {timings[layout]:.1f} s ({timings[layout] / max(len(report_paths), 1):.2f} s/report)")
+
+    print("Instruction prefix cache:", extractor.instruction_caches.stats())
+    if "rules_first" in timings and "instructions_first" in timings:
+        print(f"Speed-up: {timings['rules_first'] / timings['instructions_first']:.2f}x")
+
+    if os.path.exists(GT_XLSX):
+        for layout in LAYOUTS:
+            df = lib.evaluate_categorical_metrics(
+                path_pred=OUTPUT_CSV.format(layout=layout),
+                path_gt=GT_XLSX,
+                metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+            )
+            print(f"\n=== {layout} ===")
+            print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
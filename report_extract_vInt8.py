@@ -0,0 +1,141 @@
+"""
+report_extract_vInt8.py
+-----------------------
+Int8 dynamic-quantized CPU extraction vs the fp32 baseline.
+
+Each precision runs in its own process, so load time and memory are not
+polluted by the other model. Reported per precision:
+  * load time and resident memory (RSS after load, peak RSS);
+  * decode tokens/s (greedy, unconstrained, on one report prompt);
+  * reports/minute on the field-group loop;
+  * per-field accuracy against the ground truth, and agreement with fp32.
+"""
+
+import multiprocessing as mp
+import os
+import time
+
+import pandas as pd
+
+import lib
+from Patient import Patient
+
+
+def _rss_mb() -> tuple[float, float]:
+    """(current RSS, peak RSS) of this process in MB, from /proc (Linux)."""
+    vals = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, kb, _ = line.split()
+                vals[name] = int(kb) / 1024
+    return vals.get("VmRSS:", float("nan")), vals.get("VmHWM:", float("nan"))
+
+
+def run(precision: str, cfg: dict) -> dict:
+    import torch
+    from ReportExtractor import ReportExtractor
+
+    t0 = time.perf_counter()
+    extractor = ReportExtractor(cfg["MODEL_ID"], device="cpu", cpu_precision=precision,
+                                num_threads=cfg["NUM_THREADS"])
+    t_load = time.perf_counter() - t0
+    rss, peak = _rss_mb()
+
+    report_paths = sorted(os.listdir(cfg["INPUT_DIR"]))[:cfg["N_REPORTS"]]
+
+    # ---------------- decode tokens/s ----------------
+    _, report_text = lib.get_report_data(report_paths[0])
+    request = extractor.set_keys(["BIRADS"])
+    prompt = extractor.apply_chat_template(extractor.build_prompt(report_text, request))
+    ids = extractor.hf_tok(prompt, return_tensors="pt")["input_ids"]
+    n_new = cfg["DECODE_TOKENS"]
+    with torch.no_grad():
+        t0 = time.perf_counter()
+        extractor.hf_model.generate(ids, do_sample=False, min_new_tokens=n_new, max_new_tokens=n_new)
+        t_decode = time.perf_counter() - t0
+
+    # ---------------- extraction ----------------
+    out_csv = cfg["OUT_CSV"].format(precision=precision)
+    if os.path.exists(out_csv):
+        os.remove(out_csv)
+    t0 = time.perf_counter()
+    for report_path in report_paths:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        for group in cfg["groups"]:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+        patient.finalize()
+        patient.save_to_csv(cfg["ORDERED_FIELDS"], csv_path=out_csv)
+    t_extract = time.perf_counter() - t0
+
+    return {
+        "precision": precision,
+        "load_s": t_load,
+        "rss_mb": rss,
+        "peak_rss_mb": peak,
+        "decode_tok_s": n_new / t_decode,
+        "reports_per_min": 60.0 * len(report_paths) / t_extract,
+        "csv": out_csv,
+    }
+
+
+def _worker(precision, cfg, results):
+    results.put(run(precision, cfg))
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID      = "Qwen/Qwen2.5-7B-Instruct"
+    INPUT_DIR     = "txt/"
+    N_REPORTS     = 20                    # None → whole corpus
+    PRECISIONS    = ["fp32", "int8"]      # first entry is the baseline
+    NUM_THREADS   = None                  # None → all cores
+    DECODE_TOKENS = 64
+    OUT_CSV       = "reports_extracted_cpu_{precision}.csv"
+    GT_XLSX       = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    cfg = dict(MODEL_ID=MODEL_ID, INPUT_DIR=INPUT_DIR, N_REPORTS=N_REPORTS, NUM_THREADS=NUM_THREADS,
+               DECODE_TOKENS=DECODE_TOKENS, OUT_CSV=OUT_CSV, groups=groups, ORDERED_FIELDS=ORDERED_FIELDS)
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for precision in PRECISIONS:
+        results = ctx.Queue()
+        proc = ctx.Process(target=_worker, args=(precision, cfg, results))
+        proc.start()
+        rows.append(results.get())
+        proc.join()
+
+    print(f"\n=== CPU precision benchmark: {MODEL_ID} ===")
+    print(pd.DataFrame(rows).drop(columns="csv").to_string(index=False, float_format="%.2f"))
+
+    base = rows[0]
+    base_df = pd.read_csv(base["csv"], dtype=str)
+    for row in rows[1:]:
+        print(f"\n{row['precision']} vs {base['precision']}: "
+              f"memory {row['rss_mb'] / base['rss_mb']:.2f}x, "
+              f"decode {row['decode_tok_s'] / base['decode_tok_s']:.2f}x, "
+              f"load {row['load_s'] / base['load_s']:.2f}x")
+
+    # ---------------- Per-field accuracy ----------------
+    fields = ORDERED_FIELDS[1:]
+    table = pd.DataFrame({"field": fields})
+    for row in rows:
+        df = pd.read_csv(row["csv"], dtype=str)
+        agree = (df[fields].fillna("") == base_df[fields].fillna("")).mean()
+        table[f"agree_{row['precision']}"] = table["field"].map(agree)
+        if os.path.exists(GT_XLSX):
+            acc = lib.evaluate_categorical_metrics(path_pred=row["csv"], path_gt=GT_XLSX, metrics=("AccAll",))
+            table[f"AccAll_{row['precision']}"] = table["field"].map(acc.set_index("field")["AccAll"])
+    table = table.drop(columns=f"agree_{base['precision']}")
+    if not os.path.exists(GT_XLSX):
+        print(f"\nGround-truth file not found: {GT_XLSX} — showing agreement with {base['precision']} only")
+    print(f"\n=== Per-field accuracy / agreement with {base['precision']} ===")
+    print(table.to_string(index=False, float_format="%.3f"))
@@ -0,0 +1,70 @@
+"""
+report_extract_vNormalize.py
+----------------------------
+Field normalizations per report: once per field when it is set (Patient
+NORMALIZERS + one finalize() per report) against the former per-group
+Patient.post_process, which re-normalized every field already set after
+each of the groups.
+
+The "before" count is what that per-group pass did: after every group, one
+normalization per registered field present on the Patient. Uses the CPU-only
+RegexExtractor, so it runs without a model.
+"""
+
+import contextlib
+import io
+import os
+import time
+
+import lib
+from Patient import NORMALIZERS, Patient
+from RegexExtractor import RegexExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    INPUT_DIR   = "txt/"
+    N_REPORTS   = None             # None → whole corpus
+    OUTPUT_CSV  = "reports_extracted_normalized.csv"
+    GT_XLSX     = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = RegexExtractor()
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    before, after = [], []
+    t0 = time.perf_counter()
+    for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        per_group = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for group in groups:
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+                per_group += sum(key in vars(patient) for key in NORMALIZERS)
+        patient.finalize()
+        before.append(per_group)
+        after.append(patient.normalizer_calls)
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+    elapsed = time.perf_counter() - t0
+
+    n = len(after)
+    print(f"\n{n} reports in {elapsed:.1f} s, {len(NORMALIZERS)} normalized fields")
+    print(f"  per-group post_process: {sum(before) / n:.1f} normalizations per report (max {max(before)})")
+    print(f"  normalize on set:       {sum(after) / n:.1f} normalizations per report (max {max(after)})")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,94 @@
+"""
+report_extract_vPostProcess.py
+------------------------------
+PatientBatch.post_process against the per-object Patient field normalizers
+on N_ROWS synthetic raw extractions (the values the extractors produce before
+normalization: Greek margins, "1,5 cm" diameters, ADC numbers, missing
+attributes, ...). The raw values are placed in the Patient without setattr,
+so Patient.finalize() normalizes them one object at a time:
+
+  * parity: every field of every row must match the per-object result
+    (same attribute set, same value; exits 1 otherwise);
+  * timing of both at N_ROWS rows.
+"""
+
+import random
+import sys
+import time
+
+import lib
+from Patient import Patient
+from PatientBatch import FIELDS, FLOAT_FIELDS, PatientBatch, _is_null
+
+
+def raw_values(field: str) -> list:
+    """Values an extractor can produce for `field` before normalization."""
+    if field in ("massDiameter", "nmeDiameter"):
+        return ["12 mm", "1,5 cm", "3.2CM", " 7 mm ", "0.8 cm", "about 5 mm", "12", "", 14.0, 9, None]
+    if field == "ADC":
+        return [0.62, 0.95, 1.0, 1.01, 1.2, 1.3999, 1.4, 1.85, 2, None]
+    return (lib.enum_candidates(field) or []) + [None]
+
+
+def make_patients(n: int, seed: int = 0, absent: float = 0.1) -> list:
+    rng = random.Random(seed)
+    pools = {f: raw_values(f) for f in FIELDS}
+    patients = []
+    for i in range(n):
+        p = Patient("")
+        p.ID = i
+        for f in FIELDS:
+            if rng.random() >= absent:
+                vars(p)[f] = rng.choice(pools[f])  # raw, not normalized yet
+        patients.append(p)
+    return patients
+
+
+def same(a, b) -> bool:
+    if _is_null(a) or _is_null(b):
+        return _is_null(a) and _is_null(b)
+    if isinstance(a, str) or isinstance(b, str):
+        return a == b
+    return float(a) == float(b)  # the batch stores numbers as float64
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    N_ROWS = 100_000
+    SEED   = 0
+    # ================================================================
+
+    patients = make_patients(N_ROWS, SEED)
+    batch = PatientBatch.from_patients(patients)
+
+    t0 = time.perf_counter()
+    for p in patients:
+        p.finalize()
+    object_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch.post_process()
+    batch_s = time.perf_counter() - t0
+
+    mismatches = 0
+    for f in FIELDS:
+        values = batch.values(f)
+        bad = [i for i, p in enumerate(patients)
+               if hasattr(p, f) != batch.present[f][i] or not same(getattr(p, f, None), values[i])]
+        if bad:
+            i = bad[0]
+            print(f"  {f}: {len(bad)} mismatches, e.g. row {i}: "
+                  f"Patient={getattr(patients[i], f, '<absent>')!r} batch={values[i]!r}")
+        mismatches += len(bad)
+
+    again = {f: batch.values(f).tolist() for f in FIELDS}
+    batch.post_process()
+    idempotent = all(batch.values(f).tolist() == again[f] for f in FIELDS)
+
+    print(f"{N_ROWS} rows x {len(FIELDS)} fields ({len(FLOAT_FIELDS)} numeric)")
+    print(f"  Patient.finalize: {object_s:.2f} s")
+    print(f"  PatientBatch.post_process: {batch_s:.3f} s ({object_s / batch_s:.0f}x)")
+    print(f"  parity: {'OK' if not mismatches else f'{mismatches} mismatches'}; "
+          f"second pass {'unchanged' if idempotent else 'CHANGED'}")
+    sys.exit(0 if not mismatches and idempotent else 1)
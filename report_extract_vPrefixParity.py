@@ -0,0 +1,116 @@
+"""
+report_extract_vPrefixParity.py
+-------------------------------
+Prefix KV-cache reuse against a full prefill. For every report and field
+group of each layout in LAYOUTS:
+
+  * the reused prefix must cover the start of the tokens the outlines
+    generator is actually given (fed_prompt: the chat template applied by
+    ReportExtractor and once more by outlines' type adapter);
+  * the prompt ids spliced from the cached prefix ids and the tokenized
+    suffix (fork_prefix, and prompt_ids with a token cache) must equal a
+    full encode of that text;
+  * the next-token logits after prefilling only the suffix on the forked
+    prefix cache must match a full prefill of the same tokens (max |Δlogit|
+    <= TOL);
+  * generate() (prefix reused) must return the same text as the generator
+    run on the plain prompt.
+
+The "instructions_first" prefixes are also saved to a scratch kv_cache_dir
+(and report prefix ids to a scratch token_cache_dir);
+the logits check is repeated after dropping them from memory, so the
+prefixes reloaded from disk are checked too.
+
+Runs on CPU in fp32, so kernel noise stays far below TOL. Exits 1 on any
+mismatch.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+
+import torch
+from transformers import StoppingCriteriaList
+
+import lib
+from ReportExtractor import JsonCloseCriteria, ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID  = "Qwen/Qwen2.5-1.5B-Instruct"
+    LAYOUTS   = ("report_first", "instructions_first")
+    INPUT_DIR = "txt/"
+    N_REPORTS = 3
+    GROUPS    = [["BIRADS"], ["ACR"], ["MASS"], ["massMargins"], ["LATERALITY"]]
+    TOL       = 1e-4
+    # ================================================================
+
+    reports = [lib.get_report_data(p)[1] for p in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]]
+
+    def logit_delta(extractor, report, request, fed):
+        """(prefix tokens reused, max |dlogit| against a full prefill), or None without reuse."""
+        hit = extractor.fork_prefix(fed, report, request)
+        if hit is None:
+            return None
+        n, cache, spliced = hit
+        ids = extractor._encode(fed)
+        if not (torch.equal(spliced, ids) and torch.equal(extractor.prompt_ids(fed, report), ids)):
+            return n, float("inf")
+        with torch.no_grad():
+            full = extractor.hf_model(input_ids=ids).logits[0, -1].float()
+            part = extractor.hf_model(input_ids=ids[:, n:], past_key_values=cache).logits[0, -1].float()
+        return n, float((full - part).abs().max())
+
+    failed = []
+    kv_dir, token_dir = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+    for layout in LAYOUTS:
+        extractor = ReportExtractor(MODEL_ID, prompt_layout=layout, device="cpu", cpu_precision="fp32",
+                                    kv_cache_dir=kv_dir.name, token_cache_dir=token_dir.name)
+        worst, reused = 0.0, 0
+        for i, report in enumerate(reports):
+            for group in GROUPS:
+                request = extractor.request_for(group)
+                main_prompt = extractor.apply_chat_template(extractor.build_prompt(report, request))
+                fed = extractor.fed_prompt(main_prompt)
+
+                checked = logit_delta(extractor, report, request, fed)
+                if checked is None:
+                    print(f"{layout} report {i} {group}: no prefix reused")
+                    failed.append((layout, i, tuple(group)))
+                    continue
+                n, delta = checked
+                reused += n
+                worst = max(worst, delta)
+
+                budget = extractor.token_budget(group)
+                _, generator = extractor.generators.get(group, False, lambda: extractor.make_model(request))
+                out_reuse = extractor.generate(main_prompt, generator, request, report=report,
+                                               max_new_tokens=budget)
+                stop = StoppingCriteriaList([JsonCloseCriteria(extractor.hf_tok, stop=extractor.token_budgets)])
+                out_full = generator(main_prompt, max_new_tokens=budget, do_sample=False, stopping_criteria=stop)
+
+                if delta > TOL or out_reuse != out_full:
+                    print(f"{layout} report {i} {group}: max |dlogit| {delta:.2e}, "
+                          f"reused {out_reuse!r} vs full {out_full!r}")
+                    failed.append((layout, i, tuple(group)))
+        print(f"{layout}: max |dlogit| {worst:.2e} over {len(reports) * len(GROUPS)} prompts, "
+              f"{reused} prompt tokens served from the prefix cache")
+
+        if layout == "instructions_first":
+            extractor.instruction_caches._entries.clear()  # next lookups load the saved prefixes
+            for group in GROUPS:
+                request = extractor.request_for(group)
+                fed = extractor.fed_prompt(extractor.apply_chat_template(extractor.build_prompt(reports[0], request)))
+                checked = logit_delta(extractor, reports[0], request, fed)
+                if checked is None or checked[1] > TOL:
+                    print(f"{layout} {group} reloaded from disk: {checked}")
+                    failed.append((layout, "disk", tuple(group)))
+            print(f"{layout}: reloaded prefixes {extractor.instruction_caches.stats()}")
+        del extractor
+        gc.collect()
+
+    print("OK: prefix reuse matches a full prefill" if not failed else f"FAILED: {len(failed)} prompts")
+    sys.exit(1 if failed else 0)
@@ -95,6 +95,7 @@ if __name__ == "__main__":
                     print(f"  {attr}: {getattr(patient, attr)}")
             print()
 
+        patient.finalize()
         patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
 
     print(f"\nWrote: {OUTPUT_CSV}")
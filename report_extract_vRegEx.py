@@ -86,6 +86,7 @@ if __name__ == "__main__":
                 if attr not in ["report_text", "mass_gate", "nme_gate"]:
                     print(f"{attr}: {getattr(patient, attr)}")
 
+            patient.finalize()
             patient.save_to_csv(ORDERED_FIELDS, csv_path="reports_extracted_RegEx.csv")
 
     # ── Evaluation ────────────────────────────────────────────────────────
@@ -0,0 +1,111 @@
+"""
+report_extract_vScheduled.py
+----------------------------
+Per-report sequential loop vs the two-wave CorpusScheduler (gate and
+independent fields for all reports first, then the MASS/NME detail fields
+only for gate-positive reports, batched where the backend supports it).
+
+Reports skipped calls, calls per wave and wall-clock time of both runs, and
+checks that both produce the same fields.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+import lib
+from CorpusScheduler import CorpusScheduler
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    BACKEND    = "hf"                     # "hf" | "regex" | "gliner" | "qa" | "combined"
+    MODEL_ID   = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR  = "txt/"
+    N_REPORTS  = None                     # None → whole corpus
+    BATCH_SIZE = 8
+    OUT_SEQ    = "reports_extracted_sequential.csv"
+    OUT_SCHED  = "reports_extracted_scheduled.csv"
+    GT_XLSX    = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    if BACKEND == "hf":
+        from ReportExtractor import ReportExtractor
+        extractor = ReportExtractor(MODEL_ID)
+    elif BACKEND == "regex":
+        from RegexExtractor import RegexExtractor
+        extractor = RegexExtractor()
+    elif BACKEND == "gliner":
+        from GLiNERExtractor import GLiNERExtractor
+        extractor = GLiNERExtractor()
+    elif BACKEND == "qa":
+        from QAExtractor import QAExtractor
+        extractor = QAExtractor()
+    elif BACKEND == "combined":
+        from PretrainedExtractor import PretrainedExtractor
+        extractor = PretrainedExtractor()
+    else:
+        raise ValueError(f"Unknown BACKEND: {BACKEND!r}")
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    reports = [lib.get_report_data(p) for p in report_paths]
+
+    def new_patients():
+        patients = []
+        for pat_id, report_text in reports:
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            patients.append(patient)
+        return patients
+
+    # ---------------- Sequential per-report loop ----------------
+    patients = new_patients()
+    t0 = time.perf_counter()
+    for patient in patients:
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+    t_seq = time.perf_counter() - t0
+    if os.path.exists(OUT_SEQ):
+        os.remove(OUT_SEQ)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUT_SEQ)
+
+    # ---------------- Two-wave corpus scheduler ----------------
+    scheduler = CorpusScheduler(extractor, batch_size=BATCH_SIZE)
+    patients = scheduler.run(new_patients(), groups)
+    if os.path.exists(OUT_SCHED):
+        os.remove(OUT_SCHED)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUT_SCHED)
+
+    st = scheduler.stats
+    print(f"\n=== Scheduling ({BACKEND}, {st['reports']} reports) ===")
+    print(f"gate-positive      : MASS {st['mass_positive']}  NME {st['nme_positive']}")
+    print(f"calls              : wave 1 {st['wave1_calls']}  wave 2 {st['wave2_calls']}  "
+          f"(naive {st['naive_calls']})")
+    print(f"skipped calls      : {st['skipped_calls']}")
+    print(f"sequential         : {t_seq:8.1f} s")
+    print(f"scheduled          : {st['total_s']:8.1f} s  "
+          f"(wave 1 {st['wave1_s']:.1f} s, wave 2 {st['wave2_s']:.1f} s)")
+    print(f"wall-clock saving  : {t_seq - st['total_s']:8.1f} s  ({t_seq / st['total_s']:.2f}x)")
+
+    seq = pd.read_csv(OUT_SEQ, dtype=str).fillna("")
+    sched = pd.read_csv(OUT_SCHED, dtype=str).fillna("")
+    diff = (seq != sched).sum()
+    print("\nFields differing from the sequential run:",
+          diff[diff > 0].to_dict() if diff.any() else "none")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(path_pred=OUT_SCHED, path_gt=GT_XLSX,
+                                              metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"))
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
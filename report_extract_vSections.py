@@ -0,0 +1,85 @@
+"""
+report_extract_vSections.py
+---------------------------
+Full-report prompts vs section-pruned prompts (section_pruning=True), where
+each field group only sees the sections listed in its `_sections`.
+
+Reports per field: mean prompt tokens (full / pruned), token reduction, how
+often pruning fell back to the full report, and AccAll of both runs.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID   = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR  = "txt/"
+    N_REPORTS  = 50                       # None → whole corpus
+    GT_XLSX    = "GT_gpt5_2_1.xlsx"
+    OUT_FULL   = "reports_extracted_fulltext.csv"
+    OUT_PRUNED = "reports_extracted_sections.csv"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = ReportExtractor(MODEL_ID)
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+
+    # ---------------- Prompt tokens (tokenizer only) ----------------
+    rows = []
+    for report_path in report_paths:
+        _, report_text = lib.get_report_data(report_path)
+        for group in groups:
+            request = extractor.set_keys(group)
+            n = {}
+            for pruning in (False, True):
+                extractor.section_pruning = pruning
+                n[pruning] = extractor._n_tokens(extractor.apply_chat_template(extractor.build_prompt(report_text, request)))
+            fallback = lib.select_sections(report_text, group) == report_text
+            rows.append({"field": "+".join(group), "tokens_full": n[False], "tokens_pruned": n[True],
+                         "fallback": fallback})
+    tokens = pd.DataFrame(rows).groupby("field", sort=False).mean()
+    tokens["reduction"] = 1.0 - tokens["tokens_pruned"] / tokens["tokens_full"]
+
+    # ---------------- Extraction ----------------
+    timings = {}
+    for pruning, out_csv in ((False, OUT_FULL), (True, OUT_PRUNED)):
+        extractor.section_pruning = pruning
+        if os.path.exists(out_csv):
+            os.remove(out_csv)
+        t0 = time.perf_counter()
+        for report_path in report_paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            for group in groups:
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+            patient.finalize()
+            patient.save_to_csv(ORDERED_FIELDS, csv_path=out_csv)
+        timings[pruning] = time.perf_counter() - t0
+
+    print("\n=== Wall time ===")
+    print(f"full text : {timings[False]:8.1f} s")
+    print(f"sections  : {timings[True]:8.1f} s  ({timings[False] / timings[True]:.2f}x)")
+
+    if os.path.exists(GT_XLSX):
+        acc_full = lib.evaluate_categorical_metrics(path_pred=OUT_FULL, path_gt=GT_XLSX, metrics=("AccAll",))
+        acc_pruned = lib.evaluate_categorical_metrics(path_pred=OUT_PRUNED, path_gt=GT_XLSX, metrics=("AccAll",))
+        tokens["AccAll_full"] = acc_full.set_index("field")["AccAll"]
+        tokens["AccAll_sections"] = acc_pruned.set_index("field")["AccAll"]
+        tokens["dAccAll"] = tokens["AccAll_sections"] - tokens["AccAll_full"]
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
+
+    print("\n=== Per-field prompt tokens and accuracy ===")
+    print(tokens.to_string(float_format="%.3f"))
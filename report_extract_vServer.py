@@ -0,0 +1,69 @@
+"""
+report_extract_vServer.py
+-------------------------
+Run the corpus through a warm ExtractionServer instead of loading a model
+in this process. Start the server first:
+
+    python ExtractionServer.py
+
+Writes the usual CSV and evaluation; prints per-report latency.
+"""
+
+import os
+import time
+
+import lib
+from ExtractionServer import ExtractionClient
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    SERVER     = "http://127.0.0.1:8765"  # or "unix:/tmp/extract.sock"
+    INPUT_DIR  = "txt/"
+    N_REPORTS  = None                     # None → whole corpus
+    BATCH      = 0                        # >0 → /extract_batch with this many reports per request
+    OUTPUT_CSV = "reports_extracted_server.csv"
+    GT_XLSX    = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    client = ExtractionClient(SERVER)
+    print("Server:", client.health())
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    reports = [dict(zip(("id", "report_text"), lib.get_report_data(p))) for p in report_paths]
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+
+    t0 = time.perf_counter()
+    if BATCH > 0:
+        results = []
+        for i in range(0, len(reports), BATCH):
+            results += client.extract_batch(reports[i:i + BATCH])
+    else:
+        results = [client.extract(r["report_text"], id=r["id"]) for r in reports]
+    elapsed = time.perf_counter() - t0
+
+    for res in results:
+        patient = Patient(report_text="")
+        patient.ID = res["id"]
+        for key, value in res["fields"].items():
+            setattr(patient, key, value)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    print(f"\n{len(results)} reports in {elapsed:.1f} s  ({elapsed / max(len(results), 1):.2f} s/report)")
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
@@ -0,0 +1,97 @@
+"""
+report_extract_vSinglePass.py
+-----------------------------
+Compare the one-key-per-call baseline against single-pass extraction, where
+every field of a report comes from one constrained generation.
+
+Reports throughput (reports/s, generations/report) for both modes and the
+per-field metrics of each run against the ground truth.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+import lib
+from Patient import Patient
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    BACKEND   = "hf"                      # "hf" | "openai"
+    MODEL_ID  = "Qwen/Qwen2.5-14B-Instruct"
+    # MODEL_ID = "gpt-4.1"                # for BACKEND = "openai"
+    INPUT_DIR = "txt/"
+    N_REPORTS = 50                        # None → whole corpus
+    GT_XLSX   = "GT_gpt5_2_1.xlsx"
+    OUT_BASE  = "reports_extracted_baseline.csv"
+    OUT_SP    = "reports_extracted_singlepass.csv"
+    INCLUDE_FEWSHOTS = False
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ALL_KEYS = [k for grp in groups for k in grp]
+    ORDERED_FIELDS = ["ID"] + ALL_KEYS
+
+    if BACKEND == "hf":
+        from ReportExtractor import ReportExtractor
+        extractor = ReportExtractor(MODEL_ID)
+    elif BACKEND == "openai":
+        from ReportExtractor import OpenAIReportExtractor
+        extractor = OpenAIReportExtractor(model_id=MODEL_ID)
+    else:
+        raise ValueError(f"Unknown BACKEND: {BACKEND!r}")
+
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+    print(f"Processing {len(report_paths)} reports with {BACKEND}:{MODEL_ID}…")
+
+    for path in (OUT_BASE, OUT_SP):
+        if os.path.exists(path):
+            os.remove(path)
+
+    # ---------------- Baseline: one key per call ----------------
+    t0 = time.perf_counter()
+    for report_path in report_paths:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        for group in groups:
+            extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=INCLUDE_FEWSHOTS)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUT_BASE)
+    t_base = time.perf_counter() - t0
+
+    # ---------------- Single pass: all keys in one call ----------------
+    t0 = time.perf_counter()
+    for report_path in report_paths:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        extractor.extract_all_fields(Patient=patient, keys=ALL_KEYS, include_fewshots=INCLUDE_FEWSHOTS)
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUT_SP)
+    t_sp = time.perf_counter() - t0
+
+    n = len(report_paths)
+    print("\n=== Throughput ===")
+    print(f"baseline   : {t_base:8.1f} s  {n / t_base:6.3f} reports/s  (≤{len(groups)} generations/report)")
+    print(f"single-pass: {t_sp:8.1f} s  {n / t_sp:6.3f} reports/s  (1 generation/report)")
+    print(f"speed-up   : {t_base / t_sp:.2f}x")
+
+    # ---------------- Per-field accuracy ----------------
+    if os.path.exists(GT_XLSX):
+        metrics = ("AccAll", "AccPresent", "AccNull", "GoldCoverage")
+        df_base = lib.evaluate_categorical_metrics(path_pred=OUT_BASE, path_gt=GT_XLSX, metrics=metrics)
+        df_sp = lib.evaluate_categorical_metrics(path_pred=OUT_SP, path_gt=GT_XLSX, metrics=metrics)
+        df = pd.merge(
+            df_base[["field", "AccAll", "AccPresent"]],
+            df_sp[["field", "AccAll", "AccPresent"]],
+            on="field", suffixes=("_base", "_sp"),
+        )
+        df["dAccAll"] = df["AccAll_sp"] - df["AccAll_base"]
+        print("\n=== Per-field accuracy (baseline vs single-pass) ===")
+        print(df.to_string(index=False))
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")
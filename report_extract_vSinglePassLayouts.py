@@ -0,0 +1,58 @@
+"""
+report_extract_vSinglePassLayouts.py
+------------------------------------
+Single-pass extraction (extract_all_fields) under every prompt_layout of
+ReportExtractor. The single-pass prompt has its own layout, so no prefix KV
+cache applies and every layout must give the same fields as "rules_first".
+Exits 1 when a layout raises or disagrees.
+"""
+
+import gc
+import os
+import sys
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID  = "Qwen/Qwen2.5-1.5B-Instruct"
+    LAYOUTS   = ("rules_first", "report_first", "instructions_first")
+    INPUT_DIR = "txt/"
+    N_REPORTS = 4
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ALL_KEYS = [k for grp in groups for k in grp]
+    reports = [lib.get_report_data(p) for p in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]]
+
+    results, failed = {}, []
+    for layout in LAYOUTS:
+        extractor = ReportExtractor(MODEL_ID, prompt_layout=layout)
+        rows = []
+        try:
+            for pat_id, report_text in reports:
+                patient = Patient(report_text)
+                extractor.extract_all_fields(Patient=patient, keys=ALL_KEYS)
+                patient.finalize()
+                rows.append({k: getattr(patient, k, None) for k in ALL_KEYS})
+        except Exception as e:
+            print(f"{layout}: FAILED with {type(e).__name__}: {e}")
+            failed.append(layout)
+        else:
+            results[layout] = rows
+            print(f"{layout}: {len(rows)} reports extracted")
+        del extractor
+        gc.collect()
+
+    reference = results.get(LAYOUTS[0])
+    for layout, rows in results.items():
+        if reference is not None and rows != reference:
+            print(f"{layout}: fields differ from {LAYOUTS[0]}")
+            failed.append(layout)
+
+    print("OK: single-pass runs under every layout" if not failed else f"FAILED: {failed}")
+    sys.exit(1 if failed else 0)
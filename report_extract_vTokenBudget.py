@@ -0,0 +1,64 @@
+"""
+report_extract_vTokenBudget.py
+------------------------------
+Fixed max_new_tokens=320 vs schema-derived per-field token budgets with early
+stop on JSON close (ReportExtractor(token_budgets=True)).
+
+Logs the generated-token distribution per field group for both runs, the
+wall time, and whether the extracted values are identical.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+import lib
+from Patient import Patient
+from ReportExtractor import ReportExtractor
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID  = "Qwen/Qwen2.5-14B-Instruct"
+    INPUT_DIR = "txt/"
+    N_REPORTS = 50                        # None → whole corpus
+    OUT_FIXED = "reports_extracted_fixed320.csv"
+    OUT_BUDGET = "reports_extracted_budget.csv"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    extractor = ReportExtractor(MODEL_ID)
+    report_paths = sorted(os.listdir(INPUT_DIR))[:N_REPORTS]
+
+    timings = {}
+    for token_budgets, out_csv in ((False, OUT_FIXED), (True, OUT_BUDGET)):
+        extractor.token_budgets = token_budgets
+        extractor.token_counts = {}
+        if os.path.exists(out_csv):
+            os.remove(out_csv)
+        t0 = time.perf_counter()
+        for report_path in report_paths:
+            pat_id, report_text = lib.get_report_data(report_path)
+            patient = Patient(report_text)
+            patient.ID = pat_id
+            for group in groups:
+                extractor.extract_structured_data(Patient=patient, keys=group, include_fewshots=False)
+            patient.finalize()
+            patient.save_to_csv(ORDERED_FIELDS, csv_path=out_csv)
+        timings[token_budgets] = time.perf_counter() - t0
+        print()
+        extractor.log_token_stats()
+
+    print("\n=== Wall time ===")
+    print(f"fixed 320 : {timings[False]:8.1f} s")
+    print(f"budgets   : {timings[True]:8.1f} s  ({timings[False] / timings[True]:.2f}x)")
+
+    fixed = pd.read_csv(OUT_FIXED, dtype=str).fillna("")
+    budget = pd.read_csv(OUT_BUDGET, dtype=str).fillna("")
+    diff = (fixed != budget).sum()
+    print("\n=== Fields that changed ===")
+    print(diff[diff > 0].to_string() if diff.any() else "none — identical output")
@@ -0,0 +1,99 @@
+"""
+report_extract_vTokenCache.py
+-----------------------------
+Fast tokenizer + persistent token-id cache.
+
+  1. Parity: token ids of the slow (use_fast=False) and fast tokenizers on
+     every report and every chat-templated report prefix, plus the time
+     each takes to tokenize the corpus.
+  2. Extraction in the "report_first" layout with the fast tokenizer (only
+     if parity holds) and the token cache (TokenCache.py): the report
+     prefixes are tokenized once, in batches, and served from the cache to
+     the batch ordering of extract_batch (and to the report-prefix KV reuse
+     of extract_structured_data).
+
+Prints the cache hit rate and the report-prefix length statistics.
+"""
+
+import os
+import time
+
+from transformers import AutoTokenizer
+
+import lib
+from Patient import Patient
+from ReportExtractor import CACHE_DIR, ReportExtractor
+from TokenCache import check_tokenizer_parity
+
+
+if __name__ == "__main__":
+
+    # ============================ CONFIG ============================
+    MODEL_ID         = "Qwen/Qwen2.5-32B-Instruct"
+    INPUT_DIR        = "txt/"
+    N_REPORTS        = None               # None → whole corpus
+    TOKEN_CACHE_DIR  = ".token_cache"
+    BATCH_SIZE       = 8
+    OUTPUT_CSV       = "reports_extracted_tokencache.csv"
+    GT_XLSX          = "GT_gpt5_2_1.xlsx"
+    # ================================================================
+
+    groups = lib.FIELD_GROUPS
+    ORDERED_FIELDS = lib.ORDERED_FIELDS
+
+    patients = []
+    for report_path in sorted(os.listdir(INPUT_DIR))[:N_REPORTS]:
+        pat_id, report_text = lib.get_report_data(report_path)
+        patient = Patient(report_text)
+        patient.ID = pat_id
+        patients.append(patient)
+    reports = [p.report_text for p in patients]
+
+    # ---------------- 1. slow / fast parity ----------------
+    slow = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=False, cache_dir=str(CACHE_DIR), trust_remote_code=True)
+    fast = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True, cache_dir=str(CACHE_DIR), trust_remote_code=True)
+    if slow.is_fast:
+        print("No slow tokenizer for this model: use_fast=False also loads the fast one.")
+    prefixes = [fast.apply_chat_template([{"role": "user", "content": ReportExtractor.report_block(r)}],
+                                         tokenize=False, add_generation_prompt=True) for r in reports]
+    parity = check_tokenizer_parity(slow, fast, reports + prefixes)
+    print(f"Parity on {parity['n']} texts: {parity['mismatches']} mismatches"
+          + (f" (first: text {parity['first_mismatch'][0]}, token {parity['first_mismatch'][1]})"
+             if parity["first_mismatch"] else ""))
+
+    for name, tok in (("slow", slow), ("fast", fast)):
+        t0 = time.perf_counter()
+        for text in prefixes:
+            tok(text)
+        elapsed = time.perf_counter() - t0
+        print(f"  {name}: {elapsed / max(len(prefixes), 1) * 1e3:.2f} ms/report prefix")
+
+    # ---------------- 2. extraction with the token cache ----------------
+    extractor = ReportExtractor(MODEL_ID, prompt_layout="report_first",
+                                fast_tokenizer=parity["mismatches"] == 0, token_cache_dir=TOKEN_CACHE_DIR)
+    t0 = time.perf_counter()
+    added = extractor.token_cache.warm([extractor.report_prefix(r) for r in reports])
+    print(f"Token cache: {added} new report prefixes tokenized in {time.perf_counter() - t0:.2f} s")
+
+    t0 = time.perf_counter()
+    for group in groups:
+        extractor.extract_batch(patients, group, batch_size=BATCH_SIZE)
+    elapsed = time.perf_counter() - t0
+    print(f"\nExtraction finished in {elapsed:.1f} s")
+    extractor.token_cache.log_stats()
+
+    if os.path.exists(OUTPUT_CSV):
+        os.remove(OUTPUT_CSV)
+    for patient in patients:
+        patient.finalize()
+        patient.save_to_csv(ORDERED_FIELDS, csv_path=OUTPUT_CSV)
+
+    if os.path.exists(GT_XLSX):
+        df = lib.evaluate_categorical_metrics(
+            path_pred=OUTPUT_CSV,
+            path_gt=GT_XLSX,
+            metrics=("AccAll", "AccPresent", "AccNull", "GoldCoverage"),
+        )
+        print(df)
+    else:
+        print(f"\nSkipping evaluation — ground-truth file not found: {GT_XLSX}")